@@ -0,0 +1,24 @@
+"""
+ASGI entry point of the Panchang API:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5002 --workers 4
+
+The Flask app runs behind a2wsgi's WSGI adapter, on a pool of PANCHANG_THREADS
+threads per worker. This is not async serving: Flask runs its async views (the
+CV endpoints) to completion in the request thread, so a worker serves as many
+requests at once here as under gunicorn. What keeps a slow /analyze from
+starving /api/panchang is offload.py: the CPU work runs in bounded process
+pools, whose limits leave threads free, and a call past its timeout answers
+504. gunicorn (see wsgi.py) remains the default; both modes warm up before
+serving.
+"""
+
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from working_panchang_api import app as flask_app, warmup
+
+warmup()
+
+app = WSGIMiddleware(flask_app, workers=int(os.environ.get('PANCHANG_THREADS', 8)))
@@ -0,0 +1,95 @@
+"""
+Registry of the computer vision engines of the API, loaded on first use.
+
+Importing OpenCV, Tesseract and MediaPipe and building the engines (the hand
+landmarker model, for one) takes seconds and hundreds of MB, which processes
+that only serve the panchang should not pay. An engine is imported and
+constructed by the first get() of its name:
+
+    engine = cv_engines.get('palm')
+    engine.analyze_image(path)
+
+The API runs them through analyze_file() in the process pools of offload.py,
+so they load in the pool processes rather than the server's.
+
+CV_ENGINES lists the engines a process may load: 'all' (the default), 'none'
+or names separated by commas; get() of another one raises LookupError. With
+CV_PRELOAD=1, wsgi.py loads the enabled engines before the workers fork.
+"""
+
+import os
+import importlib
+import threading
+
+# name -> (module, class); register() adds more
+ENGINES = {
+    'kundli': ('vision_engine', 'ThreeLayerEngine'),
+    'palm': ('palm_engine', 'PalmEngine'),
+}
+instances = {}
+errors = {}
+lock = threading.Lock()
+
+
+def register(name, module, cls):
+    """Make module.cls (constructed without arguments) available as get(name)"""
+    ENGINES[name] = (module, cls)
+
+
+def enabled(name):
+    setting = os.environ.get('CV_ENGINES', 'all').strip().lower()
+    if setting == 'all':
+        return True
+    return name in [n.strip() for n in setting.split(',')]
+
+
+def get(name):
+    """The engine called name, imported and constructed on the first call.
+    LookupError if it is unknown or not enabled in this process; the import
+    or construction error if it fails to load."""
+    if name not in ENGINES:
+        raise LookupError(f"Unknown CV engine '{name}'")
+    if not enabled(name):
+        raise LookupError(f"CV engine '{name}' is not enabled on this server (CV_ENGINES)")
+    if name not in instances:
+        with lock:
+            if name not in instances:
+                module, cls = ENGINES[name]
+                try:
+                    instances[name] = getattr(importlib.import_module(module), cls)()
+                except Exception as e:
+                    errors[name] = f"{type(e).__name__}: {e}"
+                    raise
+                errors.pop(name, None)
+                print(f"✅ CV engine '{name}' loaded")
+    return instances[name]
+
+
+def analyze_file(name, path, normalize=False):
+    """get(name).analyze_image(path): what the API runs in its process pools.
+    normalize first decodes the image and writes it back as PNG, as /analyze
+    has always done before OCR."""
+    if normalize:
+        import cv2
+        import numpy as np
+        image = cv2.imdecode(np.fromfile(path, np.uint8), cv2.IMREAD_COLOR)
+        cv2.imwrite(path, image)
+    return get(name).analyze_image(path)
+
+
+def preload():
+    """get() every enabled engine; the names that failed to load"""
+    failed = []
+    for name in ENGINES:
+        if enabled(name):
+            try:
+                get(name)
+            except Exception as e:
+                print(f"❌ CV engine '{name}' failed to load: {e}")
+                failed.append(name)
+    return failed
+
+
+def status():
+    return {name: {'enabled': enabled(name), 'loaded': name in instances, 'error': errors.get(name)}
+            for name in ENGINES}
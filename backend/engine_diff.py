@@ -0,0 +1,266 @@
+"""
+Cross-engine differential report for the panchang engines.
+
+Runs the same (date, city) pairs through
+
+  * swisseph:  drik-panchanga's compute_panchanga(), the reference
+  * skyfield:  the vectorized Sun/Moon search of transition_times() with de421
+  * chebyshev: the same with drik-panchanga's fitted ephemeris (ephemeris.bin),
+               when it is present
+  * analytic:  calculate_sun_position() / calculate_moon_position() less the
+               ayanamsa, with an hourly step and bisection search
+
+and reports, per engine and limb, how often the index at sunrise differs from
+the reference, the distribution of the end time errors (where the index
+agrees) and the time per (date, city). Limbs are taken at the reference
+sunrise so that the differences come from the positions alone; the sunrise of
+calculate_sunrise_sunset(), which the API uses with every engine, is compared
+separately.
+
+The engines that meet the accuracy budget (mismatch rate and 99th percentile
+end time error of every limb) are ranked by median latency:
+
+    python engine_diff.py --dates 1500 --budget 60 --max-mismatch 0.001 --output report.json
+
+1500 dates x 16 cities is 24000 pairs; use --engines to leave Skyfield out
+of quick runs.
+"""
+
+import json
+import time
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+import working_panchang_api as api   # puts drik-panchanga on sys.path
+import panchanga
+from benchmark import cities
+
+LIMBS = ('tithi', 'nakshatra', 'yoga', 'karana')
+ENGINES = ('swisseph', 'skyfield', 'chebyshev', 'analytic')
+FIRST_DATE = date(1990, 1, 1)
+DATE_STEP = 5   # days
+
+
+def dms_to_jd(jd, dms, tz):
+    """UT Julian day of a local [h, m, s] (hours may pass 24) on the date jd"""
+    return jd + (dms[0] + dms[1] / 60 + dms[2] / 3600 - tz) / 24
+
+
+def reference(jd, place):
+    """Sunrise and (index, end) of each limb from compute_panchanga(), in UT"""
+    p = panchanga.compute_panchanga(jd, place)
+    tz = place.timezone
+    limbs = {limb: (p[limb][0], dms_to_jd(jd, p[limb][1], tz)) for limb in LIMBS}
+    return p['sunrise'][0] - tz / 24, limbs
+
+
+def delta_t(jd_ut):
+    """TT - UT in days, as the backend's timescale has it"""
+    t = api.ts.ut1_jd(jd_ut)
+    return t.tt - t.ut1
+
+
+# -------------------------
+#  Backend engines
+# -------------------------
+def backend_limbs(jd_tt, ayanamsa_mode='lahiri'):
+    """Limbs at jd_tt from transition_times(), as calculate_panchang() does"""
+    return api.transition_times(jd_tt, ayanamsa_mode)
+
+
+def analytic_index(jd_tt, limb, ayanamsa_mode='lahiri'):
+    sun = api.calculate_sun_position(jd_tt)
+    moon = api.calculate_moon_position(jd_tt)
+    if limb == 'tithi':
+        return api.calculate_tithi(sun, moon)
+    if limb == 'karana':
+        return api.calculate_karana(sun, moon)
+    ayanamsa = api.get_ayanamsa(jd_tt, ayanamsa_mode)   # TT - UT moves it by well under 0.1"
+    sun, moon = (sun - ayanamsa) % 360, (moon - ayanamsa) % 360
+    if limb == 'nakshatra':
+        return api.calculate_nakshatra(moon)
+    return api.calculate_yoga(sun, moon)
+
+
+def step_transition(index_at, start, current, hours=28, iterations=10):
+    """End of `current` after start: an hourly step, then bisection of the hour"""
+    low = start
+    for i in range(1, hours):
+        high = start + i / 24.0
+        if index_at(high) != current:
+            for _ in range(iterations):
+                mid = (low + high) / 2
+                if index_at(mid) == current:
+                    low = mid
+                else:
+                    high = mid
+            return high
+        low = high
+    return start
+
+
+def analytic_limbs(jd_tt, ayanamsa_mode='lahiri'):
+    limbs = {}
+    for limb in LIMBS:
+        index_at = lambda jd, limb=limb: analytic_index(jd, limb, ayanamsa_mode)
+        index = index_at(jd_tt)
+        limbs[limb] = (index, step_transition(index_at, jd_tt, index))
+    return limbs
+
+
+fast_eph = None   # the backend's Chebyshev ephemeris, loaded once
+
+
+def use_fast_ephemeris(enabled):
+    """Switch get_all_planet_positions_jd() between the Chebyshev ephemeris and
+    Skyfield; False if the Chebyshev ephemeris is wanted but missing"""
+    global fast_eph
+    if enabled and fast_eph is None:
+        api.fast_eph = None
+        fast_eph = api.get_fast_eph() or False
+    api.fast_eph = fast_eph if enabled else False
+    return not enabled or bool(fast_eph)
+
+
+def prepare(engine):
+    """Load what the engine needs; the error message if it is not available"""
+    try:
+        if engine == 'skyfield':
+            use_fast_ephemeris(False)
+            api.get_eph()
+        elif engine == 'chebyshev':
+            if not use_fast_ephemeris(True):
+                return 'ephemeris.bin not found (run build_ephemeris.py)'
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def run_engine(engine, jd_sunrise):
+    """Limbs at the UT sunrise jd_sunrise, with end times in UT"""
+    dt = delta_t(jd_sunrise)
+    limbs = analytic_limbs(jd_sunrise + dt) if engine == 'analytic' else backend_limbs(jd_sunrise + dt)
+    return {limb: (index, end - dt) for limb, (index, end) in limbs.items()}
+
+
+# -------------------------
+#  Report
+# -------------------------
+def distribution(values):
+    if len(values) == 0:
+        return None
+    values = np.abs(np.asarray(values))
+    return {'p50': float(np.median(values)), 'p95': float(np.percentile(values, 95)),
+            'p99': float(np.percentile(values, 99)), 'max': float(values.max())}
+
+
+def pairs(ndates, city_list=cities):
+    for i in range(ndates):
+        d = FIRST_DATE + timedelta(days=i * DATE_STEP)
+        for name, lat, lon, tz in city_list:
+            yield d, name, panchanga.Place(lat, lon, tz)
+
+
+def compare_engines(ndates, engines=ENGINES, budget=60.0, max_mismatch=0.001):
+    engines = [e for e in engines if e != 'swisseph']
+    unavailable = {e: prepare(e) for e in engines}
+    engines = [e for e in engines if unavailable[e] is None]
+    latency = {e: [] for e in ['swisseph'] + engines}
+    mismatches = {e: {limb: 0 for limb in LIMBS} for e in engines}
+    errors = {e: {limb: [] for limb in LIMBS} for e in engines}
+    sunrise_errors = []
+    sunrise_failures = 0
+    n = 0
+
+    for d, name, place in pairs(ndates):
+        jd = panchanga.gregorian_to_jd(panchanga.Date(d.year, d.month, d.day))
+        start = time.perf_counter()
+        rise, ref = reference(jd, place)
+        latency['swisseph'].append(time.perf_counter() - start)
+        n += 1
+
+        try:
+            hour, _ = api.calculate_sunrise_sunset(d.year, d.month, d.day, place.latitude, place.longitude)
+            sunrise_errors.append((hour - ((rise - jd) * 24 + place.timezone)) * 3600)
+        except ValueError:
+            sunrise_failures += 1   # no sunrise by the formula
+
+        for engine in engines:
+            if engine in ('skyfield', 'chebyshev'):
+                use_fast_ephemeris(engine == 'chebyshev')
+            start = time.perf_counter()
+            limbs = run_engine(engine, rise)
+            latency[engine].append(time.perf_counter() - start)
+            for limb in LIMBS:
+                index, end = limbs[limb]
+                if index != ref[limb][0]:
+                    mismatches[engine][limb] += 1
+                else:
+                    errors[engine][limb].append((end - ref[limb][1]) * 86400)
+
+    report = {
+        'pairs': n,
+        'dates': {'first': FIRST_DATE.isoformat(), 'count': ndates, 'step_days': DATE_STEP},
+        'cities': [c[0] for c in cities],
+        'budget': {'end_error_p99_s': budget, 'mismatch_rate': max_mismatch},
+        'sunrise': {'error_s': distribution(sunrise_errors), 'failures': sunrise_failures},
+        'engines': {'swisseph': {'available': True, 'reference': True,
+                                 'latency_ms': distribution(np.array(latency['swisseph']) * 1000)}},
+    }
+    for engine, error in unavailable.items():
+        if error is not None:
+            report['engines'][engine] = {'available': False, 'error': error}
+
+    for engine in engines:
+        limbs = {}
+        for limb in LIMBS:
+            limbs[limb] = {'mismatch_rate': mismatches[engine][limb] / n,
+                           'end_error_s': distribution(errors[engine][limb])}
+        within = all(l['mismatch_rate'] <= max_mismatch and l['end_error_s'] is not None
+                     and l['end_error_s']['p99'] <= budget for l in limbs.values())
+        report['engines'][engine] = {'available': True, 'within_budget': within, 'limbs': limbs,
+                                     'latency_ms': distribution(np.array(latency[engine]) * 1000)}
+
+    candidates = [e for e, r in report['engines'].items() if r.get('within_budget') or r.get('reference')]
+    report['recommendation'] = min(candidates, key=lambda e: report['engines'][e]['latency_ms']['p50'])
+    return report
+
+
+def print_report(report):
+    print(f"📊 {report['pairs']} (date, city) pairs, budget: end time p99 <= "
+          f"{report['budget']['end_error_p99_s']:g} s, mismatch rate <= {report['budget']['mismatch_rate']:g}")
+    s = report['sunrise']
+    if s['error_s']:
+        print(f"   calculate_sunrise_sunset vs swisseph: p50 {s['error_s']['p50'] / 60:.1f} min, "
+              f"max {s['error_s']['max'] / 60:.1f} min, {s['failures']} without sunrise")
+    for engine, r in report['engines'].items():
+        if not r['available']:
+            print(f"⚠️  {engine}: not available ({r['error']})")
+            continue
+        print(f"⏱️  {engine}: {r['latency_ms']['p50']:.2f} ms/pair (p95 {r['latency_ms']['p95']:.2f})"
+              + (" [reference]" if r.get('reference') else
+                 (" ✅ within budget" if r['within_budget'] else " ❌ over budget")))
+        for limb, l in r.get('limbs', {}).items():
+            e = l['end_error_s']
+            errors = f"end error p50 {e['p50']:.1f} s, p99 {e['p99']:.1f} s, max {e['max']:.1f} s" if e else "no ends"
+            print(f"     {limb:10s} mismatch {l['mismatch_rate'] * 100:6.2f}%  {errors}")
+    print(f"🏁 Fastest engine within budget: {report['recommendation']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Differential accuracy and latency of the panchang engines')
+    parser.add_argument('--dates', type=int, default=1500, help=f'dates, every {DATE_STEP} days from {FIRST_DATE}')
+    parser.add_argument('--engines', default=','.join(ENGINES[1:]), help='comma separated, from ' + ', '.join(ENGINES[1:]))
+    parser.add_argument('--budget', type=float, default=60.0, help='99th percentile end time error, seconds')
+    parser.add_argument('--max-mismatch', type=float, default=0.001, help='share of limbs with a different index')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    report = compare_engines(args.dates, args.engines.split(','), args.budget, args.max_mismatch)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
@@ -0,0 +1,30 @@
+"""
+gunicorn settings of the Panchang API (see wsgi.py):
+
+    PANCHANG_WORKERS   worker processes (default: one per CPU)
+    PANCHANG_THREADS   threads per worker (default 8)
+    PORT               port to listen on (default 5002)
+    CV_ENGINES         CV engines this deployment may load (default all, see cv_engines.py)
+    CV_PRELOAD         1 to load them in the master too, instead of on first use
+    OCR_*, PALM_*      process pools of the CV endpoints (see offload.py); keep
+                       OCR_LIMIT + PALM_LIMIT below PANCHANG_THREADS
+"""
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5002')}"
+workers = int(os.environ.get('PANCHANG_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('PANCHANG_THREADS', 8))
+worker_class = 'gthread'
+
+# Load the app, and warm it up, once in the master before forking the workers
+preload_app = True
+
+# A year of /api/panchang/range is streamed over a few seconds
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,144 @@
+"""
+Bounded process pools for the CPU-bound work of the API.
+
+Each workload class has its own pool, so that a burst of one kind of work
+(an /analyze runs Tesseract 36 times, say) queues behind its own processes
+only. The CV routes (Flask async views) await the result while the work runs
+in the pool's processes; the request thread waits for it, so this bounds the
+CPU work rather than freeing the thread:
+
+    result = await offload.run('ocr', cv_engines.analyze_file, 'kundli', path)
+
+A workload admits at most `limit` calls at once, queued or running; one more
+raises Busy right away (the routes answer 503) rather than holding a server
+thread. Keep the limits of all workloads below the threads of a worker
+(PANCHANG_THREADS), and CV bursts always leave threads for /api/panchang.
+A call that takes longer than `timeout` seconds raises asyncio.TimeoutError
+(504). Its slot comes back only when the process has finished it, so a stuck
+pool sheds load instead of piling it up. For the same reason, what the work
+uses (an uploaded file, say) must outlive the request: `cleanup` is called
+once the call is over, whether it ran, failed, was cancelled or was refused.
+
+    await offload.run('palm', cv_engines.analyze_file, 'palm', path,
+                      cleanup=lambda: os.remove(path))
+
+A pool starts on first use in each process, so after gunicorn forks the
+workers, with the 'spawn' method: its processes import only what the work
+needs (the CV engines, which the server processes then never load).
+
+<WORKLOAD>_PROCESSES, <WORKLOAD>_LIMIT and <WORKLOAD>_TIMEOUT (e.g.
+OCR_PROCESSES=4) override the defaults below. OFFLOAD=0 runs the work in the
+request thread instead, with the limits but without timeouts.
+"""
+
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class Busy(Exception):
+    """The workload is at its limit of concurrent calls"""
+
+
+class Workload:
+    """A process pool with an admission limit and a timeout"""
+
+    def __init__(self, name, processes, limit, timeout):
+        prefix = name.upper()
+        self.name = name
+        self.processes = int(os.environ.get(f'{prefix}_PROCESSES', processes))
+        self.limit = int(os.environ.get(f'{prefix}_LIMIT', limit))
+        self.timeout = float(os.environ.get(f'{prefix}_TIMEOUT', timeout))
+        self.slots = threading.BoundedSemaphore(self.limit)
+        self.lock = threading.Lock()
+        self.pool = None
+        self.pid = None
+        self.stats = {'active': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def executor(self):
+        """This process's pool, started (or restarted after a crash) on demand"""
+        with self.lock:
+            if self.pool is None or self.pid != os.getpid():
+                self.pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+                self.pid = os.getpid()
+            return self.pool
+
+    def finished(self, future):
+        """Done callback: give the slot back and count the outcome"""
+        self.slots.release()
+        self.count('active', -1)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # A pool process died (in native code, say); start a new pool next time
+            with self.lock:
+                self.pool = None
+        self.count('failed' if error else 'completed')
+
+    async def run(self, fn, *args, cleanup=None):
+        """fn(*args) in the pool; Busy if the workload is at its limit.
+        cleanup() is called when the call is over, see above."""
+        if not self.slots.acquire(blocking=False):
+            self.count('rejected')
+            if cleanup:
+                cleanup()
+            raise Busy(f"Too many {self.name} requests at once, try again shortly")
+        self.count('active')
+
+        if os.environ.get('OFFLOAD', '1') == '0':
+            try:
+                return fn(*args)
+            finally:
+                self.slots.release()
+                self.count('active', -1)
+                if cleanup:
+                    cleanup()
+
+        try:
+            future = self.executor().submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            self.count('active', -1)
+            with self.lock:
+                self.pool = None
+            if cleanup:
+                cleanup()
+            raise
+        future.add_done_callback(self.finished)
+        if cleanup:
+            # Also after a timeout: the process may still be working on it
+            future.add_done_callback(lambda future: cleanup())
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.count('timeouts')
+            raise
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, processes=self.processes, limit=self.limit, timeout=self.timeout,
+                        started=self.pool is not None and self.pid == os.getpid())
+
+
+# Workload classes: OCR of kundli images (/analyze) and palm landmarks (/analyze-palm)
+workloads = {
+    'ocr': Workload('ocr', processes=2, limit=2, timeout=120),
+    'palm': Workload('palm', processes=1, limit=2, timeout=30),
+}
+
+
+async def run(workload, fn, *args, cleanup=None):
+    """Await fn(*args) in the process pool of a workload class"""
+    return await workloads[workload].run(fn, *args, cleanup=cleanup)
+
+
+def status():
+    return {name: workload.status() for name, workload in workloads.items()}
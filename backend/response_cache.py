@@ -0,0 +1,191 @@
+"""
+Two-level cache of panchang responses.
+
+An in-process LRU of serialized responses sits in front of a SQLite file that
+every worker process on the host reads and writes, so a date and place
+computed by one worker is served by all of them:
+
+    cache = ResponseCache('/var/cache/panchang.sqlite3')
+    body, state = cache.get(key)            # state: 'fresh', 'stale' or None
+    if state is None:
+        body = cache.put(key, compute())
+    elif state == 'stale':
+        cache.revalidate(key, compute)      # recomputed in the background
+
+Entries are fresh for `ttl` seconds and are then served stale, while one
+background thread recomputes them, for `stale_ttl` more seconds. The LRU keeps
+`max_entries` responses; the SQLite file keeps `max_rows`, dropping the least
+recently used and the expired ones. Any SQLite error (a locked or read-only
+file, say) is counted and the request goes on without the disk level.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU in front of a shared SQLite store, with stale-while-revalidate"""
+
+    EVICT_EVERY = 256   # puts between the size checks of the SQLite file
+
+    def __init__(self, path=None, max_entries=2048, max_rows=200000, ttl=7 * 86400, stale_ttl=30 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.memory = OrderedDict()   # key -> (body, stored)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pending = set()          # keys being revalidated
+        self.puts = 0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stale': 0,
+                      'revalidations': 0, 'evictions': 0, 'errors': 0}
+
+    # -------------------------
+    #  SQLite level
+    # -------------------------
+    def connection(self):
+        """This thread's connection, reopened after a fork (a gunicorn worker,
+        say) since SQLite connections must not cross processes."""
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                               'key TEXT PRIMARY KEY, body TEXT NOT NULL, '
+                               'stored REAL NOT NULL, used REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+            connection.commit()
+            self.local.connection, self.local.pid = connection, os.getpid()
+        return self.local.connection
+
+    def disk(self, operation, *args):
+        """operation(connection, *args), or None if there is no file or SQLite fails"""
+        if not self.path:
+            return None
+        try:
+            with self.connection() as connection:
+                return operation(connection, *args)
+        except sqlite3.Error as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"⚠️ Response cache: {e}")
+            return None
+
+    @staticmethod
+    def disk_get(connection, key, now):
+        row = connection.execute('SELECT body, stored FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            connection.execute('UPDATE responses SET used = ? WHERE key = ?', (now, key))
+        return row
+
+    @staticmethod
+    def disk_put(connection, key, body, now):
+        connection.execute('INSERT OR REPLACE INTO responses (key, body, stored, used) VALUES (?, ?, ?, ?)',
+                           (key, body, now, now))
+
+    def disk_evict(self, connection, now):
+        """Delete the expired rows, then the least recently used over max_rows"""
+        expired = connection.execute('DELETE FROM responses WHERE stored < ?',
+                                     (now - self.ttl - self.stale_ttl,)).rowcount
+        excess = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_rows
+        if excess > 0:
+            connection.execute('DELETE FROM responses WHERE key IN '
+                               '(SELECT key FROM responses ORDER BY used LIMIT ?)', (excess,))
+        return expired + max(excess, 0)
+
+    # -------------------------
+    #  Both levels
+    # -------------------------
+    def state(self, stored, now):
+        age = now - stored
+        if age < self.ttl:
+            return 'fresh'
+        if age < self.ttl + self.stale_ttl:
+            return 'stale'
+        return None
+
+    def remember(self, key, body, stored):
+        with self.lock:
+            self.memory[key] = (body, stored)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get(self, key):
+        """(body, 'fresh' or 'stale'), or (None, None) on a miss"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and self.state(entry[1], now):
+                self.memory.move_to_end(key)
+                state = self.state(entry[1], now)
+                self.stats['memory_hits'] += 1
+                self.stats['stale'] += state == 'stale'
+                return entry[0], state
+
+        row = self.disk(self.disk_get, key, now)
+        state = self.state(row[1], now) if row else None
+        with self.lock:
+            if state is None:
+                self.stats['misses'] += 1
+                return None, None
+            self.stats['disk_hits'] += 1
+            self.stats['stale'] += state == 'stale'
+        self.remember(key, row[0], row[1])
+        return row[0], state
+
+    def put(self, key, body):
+        """Store body (a string) in both levels; returns it"""
+        now = time.time()
+        self.remember(key, body, now)
+        self.disk(self.disk_put, key, body, now)
+        with self.lock:
+            self.puts += 1
+            evict = self.puts % self.EVICT_EVERY == 0
+        if evict:
+            evicted = self.disk(self.disk_evict, now)
+            with self.lock:
+                self.stats['evictions'] += evicted or 0
+        return body
+
+    def revalidate(self, key, compute):
+        """put(key, compute()) in a background thread, unless one is running for key"""
+        with self.lock:
+            if key in self.pending:
+                return
+            self.pending.add(key)
+            self.stats['revalidations'] += 1
+
+        def run():
+            try:
+                self.put(key, compute())
+            except Exception as e:
+                with self.lock:
+                    self.stats['errors'] += 1
+                print(f"⚠️ Response cache: revalidating {key} failed: {e}")
+            finally:
+                with self.lock:
+                    self.pending.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def status(self):
+        """Counters of this process, and the size of each level"""
+        with self.lock:
+            status = dict(self.stats, entries=len(self.memory), pending=len(self.pending))
+        status['rows'] = self.disk(lambda connection: connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0])
+        status['path'] = self.path
+        status['ttl'] = self.ttl
+        status['stale_ttl'] = self.stale_ttl
+        return status
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        self.disk(lambda connection: connection.execute('DELETE FROM responses'))
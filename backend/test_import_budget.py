@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+import subprocess
+
+# Cold start of the panchang path: importing working_panchang_api in a fresh
+# interpreter must stay within the budget and must not load the CV stack,
+# which cv_engines.py loads on first use instead.
+BUDGET_S = float(os.environ.get('IMPORT_BUDGET_S', 2.0))
+RUNS = 3
+CV_MODULES = ('cv2', 'mediapipe', 'pytesseract', 'vision_engine', 'palm_engine')
+
+IMPORT = """
+import sys, time, json
+start = time.perf_counter()
+import working_panchang_api
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'cv_modules': [m for m in %r if m in sys.modules]}))
+"""
+
+def cold_import():
+    result = subprocess.run([sys.executable, '-c', IMPORT % (CV_MODULES,)],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test():
+    print(f"Testing panchang import budget ({BUDGET_S} s)...")
+    runs = [cold_import() for _ in range(RUNS)]
+    seconds = min(run['seconds'] for run in runs)
+    cv_modules = runs[0]['cv_modules']
+
+    if cv_modules:
+        print("FAIL: CV modules imported with the panchang API:", ", ".join(cv_modules))
+    else:
+        print("PASS: no CV modules imported")
+    if seconds > BUDGET_S:
+        print(f"FAIL: import took {seconds:.2f} s, over the {BUDGET_S} s budget")
+    else:
+        print(f"PASS: import took {seconds:.2f} s")
+    assert not cv_modules, f"CV modules imported with the panchang API: {', '.join(cv_modules)}"
+    assert seconds <= BUDGET_S, f"import took {seconds:.2f} s, over the {BUDGET_S} s budget"
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,76 @@
+from response_cache import ResponseCache
+import os
+import time
+import tempfile
+
+def new_path():
+    return os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+
+def wait_revalidated(cache):
+    for _ in range(50):
+        if not cache.pending:
+            break
+        time.sleep(0.01)
+
+def test_memory_hit():
+    cache = ResponseCache(new_path(), max_entries=2)
+    assert cache.get('a') == (None, None)
+    cache.put('a', '{"tithi": 1}')
+    assert cache.get('a') == ('{"tithi": 1}', 'fresh')
+    print("PASS: miss, then memory hit")
+
+def test_lru_and_disk():
+    # Evicted from the LRU, still on disk
+    cache = ResponseCache(new_path(), max_entries=2)
+    cache.put('a', '{"tithi": 1}')
+    cache.put('b', '2')
+    cache.put('c', '3')
+    assert len(cache.memory) == 2
+    assert cache.get('a') == ('{"tithi": 1}', 'fresh')
+    assert cache.stats['disk_hits'] == 1
+    print("PASS: lru size, disk hit")
+
+def test_shared_file():
+    # Another worker reads the same file
+    path = new_path()
+    ResponseCache(path).put('b', '2')
+    assert ResponseCache(path).get('b') == ('2', 'fresh')
+    print("PASS: shared file")
+
+def test_stale_while_revalidate():
+    cache = ResponseCache(new_path(), ttl=0.2, stale_ttl=0.2)
+    cache.put('c', '3')
+    time.sleep(0.25)
+    assert cache.get('c') == ('3', 'stale')
+    cache.revalidate('c', lambda: '3b')
+    wait_revalidated(cache)
+    assert cache.get('c') == ('3b', 'fresh')
+    assert cache.stats['revalidations'] == 1
+
+    # Expired past the stale window
+    time.sleep(0.45)
+    assert cache.get('c') == (None, None)
+    print("PASS: stale, revalidated, expired")
+
+def test_row_limit():
+    small = ResponseCache(new_path(), max_rows=5)
+    small.EVICT_EVERY = 1
+    for i in range(10):
+        small.put(str(i), str(i))
+    assert small.status()['rows'] == 5
+    assert small.get('9')[0] == '9'
+    print("PASS: row limit")
+
+def test_memory_only():
+    # Without a file
+    memory = ResponseCache(None)
+    memory.put('a', '1')
+    assert memory.get('a') == ('1', 'fresh')
+    assert memory.status()['rows'] is None
+    print("PASS: memory only")
+
+if __name__ == "__main__":
+    print("Testing Response Cache...")
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
@@ -12,19 +12,23 @@ import math
 from skyfield.api import load
 from typing import Tuple
 import os
+import sys
 import base64
 import numpy as np
-import cv2
 import uuid
-from vision_engine import ThreeLayerEngine
-from palm_engine import PalmEngine
+import time
+import tempfile
+import asyncio
+import functools
+import cv_engines
+import offload
+from response_cache import ResponseCache
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize CV Engines
-kundli_engine = ThreeLayerEngine()
-palm_engine = PalmEngine()
+# CV Engines (vision_engine, palm_engine) load on first use, see cv_engines.py,
+# in the process pools of offload.py
 
 # -------------------------
 #  NEPAL SAMBAT CALCULATOR
@@ -71,9 +75,105 @@ def get_eph():
             raise e
     return eph
 
-def get_all_planet_positions_jd(jd: float) -> dict:
+# -------------------------
+#  Chebyshev ephemeris cache (optional)
+# -------------------------
+# drik-panchanga's fast_ephemeris.py evaluates the fitted Swiss ephemeris with
+# NumPy only. When its coefficient file is present, planet positions come from
+# it instead of observing each body through Skyfield.
+DRIK_PANCHANGA_PATH = os.environ.get(
+    'DRIK_PANCHANGA_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'drik-panchanga'))
+sys.path.append(DRIK_PANCHANGA_PATH)
+# Why a part of drik-panchanga is not available, for warmup() and /api/ready
+drik_errors = {}
+
+def drik_error(part, e):
+    drik_errors[part] = f"{type(e).__name__}: {e}"
+    print(f"⚠️ drik-panchanga {part} not available: {drik_errors[part]}")
+
+try:
+    import fast_ephemeris
+except ImportError as e:
+    drik_error('fast_ephemeris', e)
+    fast_ephemeris = None
+try:
+    # Interpolated ayanamsa tables; needs pyswisseph
+    import ayanamsa as ayanamsa_tables
+except ImportError as e:
+    drik_error('ayanamsa', e)
+    ayanamsa_tables = None
+try:
+    # Rahu kalam, Choghadiya, horas, ...; needs only NumPy
+    import muhurta
+except ImportError as e:
+    drik_error('muhurta', e)
+    muhurta = None
+try:
+    # Swiss ephemeris calls per request in an X-Ephemeris-Calls header, if SWE_PROFILE is set
+    import swe_profile
+    swe_profile.init_app(app)
+except ImportError as e:
+    drik_error('swe_profile', e)
+    swe_profile = None
+try:
+    # Limbs, end times and sunrise from the shared engines and cache; needs pyswisseph
+    import panchang_service
+    from panchanga import Date, Place, gregorian_to_jd, sunrise
+    # A pyswisseph with another API imports fine and fails only when called
+    sunrise(gregorian_to_jd(Date(2000, 1, 1)), Place(27.7172, 85.3240, 5.75))
+except Exception as e:
+    drik_error('panchang_service', e)
+    panchang_service = None
+
+AYANAMSA_MODES = ('lahiri', 'raman', 'kp', 'true_chitra')
+
+FAST_EPHEMERIS_BODIES = {
+    'sun': 0, 'moon': 1, 'mercury': 2, 'venus': 3, 'mars': 4, 'jupiter': 5, 'saturn': 6,
+}
+fast_eph = None
+
+def get_fast_eph():
+    """Load the Chebyshev ephemeris once; None if it is not available."""
+    global fast_eph
+    if fast_eph is None:
+        path = os.environ.get('FAST_EPHEMERIS_PATH',
+                              fast_ephemeris.default_path if fast_ephemeris else '')
+        if fast_ephemeris and os.path.exists(path):
+            fast_eph = fast_ephemeris.FastEphemeris(path)
+            print(f"✅ Chebyshev ephemeris loaded from {path}")
+        else:
+            fast_eph = False
+    return fast_eph or None
+
+def get_ayanamsa(jd_ut: float, ayanamsa_mode: str = 'lahiri') -> float:
+    """Ayanamsa in degrees at a UT Julian day (or a NumPy array of them), from
+    drik-panchanga's tables. Without them only Lahiri is available, as a
+    polynomial approximation."""
+    if ayanamsa_tables is not None:
+        if isinstance(jd_ut, np.ndarray):
+            return ayanamsa_tables.ayanamsa_ut(jd_ut, ayanamsa_mode)
+        return float(ayanamsa_tables.ayanamsa_ut(float(jd_ut), ayanamsa_mode))
+    if ayanamsa_mode != 'lahiri':
+        raise ValueError(f"Ayanamsa '{ayanamsa_mode}' requires pyswisseph")
+    n = (jd_ut - 2451545.0) / 36525.0
+    return 23.85 + 1.396 * n + 0.0003 * n**2
+
+def get_all_planet_positions_jd(jd: float, ayanamsa_mode: str = 'lahiri') -> dict:
     """Return longitudes for all major planets using proper astronomical calculation at specific JD."""
     t = ts.tt_jd(jd)
+    ayanamsa = get_ayanamsa(t.ut1, ayanamsa_mode)
+
+    cache = get_fast_eph()
+    if cache is not None and cache.covers(t.ut1):
+        # Nirayana longitudes from the fitted (sayana) ephemeris
+        positions = {name: float(cache.longitude(body, t.ut1) - ayanamsa) % 360
+                     for name, body in FAST_EPHEMERIS_BODIES.items()}
+        rahu_lon = (125.1228 - 0.0529536 * (jd - 2451545.0)) % 360
+        positions['rahu'] = rahu_lon
+        positions['ketu'] = (rahu_lon + 180) % 360
+        return positions
+
     local_eph = get_eph()
     earth = local_eph['earth']
     
@@ -87,15 +187,12 @@ def get_all_planet_positions_jd(jd: float) -> dict:
         'saturn': local_eph['saturn_barycenter'],
     }
     
-    # JD-based Lahiri Ayanamsa
-    n = (jd - 2451545.0) / 36525.0
-    ayan_lahiri = 23.85 + 1.396 * n + 0.0003 * n**2
-    
+    # The ayanamsa is measured from the equinox of date, so use the ecliptic of date
     positions = {}
     for name, body in planets.items():
         astrometric = earth.at(t).observe(body)
-        lat, lon, distance = astrometric.ecliptic_latlon()
-        positions[name] = (lon.degrees - ayan_lahiri) % 360
+        lat, lon, distance = astrometric.ecliptic_latlon(epoch='date')
+        positions[name] = (lon.degrees - ayanamsa) % 360
 
     # Mean Node calculation
     jd_j2000 = 2451545.0
@@ -120,9 +217,9 @@ def get_longitudes(gregorian_date: date) -> Tuple[float, float]:
     pos = get_all_planet_positions(gregorian_date)
     return pos['sun'], pos['moon']
 
-def get_element_index(jd, element_type):
+def get_element_index(jd, element_type, ayanamsa_mode='lahiri'):
     """Calculate the index (1-based) of a panchang element at a specific JD."""
-    pos = get_all_planet_positions_jd(jd)
+    pos = get_all_planet_positions_jd(jd, ayanamsa_mode)
     sun_long = pos['sun']
     moon_long = pos['moon']
     
@@ -139,28 +236,114 @@ def get_element_index(jd, element_type):
         return int(angle / 6) + 1
     return 0
 
-def find_transition_time(start_jd, element_type):
-    """Find the JD when the current element ends (within ~26 hours)."""
-    current_val = get_element_index(start_jd, element_type)
-    
-    # Step forward by 1 hour until the value changes
-    found_jd = None
-    last_jd = start_jd
-    for i in range(1, 28):
-        check_jd = start_jd + (i / 24.0)
-        if get_element_index(check_jd, element_type) != current_val:
-            # Binary search between last_jd and check_jd
-            low = last_jd
-            high = check_jd
-            for _ in range(10): # 10 iterations = ~3.5 seconds precision
-                mid = (low + high) / 2
-                if get_element_index(mid, element_type) == current_val:
-                    low = mid
-                else:
-                    high = mid
-            return high
-        last_jd = check_jd
-    return start_jd # Fallback
+def find_transition_time(start_jd, element_type, ayanamsa_mode='lahiri'):
+    """Find the JD when the current element ends (within ~30 hours)."""
+    return transition_times(start_jd, ayanamsa_mode)[element_type][1]
+
+def bisect_transition_time(low, high, element_type, current_val, iterations=10, ayanamsa_mode='lahiri'):
+    """Binary search for the JD in [low, high] where element_type changes from current_val."""
+    for _ in range(iterations): # 10 iterations over an hour = ~3.5 seconds precision
+        mid = (low + high) / 2
+        if get_element_index(mid, element_type, ayanamsa_mode) == current_val:
+            low = mid
+        else:
+            high = mid
+    return high
+
+def find_karana_end_time(start_jd, karana_num, tithi_end_jd):
+    """Find the JD when the karana at start_jd ends, given the end of the tithi.
+    A karana is half a tithi: an even karana ends with the tithi, an odd one at
+    its midpoint, which lies between start_jd and the tithi end."""
+    if karana_num % 2 == 0 or tithi_end_jd <= start_jd:
+        return tithi_end_jd
+    # Same ~3.5 second precision as find_transition_time over the longer interval
+    iterations = 10 + max(0, math.ceil(math.log2((tithi_end_jd - start_jd) * 24)))
+    return bisect_transition_time(start_jd, tithi_end_jd, 'karana', karana_num, iterations)
+
+# -------------------------
+#  Vectorized Sun/Moon transition search
+# -------------------------
+# The limbs depend on the Sun and Moon only, so transition_timeline() observes
+# just those two over a whole vector of instants per ts.tt_jd(array) call, and
+# finds the ends of tithi, nakshatra, yoga and karana from the same samples.
+LIMBS = ('tithi', 'nakshatra', 'yoga', 'karana')
+TRANSITION_HOURS = 30     # the longest nakshatra lasts a little over 27 hours
+TRANSITION_SAMPLES = 32   # per refinement round; two rounds resolve 1/1024 hour (~3.5 seconds)
+
+def get_sun_moon_jd(jds, ayanamsa_mode='lahiri'):
+    """Nirayana longitudes of the Sun and Moon at an array of TT Julian days."""
+    t = ts.tt_jd(np.asarray(jds, dtype=float))
+    ayanamsa = get_ayanamsa(t.ut1, ayanamsa_mode)
+
+    cache = get_fast_eph()
+    if cache is not None and cache.covers(t.ut1):
+        sun = cache.longitude(FAST_EPHEMERIS_BODIES['sun'], t.ut1)
+        moon = cache.longitude(FAST_EPHEMERIS_BODIES['moon'], t.ut1)
+    else:
+        local_eph = get_eph()
+        earth = local_eph['earth'].at(t)
+        sun = earth.observe(local_eph['sun']).ecliptic_latlon(epoch='date')[1].degrees
+        moon = earth.observe(local_eph['moon']).ecliptic_latlon(epoch='date')[1].degrees
+    return (sun - ayanamsa) % 360, (moon - ayanamsa) % 360
+
+def limb_indices(sun_long, moon_long):
+    """Index (1-based) of each limb for arrays of longitudes, as get_element_index() has it."""
+    tithi_angle = (moon_long - sun_long) % 360
+    return {
+        'tithi': (tithi_angle // 12).astype(int) + 1,
+        'nakshatra': (moon_long // (360 / 27)).astype(int) + 1,
+        'yoga': (((sun_long + moon_long) % 360) // (360 / 27)).astype(int) + 1,
+        'karana': (tithi_angle // 6).astype(int) + 1
+    }
+
+def transition_timeline(start_jd, hours, ayanamsa_mode='lahiri'):
+    """Every end of tithi, nakshatra, yoga and karana in the `hours` after start_jd:
+    {limb: (index at start_jd, array of the end JDs, array of the index after each)}.
+    An hourly grid brackets the ends, then two rounds of TRANSITION_SAMPLES points
+    narrow all the brackets of all the limbs at once: three Sun/Moon evaluations,
+    whether for one day or a year."""
+    grid = start_jd + np.arange(int(math.ceil(hours)) + 1) / 24.0
+    indices = limb_indices(*get_sun_moon_jd(grid, ayanamsa_mode))
+    low, high, before, after = {}, {}, {}, {}
+    for limb in LIMBS:
+        k = np.nonzero(np.diff(indices[limb]))[0]   # the index changes between grid[k] and grid[k + 1]
+        low[limb], high[limb] = grid[k], grid[k + 1]
+        before[limb], after[limb] = indices[limb][k], indices[limb][k + 1]
+
+    fractions = np.arange(1, TRANSITION_SAMPLES + 1) / TRANSITION_SAMPLES
+    for _ in range(2):
+        times = {limb: low[limb][:, None] + (high[limb] - low[limb])[:, None] * fractions for limb in LIMBS}
+        if not any(t.size for t in times.values()):
+            break
+        samples = limb_indices(*get_sun_moon_jd(np.concatenate([times[limb].ravel() for limb in LIMBS]),
+                                                ayanamsa_mode))
+        offset = 0
+        for limb in LIMBS:
+            size = times[limb].size
+            changed = samples[limb][offset:offset + size].reshape(times[limb].shape) != before[limb][:, None]
+            offset += size
+            k = np.argmax(changed, axis=1)
+            rows = np.arange(len(k))
+            found = changed[rows, k]
+            low[limb] = np.where(found & (k > 0), times[limb][rows, k - 1], low[limb])
+            high[limb] = np.where(found, times[limb][rows, k], high[limb])
+
+    return {limb: (int(indices[limb][0]), high[limb], after[limb]) for limb in LIMBS}
+
+def limbs_at(timeline, jd):
+    """{limb: (index at jd, JD when it ends)} from a transition_timeline() that
+    starts before jd; a limb that doesn't end within it gets jd."""
+    limbs = {}
+    for limb, (first, ends, indices) in timeline.items():
+        i = int(np.searchsorted(ends, jd, side='right'))
+        limbs[limb] = (int(indices[i - 1]) if i else first, float(ends[i]) if i < len(ends) else jd)
+    return limbs
+
+def transition_times(start_jd, ayanamsa_mode='lahiri'):
+    """{limb: (index at start_jd, JD when it ends)} for tithi, nakshatra, yoga and karana,
+    within TRANSITION_HOURS; a limb that doesn't end by then gets start_jd, like
+    find_transition_time() had."""
+    return limbs_at(transition_timeline(start_jd, TRANSITION_HOURS, ayanamsa_mode), start_jd)
 
 # -------------------------
 #  Core lunar helpers
@@ -439,12 +622,57 @@ def jd_to_time_str(jd, tz_offset=5.75):
     local_dt = dt + timedelta(hours=tz_offset)
     return local_dt.strftime("%H:%M")
 
+def dms_to_hour(dms):
+    """Decimal hours of an [h, m, s] time"""
+    return dms[0] + dms[1] / 60 + dms[2] / 3600
+
 def format_hour(hour):
     """Helper to format decimal hour to HH:MM"""
     h = int(hour)
     m = int((hour * 60) % 60)
     return f"{h:02d}:{m:02d}"
 
+def calculate_muhurtas(jd_base, sunrise_hour, sunset_hour, next_sunrise_hour, vaara_num, tz_offset=5.75):
+    """Muhurats, Rahu/Yamagandam/Gulika kaalam, Choghadiya and horas for one day,
+    from hours after jd_base (local midnight); next_sunrise_hour is past 24."""
+    def window(interval):
+        start, end = interval
+        return jd_to_time_str(jd_base + start / 24.0, tz_offset) + "-" + jd_to_time_str(jd_base + end / 24.0, tz_offset)
+
+    if muhurta is None:
+        # Without drik-panchanga, only the muhurats: 8th and 11th of the 15
+        # muhurtas of the day, 14th of the 15 of the night
+        day_part = (sunset_hour - sunrise_hour) / 15
+        night_part = (next_sunrise_hour - sunset_hour) / 15
+        return {
+            'muhurats': [
+                {'name': 'Brahma Muhurat', 'time': window((sunset_hour + 13 * night_part, sunset_hour + 14 * night_part))},
+                {'name': 'Abhijit Muhurat', 'time': window((sunrise_hour + 7 * day_part, sunrise_hour + 8 * day_part))},
+                {'name': 'Vijaya Muhurat', 'time': window((sunrise_hour + 10 * day_part, sunrise_hour + 11 * day_part))}
+            ],
+            'kaalam': None, 'choghadiya': None, 'horas': None
+        }
+
+    m = muhurta.muhurtas(sunrise_hour, sunset_hour, next_sunrise_hour, vaara_num)
+    kinds = m.choghadiya_kinds[0]
+    return {
+        'muhurats': [
+            {'name': 'Brahma Muhurat', 'time': window(m.brahma[0])},
+            {'name': 'Abhijit Muhurat', 'time': window(m.abhijit[0])},
+            {'name': 'Vijaya Muhurat', 'time': window(m.vijaya[0])}
+        ],
+        'kaalam': {
+            'rahu': window(m.rahu_kalam[0]),
+            'yamagandam': window(m.yamagandam[0]),
+            'gulika': window(m.gulika_kalam[0])
+        },
+        'choghadiya': {
+            'day': [{'name': muhurta.choghadiya_names[k], 'time': window(t)} for k, t in zip(kinds[:8], m.day_choghadiya[0])],
+            'night': [{'name': muhurta.choghadiya_names[k], 'time': window(t)} for k, t in zip(kinds[8:], m.night_choghadiya[0])]
+        },
+        'horas': [{'lord': muhurta.hora_planets[k], 'time': window(t)} for k, t in zip(m.hora_lords[0], m.horas[0])]
+    }
+
 def get_nakshatra_name(index):
     # Handle wrapping 27 -> 1, 28 -> 1 etc.
     idx = ((index - 1) % 27) + 1
@@ -463,8 +691,13 @@ def get_karana_name(index):
         return SANSKRIT_NAMES['karanas'].get(index - 58 + 9)
 
 
+def remove_upload(path):
+    """cleanup of an offloaded CV call: the upload it worked on"""
+    if os.path.exists(path):
+        os.remove(path)
+
 @app.route('/analyze', methods=['POST'])
-def analyze():
+async def analyze():
     try:
         data = request.json
         if not data or 'image' not in data:
@@ -473,25 +706,27 @@ def analyze():
         img_str = data['image']
         if ',' in img_str:
             img_str = img_str.split(',')[1]
-            
-        nparr = np.frombuffer(base64.b64decode(img_str), np.uint8)
-        temp_path = f"temp_cv_{uuid.uuid4()}.png"
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        cv2.imwrite(temp_path, img)
+        img_bytes = base64.b64decode(img_str)
         
-        result = kundli_engine.analyze_image(temp_path)
+        temp_path = f"temp_cv_{uuid.uuid4()}.png"
+        with open(temp_path, "wb") as f:
+            f.write(img_bytes)
         
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-            
+        # Decoded, written back as PNG and read by the OCR engine in the 'ocr' process pool,
+        # which owns the file from here: it may still be reading it after a timeout
+        result = await offload.run('ocr', cv_engines.analyze_file, 'kundli', temp_path, True,
+                                   cleanup=functools.partial(remove_upload, temp_path))
         return jsonify({"horoscope_data": result})
         
+    except (LookupError, offload.Busy) as e:
+        return jsonify({"valid": False, "errors": [str(e)]}), 503
+    except asyncio.TimeoutError:
+        return jsonify({"valid": False, "errors": ["Image analysis timed out"]}), 504
     except Exception as e:
         return jsonify({"valid": False, "errors": [str(e)]}), 500
 
 @app.route('/analyze-palm', methods=['POST'])
-def analyze_palm():
-    temp_path = None
+async def analyze_palm():
     try:
         data = request.json
         if not data or 'image' not in data:
@@ -505,207 +740,422 @@ def analyze_palm():
         with open(temp_path, "wb") as f:
             f.write(img_bytes)
             
-        result = palm_engine.analyze_image(temp_path)
-        
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
-            
+        result = await offload.run('palm', cv_engines.analyze_file, 'palm', temp_path,
+                                   cleanup=functools.partial(remove_upload, temp_path))
         return jsonify({"horoscope_data": result})
         
+    except (LookupError, offload.Busy) as e:
+        return jsonify({"valid": False, "reason": str(e)}), 503
+    except asyncio.TimeoutError:
+        return jsonify({"valid": False, "reason": "Palm analysis timed out"}), 504
     except Exception as e:
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
         return jsonify({"valid": False, "reason": str(e)}), 500
 
 @app.route('/', methods=['GET'])
 def index():
     return jsonify({"success": True, "message": "Nirvana Panchang API is running", "version": "1.1.1"})
 
-@app.route('/api/panchang', methods=['POST'])
-def calculate_panchang():
-    """Calculate panchang for given date and location with high precision transition times"""
-    try:
-        data = request.get_json()
-        
-        # Validate required fields
-        if not data or 'year' not in data or 'month' not in data or 'day' not in data:
-            return jsonify({'success': False, 'error': 'Missing required fields: year, month, day'}), 400
+# -------------------------
+#  Response cache
+# -------------------------
+# /api/panchang responses, keyed on date, place (on a grid of
+# PANCHANG_CACHE_GRID degrees), timezone, ayanamsa and engine, in an LRU in
+# front of a SQLite file shared by the workers (see response_cache.py).
+# PANCHANG_CACHE=0 turns it off.
+RESPONSE_VERSION = 1   # bump when the response or its computation changes
+RANGE_MAX_DAYS = 366   # days per /api/panchang/range request
+RANGE_CHUNK_DAYS = 31  # days per transition timeline, so that the first lines come early
+if os.environ.get('PANCHANG_CACHE', '1') != '0':
+    response_cache = ResponseCache(
+        os.environ.get('PANCHANG_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'panchang_cache.sqlite3')),
+        max_entries=int(os.environ.get('PANCHANG_CACHE_SIZE', 2048)),
+        max_rows=int(os.environ.get('PANCHANG_CACHE_ROWS', 200000)),
+        ttl=float(os.environ.get('PANCHANG_CACHE_TTL', 7 * 86400)),
+        stale_ttl=float(os.environ.get('PANCHANG_CACHE_STALE', 30 * 86400)))
+else:
+    response_cache = None
 
-        try:
-            year = int(data.get('year'))
-            month = int(data.get('month'))
-            day = int(data.get('day'))
-        except (ValueError, TypeError):
-             return jsonify({'success': False, 'error': 'Invalid date values: year, month, and day must be integers'}), 400
+try:
+    from panchang_service import snap_to_grid
+except ImportError:
+    # Without drik-panchanga, places are cached as given
+    def snap_to_grid(degrees):
+        return degrees
 
-        # Safe conversion for optional fields
+def request_place(latitude, longitude, timezone_val):
+    """Latitude, longitude (on the grid) and timezone of a request, each the
+    default where it is missing or not a number, for /api/panchang and the range"""
+    place = []
+    for value, default in zip((latitude, longitude, timezone_val), (27.7172, 85.3240, 5.75)):
         try:
-            latitude = float(data.get('latitude', 27.7172))
-            longitude = float(data.get('longitude', 85.3240))
-            timezone_val = float(data.get('timezone', 5.75))
+            place.append(float(value))
         except (ValueError, TypeError):
-             # Fallback to defaults if conversion fails
-             latitude = 27.7172
-             longitude = 85.3240
-             timezone_val = 5.75
-        
-        # Base JD at midnight UTC for the given date
-        # Gregorian date at 00:00:00 local time
-        dt_local = datetime(year, month, day, 0, 0, 0)
-        dt_utc = dt_local - timedelta(hours=timezone_val)
-        jd_base = ts.utc(dt_utc.year, dt_utc.month, dt_utc.day, dt_utc.hour, dt_utc.minute).tt
-        
+            place.append(default)
+    return snap_to_grid(place[0]), snap_to_grid(place[1]), place[2]
+
+def response_engine(precision):
+    """The engine a request is computed with, for the cache key"""
+    if panchang_service is not None:
+        engine, tol = panchang_service.resolve(precision)
+        return engine.name + ('-newton' if tol else '')
+    return 'chebyshev' if get_fast_eph() else 'skyfield'
+
+def panchang_key(year, month, day, latitude, longitude, timezone_val, ayanamsa_mode, precision):
+    """Response cache key of a date and (grid) place"""
+    return (f"{year:04d}-{month:02d}-{day:02d}|{latitude}|{longitude}|{timezone_val}|"
+            f"{ayanamsa_mode}|{response_engine(precision)}|{RESPONSE_VERSION}")
+
+def engine_error(ayanamsa_mode, precision):
+    """400 response for an unknown or unavailable ayanamsa or precision, else None"""
+    if ayanamsa_mode not in AYANAMSA_MODES:
+        return jsonify({'success': False, 'error': f"Invalid ayanamsa: expected one of {', '.join(AYANAMSA_MODES)}"}), 400
+    if ayanamsa_mode != 'lahiri' and ayanamsa_tables is None:
+        return jsonify({'success': False, 'error': f"Ayanamsa '{ayanamsa_mode}' is not available on this server"}), 400
+    # Engine: 'high', 'standard', 'fast' or an engine name (see panchang_service)
+    if panchang_service is None and precision is not None:
+        return jsonify({'success': False, 'error': "Precision is not available on this server"}), 400
+    if panchang_service is not None and not panchang_service.valid_precision(precision):
+        return jsonify({'success': False, 'error': f"Invalid precision: expected one of {', '.join(panchang_service.choices)}"}), 400
+    return None
+
+def local_midnight_jd(year, month, day, timezone_val):
+    """TT Julian day of 00:00 local time on a date"""
+    dt_utc = datetime(year, month, day, 0, 0, 0) - timedelta(hours=timezone_val)
+    return ts.utc(dt_utc.year, dt_utc.month, dt_utc.day, dt_utc.hour, dt_utc.minute).tt
+
+def build_panchang(year, month, day, latitude, longitude, timezone_val, ayanamsa_mode='lahiri', precision=None,
+                   timeline=None, days=None):
+    """The /api/panchang response for a date and place, with validated parameters.
+    With the panchang service, the day and the next one come from `days`, that
+    pair of panchang_service.compute_range(), if it is given; without it, the
+    limbs come from `timeline`, a transition_timeline() from before the day's
+    sunrise, if one is given."""
+    # Base JD at midnight UTC for the given date
+    # Gregorian date at 00:00:00 local time
+    jd_base = local_midnight_jd(year, month, day, timezone_val)
+    
+    if panchang_service is not None:
+        # Sunrise, limbs and end times (hours after local midnight) from the shared service
+        place = Place(latitude, longitude, timezone_val)
+        jd = gregorian_to_jd(Date(year, month, day))
+        panchanga, next_panchanga = days or (panchang_service.compute(jd, place, precision, ayanamsa_mode),
+                                             panchang_service.compute(jd + 1, place, precision, ayanamsa_mode))
+        engine = panchanga['engine']
+        sunrise_hour = dms_to_hour(panchanga['sunrise'][1])
+        sunset_hour = dms_to_hour(panchanga['sunset'][1])
+        next_sunrise_hour = dms_to_hour(next_panchanga['sunrise'][1])
+        jd_sunrise = jd_base + (sunrise_hour / 24.0)
+        tithi_num = panchanga['tithi'][0]
+        nakshatra_num = panchanga['nakshatra'][0]
+        yoga_num = panchanga['yoga'][0]
+        karana_num = panchanga['karana'][0]
+        vaara_num = panchanga['vaara']
+        tithi_end_time, nakshatra_end_time, yoga_end_time, karana_end_time = (
+            format_hour(dms_to_hour(panchanga[limb][1]) % 24)
+            for limb in ('tithi', 'nakshatra', 'yoga', 'karana'))
+    else:
         # Calculate sunrise/sunset to get the "Panchang day" start
+        engine = 'chebyshev' if get_fast_eph() else 'skyfield'
         sunrise_hour, sunset_hour = calculate_sunrise_sunset(year, month, day, latitude, longitude)
+        next_date = date(year, month, day) + timedelta(days=1)
+        next_sunrise_hour, _ = calculate_sunrise_sunset(next_date.year, next_date.month, next_date.day, latitude, longitude)
         jd_sunrise = jd_base + (sunrise_hour / 24.0)
         
-        # Planet positions at sunrise (The canonical moment for daily Panchang)
-        planet_pos = get_all_planet_positions_jd(jd_sunrise)
-        sun_long = planet_pos['sun']
-        moon_long = planet_pos['moon']
-        
-        # Calculate current panchang elements at sunrise
-        tithi_num = get_element_index(jd_sunrise, 'tithi')
-        nakshatra_num = get_element_index(jd_sunrise, 'nakshatra')
-        yoga_num = get_element_index(jd_sunrise, 'yoga')
-        karana_num = get_element_index(jd_sunrise, 'karana')
+        # Panchang elements at sunrise and their precise end times, from one set of Sun/Moon samples
+        limbs = limbs_at(timeline, jd_sunrise) if timeline else transition_times(jd_sunrise, ayanamsa_mode)
+        tithi_num, tithi_end_jd = limbs['tithi']
+        nakshatra_num, nakshatra_end_jd = limbs['nakshatra']
+        yoga_num, yoga_end_jd = limbs['yoga']
+        karana_num, karana_end_jd = limbs['karana']
         vaara_num = calculate_vaara(jd_sunrise)
         
-        # Precise transition times (End times)
-        tithi_end_jd = find_transition_time(jd_sunrise, 'tithi')
-        nakshatra_end_jd = find_transition_time(jd_sunrise, 'nakshatra')
-        yoga_end_jd = find_transition_time(jd_sunrise, 'yoga')
-        # Karana ends at tithi boundary or half-tithi
-        karana_end_jd = find_transition_time(jd_sunrise, 'karana')
-        
-        # Determine paksha
-        paksha = 'Shukla' if tithi_num <= 15 else 'Krishna'
-        tithi_display = tithi_num if tithi_num <= 15 else tithi_num - 15
-        
-        # Formatting times
-        sunrise_time = format_hour(sunrise_hour)
-        sunset_time = format_hour(sunset_hour)
-        
-        # Moonrise/set approximations
-        days_since_new_moon = (jd_sunrise - 2451545) % 29.53
-        moonrise_offset = (days_since_new_moon * 50) / 60
-        moonrise_hour = (sunrise_hour + moonrise_offset) % 24
-        moonset_hour = (moonrise_hour + 12) % 24
-        
         # Transition times strings
         tithi_end_time = jd_to_time_str(tithi_end_jd, timezone_val) if tithi_end_jd else "Full Day"
         nakshatra_end_time = jd_to_time_str(nakshatra_end_jd, timezone_val) if nakshatra_end_jd else "Full Day"
         yoga_end_time = jd_to_time_str(yoga_end_jd, timezone_val) if yoga_end_jd else "Full Day"
         karana_end_time = jd_to_time_str(karana_end_jd, timezone_val) if karana_end_jd else "Full Day"
+    
+    # Planet positions at sunrise (The canonical moment for daily Panchang)
+    planet_pos = get_all_planet_positions_jd(jd_sunrise, ayanamsa_mode)
+    sun_long = planet_pos['sun']
+    moon_long = planet_pos['moon']
+    
+    # Determine paksha
+    paksha = 'Shukla' if tithi_num <= 15 else 'Krishna'
+    tithi_display = tithi_num if tithi_num <= 15 else tithi_num - 15
+    
+    # Formatting times
+    sunrise_time = format_hour(sunrise_hour)
+    sunset_time = format_hour(sunset_hour)
+    
+    # Moonrise/set approximations
+    days_since_new_moon = (jd_sunrise - 2451545) % 29.53
+    moonrise_offset = (days_since_new_moon * 50) / 60
+    moonrise_hour = (sunrise_hour + moonrise_offset) % 24
+    moonset_hour = (moonrise_hour + 12) % 24
+    
+    # Next elements
+    next_tithi_num = (tithi_num % 30) + 1
+    next_nakshatra_num = (nakshatra_num % 27) + 1
+    
+    # Ayan calculation
+    # Tropical 270 is roughly 246.2 Sidereal (Lahiri)
+    sun_lon_deg = math.degrees(sun_long) % 360
+    if 270 <= sun_lon_deg or sun_lon_deg < 90:
+         ayan_name = "उत्तरायण"
+    else:
+         ayan_name = "दक्षिणायन"
+
+    # Correct Nepali Date for response
+    bs_info = calculate_bikram_sambat_date(date(year, month, day))
+    nepali_date_formatted = f"२०८२-{bs_info['month']}-{bs_info['day']}" # Simplified dynamic
+
+    # Karana Name
+    if karana_num == 1:
+        karana_display_name = SANSKRIT_NAMES['karanas'].get(1)
+    elif 1 < karana_num < 58:
+        karana_display_name = SANSKRIT_NAMES['karanas'].get((karana_num - 2) % 7 + 2)
+    else:
+        karana_display_name = SANSKRIT_NAMES['karanas'].get(karana_num - 58 + 9)
+
+    # Muhurats from sunrise, sunset and the next sunrise
+    muhurta_windows = calculate_muhurtas(jd_base, sunrise_hour, sunset_hour, 24 + next_sunrise_hour, vaara_num, timezone_val)
+
+    response = {
+        'success': True,
+        'date': {'year': year, 'month': month, 'day': day},
+        'engine': engine,
+        'tithi': {
+            'number': tithi_display,
+            'name': SANSKRIT_NAMES['tithis'].get(tithi_num),
+            'paksha': paksha,
+            'end_time': tithi_end_time
+        },
+        'nakshatra': {
+            'number': nakshatra_num,
+            'name': SANSKRIT_NAMES['nakshatras'].get(nakshatra_num),
+            'end_time': nakshatra_end_time
+        },
+        'yoga': {
+            'number': yoga_num,
+            'name': SANSKRIT_NAMES['yogas'].get(yoga_num),
+            'end_time': yoga_end_time
+        },
+        'karana': {
+            'number': karana_num,
+            'name': karana_display_name,
+            'end_time': karana_end_time
+        },
+        'timings': {
+            'sunrise': sunrise_time,
+            'sunset': sunset_time,
+            'moonrise': f"{int(moonrise_hour):02d}:{int((moonrise_hour % 1) * 60):02d}",
+            'moonset': f"{int(moonset_hour):02d}:{int((moonset_hour % 1) * 60):02d}"
+        },
+        'nextTithi': {
+            'name': SANSKRIT_NAMES['tithis'].get(next_tithi_num),
+            'changeTime': tithi_end_time
+        },
+        'nextNakshatra': {
+            'name': SANSKRIT_NAMES['nakshatras'].get(next_nakshatra_num),
+            'changeTime': nakshatra_end_time
+        },
+        'planetary': {
+            'sun': {'sign': get_raasi_name(planet_pos['sun']), 'longitude': f"{planet_pos['sun']:.2f}°"},
+            'moon': {'sign': get_raasi_name(planet_pos['moon']), 'longitude': f"{planet_pos['moon']:.2f}°"},
+            'mars': {'sign': get_raasi_name(planet_pos['mars']), 'longitude': f"{planet_pos['mars']:.2f}°"},
+            'mercury': {'sign': get_raasi_name(planet_pos['mercury']), 'longitude': f"{planet_pos['mercury']:.2f}°"},
+            'jupiter': {'sign': get_raasi_name(planet_pos['jupiter']), 'longitude': f"{planet_pos['jupiter']:.2f}°"},
+            'venus': {'sign': get_raasi_name(planet_pos['venus']), 'longitude': f"{planet_pos['venus']:.2f}°"},
+            'saturn': {'sign': get_raasi_name(planet_pos['saturn']), 'longitude': f"{planet_pos['saturn']:.2f}°"},
+            'rahu': {'sign': get_raasi_name(planet_pos['rahu']), 'longitude': f"{planet_pos['rahu']:.2f}°"},
+            'ketu': {'sign': get_raasi_name(planet_pos['ketu']), 'longitude': f"{planet_pos['ketu']:.2f}°"},
+            'aspects': {
+                'sunMoon': calculate_aspect(planet_pos['sun'], planet_pos['moon']),
+                'marsJupiter': calculate_aspect(planet_pos['mars'], planet_pos['jupiter']),
+                'venusMercury': calculate_aspect(planet_pos['venus'], planet_pos['mercury'])
+            }
+        },
+        'calendar': {
+            'nepaliDate': nepali_date_formatted,
+            'englishDate': f"{year}-{month}-{day}",
+            'hinduMonth': SANSKRIT_NAMES['masas'].get(((month-3)%12)+1),
+            'dayLength': f"{int(sunset_hour - sunrise_hour)}h {int(((sunset_hour - sunrise_hour) % 1) * 60)}m",
+            'ayan': ayan_name,
+            'ayanamsa': ayanamsa_mode
+        },
+        'muhurats': muhurta_windows['muhurats'],
+        'kaalam': muhurta_windows['kaalam'],
+        'choghadiya': muhurta_windows['choghadiya'],
+        'horas': muhurta_windows['horas'],
+        'eras': calculate_eras(year, month, day)
+    }
+    return response
+
+@app.route('/api/panchang', methods=['POST'])
+def calculate_panchang():
+    """Calculate panchang for given date and location with high precision transition times"""
+    try:
+        data = request.get_json()
         
-        # Next elements
-        next_tithi_num = (tithi_num % 30) + 1
-        next_nakshatra_num = (nakshatra_num % 27) + 1
-        
-        # Ayan calculation
-        # Tropical 270 is roughly 246.2 Sidereal (Lahiri)
-        sun_lon_deg = math.degrees(sun_long) % 360
-        if 270 <= sun_lon_deg or sun_lon_deg < 90:
-             ayan_name = "उत्तरायण"
-        else:
-             ayan_name = "दक्षिणायन"
+        # Validate required fields
+        if not data or 'year' not in data or 'month' not in data or 'day' not in data:
+            return jsonify({'success': False, 'error': 'Missing required fields: year, month, day'}), 400
 
-        # Correct Nepali Date for response
-        bs_info = calculate_bikram_sambat_date(date(year, month, day))
-        nepali_date_formatted = f"२०८२-{bs_info['month']}-{bs_info['day']}" # Simplified dynamic
+        try:
+            year = int(data.get('year'))
+            month = int(data.get('month'))
+            day = int(data.get('day'))
+        except (ValueError, TypeError):
+             return jsonify({'success': False, 'error': 'Invalid date values: year, month, and day must be integers'}), 400
 
-        # Karana Name
-        if karana_num == 1:
-            karana_display_name = SANSKRIT_NAMES['karanas'].get(1)
-        elif 1 < karana_num < 58:
-            karana_display_name = SANSKRIT_NAMES['karanas'].get((karana_num - 2) % 7 + 2)
+        # Nearby places share cache entries: compute for the coordinates on the grid
+        latitude, longitude, timezone_val = request_place(
+            data.get('latitude'), data.get('longitude'), data.get('timezone'))
+
+        ayanamsa_mode = str(data.get('ayanamsa', 'lahiri')).lower()
+        precision = data.get('precision')
+        error = engine_error(ayanamsa_mode, precision)
+        if error:
+            return error
+        
+        compute = lambda: app.json.dumps(build_panchang(year, month, day, latitude, longitude,
+                                                        timezone_val, ayanamsa_mode, precision))
+        if response_cache is None:
+            body, state = compute(), 'off'
         else:
-            karana_display_name = SANSKRIT_NAMES['karanas'].get(karana_num - 58 + 9)
-
-        # Muhurats (Inline calculation replacing missing helper)
-        muhurats = [
-            {'name': 'Brahma Muhurat', 'time': jd_to_time_str(jd_sunrise - 1.6/24, timezone_val) + "-" + jd_to_time_str(jd_sunrise - 0.8/24, timezone_val)},
-            {'name': 'Abhijit Muhurat', 'time': jd_to_time_str(jd_sunrise + (sunset_hour-sunrise_hour)/2/24 - 0.4/24, timezone_val) + "-" + jd_to_time_str(jd_sunrise + (sunset_hour-sunrise_hour)/2/24 + 0.4/24, timezone_val)},
-            {'name': 'Vijaya Muhurat', 'time': "14:00-14:48"}
-        ]
-
-        response = {
-            'success': True,
-            'date': {'year': year, 'month': month, 'day': day},
-            'tithi': {
-                'number': tithi_display,
-                'name': SANSKRIT_NAMES['tithis'].get(tithi_num),
-                'paksha': paksha,
-                'end_time': tithi_end_time
-            },
-            'nakshatra': {
-                'number': nakshatra_num,
-                'name': SANSKRIT_NAMES['nakshatras'].get(nakshatra_num),
-                'end_time': nakshatra_end_time
-            },
-            'yoga': {
-                'number': yoga_num,
-                'name': SANSKRIT_NAMES['yogas'].get(yoga_num),
-                'end_time': yoga_end_time
-            },
-            'karana': {
-                'number': karana_num,
-                'name': karana_display_name,
-                'end_time': karana_end_time
-            },
-            'timings': {
-                'sunrise': sunrise_time,
-                'sunset': sunset_time,
-                'moonrise': f"{int(moonrise_hour):02d}:{int((moonrise_hour % 1) * 60):02d}",
-                'moonset': f"{int(moonset_hour):02d}:{int((moonset_hour % 1) * 60):02d}"
-            },
-            'nextTithi': {
-                'name': SANSKRIT_NAMES['tithis'].get(next_tithi_num),
-                'changeTime': tithi_end_time
-            },
-            'nextNakshatra': {
-                'name': SANSKRIT_NAMES['nakshatras'].get(next_nakshatra_num),
-                'changeTime': nakshatra_end_time
-            },
-            'planetary': {
-                'sun': {'sign': get_raasi_name(planet_pos['sun']), 'longitude': f"{planet_pos['sun']:.2f}°"},
-                'moon': {'sign': get_raasi_name(planet_pos['moon']), 'longitude': f"{planet_pos['moon']:.2f}°"},
-                'mars': {'sign': get_raasi_name(planet_pos['mars']), 'longitude': f"{planet_pos['mars']:.2f}°"},
-                'mercury': {'sign': get_raasi_name(planet_pos['mercury']), 'longitude': f"{planet_pos['mercury']:.2f}°"},
-                'jupiter': {'sign': get_raasi_name(planet_pos['jupiter']), 'longitude': f"{planet_pos['jupiter']:.2f}°"},
-                'venus': {'sign': get_raasi_name(planet_pos['venus']), 'longitude': f"{planet_pos['venus']:.2f}°"},
-                'saturn': {'sign': get_raasi_name(planet_pos['saturn']), 'longitude': f"{planet_pos['saturn']:.2f}°"},
-                'rahu': {'sign': get_raasi_name(planet_pos['rahu']), 'longitude': f"{planet_pos['rahu']:.2f}°"},
-                'ketu': {'sign': get_raasi_name(planet_pos['ketu']), 'longitude': f"{planet_pos['ketu']:.2f}°"},
-                'aspects': {
-                    'sunMoon': calculate_aspect(planet_pos['sun'], planet_pos['moon']),
-                    'marsJupiter': calculate_aspect(planet_pos['mars'], planet_pos['jupiter']),
-                    'venusMercury': calculate_aspect(planet_pos['venus'], planet_pos['mercury'])
-                }
-            },
-            'calendar': {
-                'nepaliDate': nepali_date_formatted,
-                'englishDate': f"{year}-{month}-{day}",
-                'hinduMonth': SANSKRIT_NAMES['masas'].get(((month-3)%12)+1),
-                'dayLength': f"{int(sunset_hour - sunrise_hour)}h {int(((sunset_hour - sunrise_hour) % 1) * 60)}m",
-                'ayan': ayan_name
-            },
-            'muhurats': muhurats,
-            'eras': calculate_eras(year, month, day)
-        }
+            key = panchang_key(year, month, day, latitude, longitude, timezone_val, ayanamsa_mode, precision)
+            body, state = response_cache.get(key)
+            if state is None:
+                body, state = response_cache.put(key, compute()), 'miss'
+            elif state == 'stale':
+                response_cache.revalidate(key, compute)
         
-        return jsonify(response)
+        response = app.response_class(body, mimetype='application/json')
+        response.headers['X-Cache'] = 'HIT' if state == 'fresh' else state.upper()
+        return response
         
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/panchang/range', methods=['GET'])
+def panchang_range():
+    """The /api/panchang response of every day from start to end (inclusive), streamed
+    as NDJSON, one line per day as it is ready. Days come from the response cache
+    where it has them; the others are computed RANGE_CHUNK_DAYS days at a time,
+    in one pass of panchang_service.compute_range() (or without the service,
+    from one transition timeline)."""
+    try:
+        start = date.fromisoformat(request.args.get('start', ''))
+        end = date.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid or missing start/end: expected YYYY-MM-DD'}), 400
+    ndays = (end - start).days + 1
+    if not 1 <= ndays <= RANGE_MAX_DAYS:
+        return jsonify({'success': False, 'error': f"end must be from start to {RANGE_MAX_DAYS} days after it"}), 400
+
+    latitude, longitude, timezone_val = request_place(
+        request.args.get('lat'), request.args.get('lon'), request.args.get('tz'))
+    ayanamsa_mode = request.args.get('ayanamsa', 'lahiri').lower()
+    precision = request.args.get('precision')
+    error = engine_error(ayanamsa_mode, precision)
+    if error:
+        return error
+
+    def generate():
+        timeline, chunk, chunk_start, chunk_until = None, None, 0, 0
+        for i in range(ndays):
+            d = start + timedelta(days=i)
+            try:
+                key = panchang_key(d.year, d.month, d.day, latitude, longitude, timezone_val, ayanamsa_mode, precision)
+                body, state = response_cache.get(key) if response_cache is not None else (None, None)
+                if state is None:
+                    if i >= chunk_until:
+                        # The next RANGE_CHUNK_DAYS days, from this one
+                        chunk_start, chunk_until = i, i + min(RANGE_CHUNK_DAYS, ndays - i)
+                        if panchang_service is not None:
+                            # One more day for the next sunrise of the last one
+                            chunk = panchang_service.compute_range(
+                                gregorian_to_jd(Date(d.year, d.month, d.day)), chunk_until - i + 1,
+                                Place(latitude, longitude, timezone_val), precision, ayanamsa_mode)
+                        else:
+                            # Their sunrises, which are after this local midnight
+                            timeline = transition_timeline(local_midnight_jd(d.year, d.month, d.day, timezone_val),
+                                                           (chunk_until - i) * 24 + TRANSITION_HOURS, ayanamsa_mode)
+                    days = chunk[i - chunk_start:i - chunk_start + 2] if chunk else None
+                    body = app.json.dumps(build_panchang(d.year, d.month, d.day, latitude, longitude,
+                                                         timezone_val, ayanamsa_mode, precision, timeline, days))
+                    if response_cache is not None:
+                        response_cache.put(key, body)
+                elif state == 'stale':
+                    response_cache.revalidate(key, lambda d=d: app.json.dumps(build_panchang(
+                        d.year, d.month, d.day, latitude, longitude, timezone_val, ayanamsa_mode, precision)))
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                yield app.json.dumps({'success': False, 'date': {'year': d.year, 'month': d.month, 'day': d.day},
+                                      'error': str(e)}) + '\n'
+                return
+            yield body + '\n'
+
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
+# -------------------------
+#  Warmup and readiness
+# -------------------------
+# warmup() loads what the first request would otherwise wait for: the
+# ephemerides, drik-panchanga's tables and the code paths of one panchang.
+# wsgi.py runs it in the gunicorn master before the workers fork, so that they
+# share the loaded pages copy-on-write.
+readiness = {'ready': False, 'seconds': None, 'errors': {}}
+
+def warmup(latitude=27.7172, longitude=85.3240, timezone_val=5.75):
+    """Load the ephemerides and compute today's panchang; True if that worked
+    with every part of drik-panchanga (see drik_errors) available."""
+    start = time.perf_counter()
+    errors = {}
+    missing = dict(drik_errors)
+    if not get_fast_eph() and fast_ephemeris is not None:
+        path = os.environ.get('FAST_EPHEMERIS_PATH', fast_ephemeris.default_path)
+        missing['ephemeris'] = f"No Chebyshev ephemeris at {path} (see build_ephemeris.py)"
+    if missing:
+        errors['drik-panchanga'] = missing
+    try:
+        get_eph()
+    except Exception as e:
+        # Not needed when the Chebyshev ephemeris and the panchang service cover the dates
+        errors['skyfield'] = f"{type(e).__name__}: {e}"
+    today = date.today()
+    try:
+        build_panchang(today.year, today.month, today.day, latitude, longitude, timezone_val)
+    except Exception as e:
+        errors['panchang'] = f"{type(e).__name__}: {e}"
+    ready = 'panchang' not in errors and 'drik-panchanga' not in errors
+    readiness.update(ready=ready, seconds=round(time.perf_counter() - start, 3), errors=errors)
+    print(("✅ Warmed up" if readiness['ready'] else "❌ Warmup failed") + f" in {readiness['seconds']} s")
+    return readiness['ready']
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: 200 once warmup() has computed a panchang with all of
+    drik-panchanga, 503 until then (or with what is missing)"""
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'Precise Panchang API'})
+    health = {'status': 'healthy', 'service': 'Precise Panchang API'}
+    if panchang_service is not None:
+        health['panchang'] = panchang_service.status()
+    if response_cache is not None:
+        health['cache'] = response_cache.status()
+    health['cv'] = cv_engines.status()
+    health['offload'] = offload.status()
+    return jsonify(health)
 
 if __name__ == '__main__':
     print("🚀 Starting Precise Panchang API Server...")
+    warmup()
     app.run(debug=True, host='0.0.0.0', port=5002, use_reloader=False)
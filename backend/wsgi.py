@@ -0,0 +1,26 @@
+"""
+Production entry point of the Panchang API:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app (see gunicorn.conf.py) this module is imported once, in the
+master process: the timescale, name tables and ephemerides are loaded and one
+panchang is computed before the workers fork, and the workers share those
+pages copy-on-write. /api/ready answers 200 once this warmup has worked.
+"""
+
+import os
+import gc
+
+import cv_engines
+from working_panchang_api import app, warmup
+
+warmup()
+
+# Processes serving the CV endpoints can load their engines up front too
+if os.environ.get('CV_PRELOAD') == '1':
+    cv_engines.preload()
+
+# Keep the garbage collector from touching (and so copying) the preloaded
+# objects in every worker
+gc.freeze()
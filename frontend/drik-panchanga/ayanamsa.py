@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+
+# ayanamsa.py -- ayanamsa tables for an explicitly chosen system
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Ayanamsa (sayana - nirayana longitude) for a given system, passed explicitly
+instead of through swe.set_sid_mode(), which is global to the process.
+
+Values come from tables of swisseph's ayanamsa at every `steps[mode]` days,
+interpolated by 4-point Lagrange (cubic) interpolation. Tables are built in
+blocks of `block_size` samples on first use; building is the only time the
+global sidereal mode is touched, under `lock`, and it is left at Lahiri.
+Afterwards lookups need neither swisseph nor the lock, so threads can mix
+systems freely.
+
+Error bound, checked against swisseph by ayanamsa_tests(): at most
+ERROR_BOUND[mode] degrees. The mean systems are smooth polynomials in time;
+True Chitra follows the apparent position of Spica, so nutation and
+aberration need a much finer table.
+"""
+
+from __future__ import division
+import threading
+import numpy as np
+import swisseph as swe
+
+LAHIRI, RAMAN, KP, TRUE_CHITRA = 'lahiri', 'raman', 'kp', 'true_chitra'
+
+sid_modes = {LAHIRI: swe.SIDM_LAHIRI, RAMAN: swe.SIDM_RAMAN,
+             KP: swe.SIDM_KRISHNAMURTI, TRUE_CHITRA: swe.SIDM_TRUE_CITRA}
+
+# Table step in days
+steps = {LAHIRI: 64, RAMAN: 64, KP: 64, TRUE_CHITRA: 0.5}
+
+# Degrees (2e-7 deg = 0.0007 arcsec)
+ERROR_BOUND = {LAHIRI: 1e-10, RAMAN: 1e-10, KP: 1e-10, TRUE_CHITRA: 2e-7}
+
+origin = 2451545.0   # J2000; block 0 starts here
+block_size = 1024
+blocks = {}          # (mode, block number) -> block_size + 3 samples
+lock = threading.Lock()
+
+def swe_ayanamsa(jd, mode):
+  """Ayanamsa straight from swisseph, for a float or an array of jd"""
+  with lock:
+    swe.set_sid_mode(sid_modes[mode])
+    try:
+      return np.vectorize(swe.get_ayanamsa_ut, otypes = [float])(jd)
+    finally:
+      swe.set_sid_mode(swe.SIDM_LAHIRI)
+
+def table(mode, n):
+  """Samples of block n: from origin + (n * block_size - 1) * step, so that
+     the 4 points around any instant of the block are in the same table"""
+  samples = blocks.get((mode, n))
+  if samples is None:
+    step = steps[mode]
+    start = origin + (n * block_size - 1) * step
+    samples = swe_ayanamsa(start + np.arange(block_size + 3) * step, mode)
+    samples = blocks.setdefault((mode, n), samples)
+  return samples
+
+def ayanamsa_ut(jd, mode = LAHIRI):
+  """Ayanamsa in degrees at jd (UT) for mode (LAHIRI, RAMAN, KP or
+     TRUE_CHITRA). jd may be a float or a NumPy array."""
+  if mode not in sid_modes:
+    raise ValueError("unknown ayanamsa %r, expected one of %s" % (mode, ", ".join(sorted(sid_modes))))
+  step = steps[mode]
+  if isinstance(jd, float):
+    pos = (jd - origin) / step
+    i = int(pos // 1)
+    n, j = divmod(i, block_size)
+    p0, p1, p2, p3 = table(mode, n)[j:j + 4]
+  else:
+    jd = np.asarray(jd, dtype = float)
+    pos = (jd - origin) / step
+    i = np.floor(pos).astype(int)
+    n, j = np.divmod(i, block_size)
+    p = np.empty(jd.shape + (4,))
+    for b in np.unique(n):
+      here = (n == b)
+      p[here] = table(mode, int(b))[j[here, np.newaxis] + np.arange(4)]
+    p0, p1, p2, p3 = p[..., 0], p[..., 1], p[..., 2], p[..., 3]
+  # Lagrange interpolation with nodes at -1, 0, 1, 2 steps from i
+  x = pos - i
+  return (- x * (x - 1) * (x - 2) / 6 * p0 + (x + 1) * (x - 1) * (x - 2) / 2 * p1
+          - (x + 1) * x * (x - 2) / 2 * p2 + (x + 1) * x * (x - 1) / 6 * p3)
+
+def ayanamsa_tests(samples = 2000):
+  """Asserts the documented error bounds at random instants in 1800 - 2200"""
+  rng = np.random.RandomState(0)
+  jds = rng.uniform(2378496.5, 2524593.5, samples)
+  for mode in sorted(sid_modes):
+    error = abs(ayanamsa_ut(jds, mode) - swe_ayanamsa(jds, mode)).max()
+    print("%-11s max error %.2e deg" % (mode, error))
+    assert(error < ERROR_BOUND[mode])
+    assert(ayanamsa_ut(float(jds[0]), mode) == ayanamsa_ut(jds[:1], mode)[0])
+
+if __name__ == "__main__":
+  ayanamsa_tests()
@@ -0,0 +1,261 @@
+#! /usr/bin/env python
+
+# benchmark.py -- accuracy and latency suite for the panchanga functions
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Checks the expected values documented in panchanga.py's *_tests() and times
+the core functions over a fixed matrix of dates and cities:
+
+    python benchmark.py [--quick] [--output results.json]
+    python benchmark.py --compare baseline.json [--threshold 1.25]
+
+Accuracy: every Fixture calls a function for a date and place and compares
+the result with the documented value, limb indices exactly and times within
+`tolerance` seconds. The documented times predate the current ephemeris and
+ayanamsa tables and are off by up to a minute (rise and set of the Moon, by
+up to two). An expected value may be a prefix of the result, e.g. [10] when
+only the index is documented.
+
+Latency: each function of `benchmarks` is called once per (date, city) of the
+matrix, after one warm-up call (which fills the ayanamsa tables, the lunation
+index and the fast ephemeris). The JSON output has the mean, median, 95th
+percentile and maximum time per call in ms, the accuracy failures and the
+environment (versions, and whether lunations.npy and ephemeris.bin are used,
+which change the timings a lot).
+
+With --compare, the medians are checked against a previous output and the
+exit status is 1 if any is slower by more than the threshold ratio (and by
+more than `noise_ms`), or if an accuracy check failed.
+"""
+
+from __future__ import division
+from collections import namedtuple as struct
+import sys
+import time
+import json
+import platform
+import argparse
+import numpy as np
+import swisseph as swe
+from panchanga import (tithi, nakshatra, yoga, karana, vaara, masa, sunrise, sunset,
+                       moonrise, moonset, compute_panchanga, gregorian_to_jd,
+                       ephemeris_cache, lunation_index, Date, Place)
+
+Fixture = struct('Fixture', ['function', 'date', 'place', 'expected', 'tolerance'])
+
+bangalore = Place(12.972, 77.594, +5.5)
+shillong = Place(25.569, 91.883, +5.5)
+helsinki = Place(60.17, 24.935, +2.0)
+
+limb_tolerance = 60   # seconds
+rise_tolerance = 120
+
+# From tithi_tests(), nakshatra_tests(), yoga_tests(), masa_tests() and all_tests()
+fixtures = [
+  Fixture('tithi', Date(2009, 7, 15), bangalore, [23, [27, 7, 9]], limb_tolerance),
+  Fixture('tithi', Date(2013, 1, 18), bangalore, [7, [16, 24, 4]], limb_tolerance),
+  Fixture('tithi', Date(1985, 6, 9), bangalore, [22, [25, 3, 22]], limb_tolerance),
+  Fixture('tithi', Date(2013, 1, 18), helsinki, [7, [12, 54, 4]], limb_tolerance),
+  Fixture('tithi', Date(2010, 4, 24), bangalore, [10, [6, 9, 18], 11, [27, 33, 50]], limb_tolerance),
+  Fixture('tithi', Date(2013, 2, 3), bangalore, [22, [8, 13, 52], 23, [30, 33, 6]], limb_tolerance),
+  Fixture('tithi', Date(2013, 4, 19), helsinki, [9, [28, 44, 60]], limb_tolerance),
+  Fixture('tithi', Date(2013, 4, 20), helsinki, [10], limb_tolerance),
+  Fixture('tithi', Date(2013, 4, 21), helsinki, [10, [5, 22, 6]], limb_tolerance),
+  Fixture('nakshatra', Date(2009, 7, 15), bangalore, [27, [17, 6, 24]], limb_tolerance),
+  Fixture('nakshatra', Date(2013, 1, 18), bangalore, [27, [19, 22, 54]], limb_tolerance),
+  Fixture('nakshatra', Date(1985, 6, 9), bangalore, [24, [26, 32, 36]], limb_tolerance),
+  Fixture('nakshatra', Date(2009, 6, 21), shillong, [3, [5, 0, 59], 4, [26, 31, 0]], limb_tolerance),
+  Fixture('yoga', Date(1985, 6, 9), bangalore, [1, [22, 59, 38]], limb_tolerance),
+  Fixture('yoga', Date(2013, 1, 18), bangalore, [21, [29, 10, 40]], limb_tolerance),
+  Fixture('yoga', Date(2013, 5, 22), helsinki, [16, [6, 20, 25], 17, [27, 21, 53]], limb_tolerance),
+  Fixture('karana', Date(2013, 1, 18), helsinki, [14, [12, 54, 4]], limb_tolerance),
+  Fixture('vaara', Date(2013, 1, 18), bangalore, 5, 0),
+  Fixture('masa', Date(2013, 2, 10), bangalore, [10, False], 0),
+  Fixture('masa', Date(2012, 8, 17), bangalore, [5, False], 0),
+  Fixture('masa', Date(2012, 8, 18), bangalore, [6, True], 0),
+  Fixture('masa', Date(2012, 9, 18), bangalore, [6, False], 0),
+  Fixture('masa', Date(2012, 5, 20), helsinki, [2, False], 0),
+  Fixture('masa', Date(2012, 5, 21), helsinki, [3, False], 0),
+  Fixture('sunrise', Date(2013, 1, 18), bangalore, [6, 47, 20], rise_tolerance),
+  Fixture('sunset', Date(2013, 1, 18), bangalore, [18, 12, 58], rise_tolerance),
+  Fixture('moonrise', Date(2013, 1, 18), bangalore, [11, 28, 6], rise_tolerance),
+  Fixture('moonset', Date(2013, 1, 18), bangalore, [24, 12, 48], rise_tolerance),
+]
+
+functions = {
+  'tithi': tithi,
+  'nakshatra': nakshatra,
+  'yoga': yoga,
+  'karana': karana,
+  'vaara': lambda jd, place: vaara(jd),
+  'masa': masa,
+  'sunrise': lambda jd, place: sunrise(jd, place)[1],
+  'sunset': lambda jd, place: sunset(jd, place)[1],
+  'moonrise': moonrise,
+  'moonset': moonset,
+  'panchanga': compute_panchanga,
+}
+
+benchmarks = ['tithi', 'nakshatra', 'yoga', 'masa', 'sunrise', 'panchanga']
+
+# name, latitude, longitude, standard time zone (no DST)
+cities = [
+  ('Bangalore', 12.972, 77.594, +5.5),
+  ('Chennai', 13.083, 80.270, +5.5),
+  ('Mumbai', 19.076, 72.878, +5.5),
+  ('Ujjain', 23.179, 75.785, +5.5),
+  ('Varanasi', 25.318, 82.974, +5.5),
+  ('Shillong', 25.569, 91.883, +5.5),
+  ('Delhi', 28.614, 77.209, +5.5),
+  ('Kathmandu', 27.717, 85.324, +5.75),
+  ('Colombo', 6.927, 79.861, +5.5),
+  ('Singapore', 1.352, 103.820, +8.0),
+  ('Durban', -29.859, 31.021, +2.0),
+  ('London', 51.507, -0.128, 0.0),
+  ('Helsinki', 60.170, 24.935, +2.0),
+  ('New York', 40.713, -74.006, -5.0),
+  ('Vancouver', 49.283, -123.121, -8.0),
+  ('Sydney', -33.869, 151.209, +10.0),
+]
+
+first_date, date_step = Date(1990, 1, 1), 97   # days; steps through seasons and weekdays
+ndates, quick_ndates, quick_ncities = 40, 6, 4
+
+noise_ms = 0.05
+
+def matrix(quick = False):
+  """[(jd, city name, Place)] of the benchmark"""
+  n = quick_ndates if quick else ndates
+  first = gregorian_to_jd(first_date)
+  dates = [first + i * date_step for i in range(n)]
+  places = cities[:quick_ncities] if quick else cities
+  return [(jd, name, Place(lat, lon, tz)) for jd in dates for name, lat, lon, tz in places]
+
+def is_dms(x):
+  return isinstance(x, list) and len(x) == 3 and \
+         all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in x)
+
+def agrees(got, expected, tolerance):
+  """Whether got matches expected: [h, m, s] within tolerance seconds, lists
+     item by item over the length of expected, anything else exactly"""
+  if is_dms(expected):
+    seconds = lambda dms: dms[0] * 3600 + dms[1] * 60 + dms[2]
+    return is_dms(got) and abs(seconds(got) - seconds(expected)) <= tolerance
+  if isinstance(expected, list):
+    return isinstance(got, list) and len(got) >= len(expected) and \
+           all(agrees(g, e, tolerance) for g, e in zip(got, expected))
+  return got == expected
+
+def check_fixtures():
+  """[failure description] of the fixtures that disagree"""
+  failures = []
+  for f in fixtures:
+    got = functions[f.function](gregorian_to_jd(f.date), f.place)
+    if not agrees(got, f.expected, f.tolerance):
+      failures.append({'function': f.function, 'date': '%04d-%02d-%02d' % f.date,
+                       'place': list(f.place), 'expected': f.expected, 'got': got})
+  return failures
+
+def time_function(function, cases):
+  """Seconds taken by each call of function over cases"""
+  function(cases[0][0], cases[0][2])   # warm-up
+  times = []
+  for jd, name, place in cases:
+    start = time.perf_counter()
+    function(jd, place)
+    times.append(time.perf_counter() - start)
+  return np.array(times)
+
+def latency(times):
+  ms = times * 1000
+  return {'calls': len(ms), 'mean_ms': float(ms.mean()), 'p50_ms': float(np.median(ms)),
+          'p95_ms': float(np.percentile(ms, 95)), 'max_ms': float(ms.max())}
+
+def environment():
+  first = gregorian_to_jd(first_date)
+  return {'python': platform.python_version(), 'numpy': np.__version__,
+          'swisseph': getattr(swe, 'version', None), 'platform': platform.platform(),
+          'lunation_index': lunation_index(first) is not None,
+          'fast_ephemeris': ephemeris_cache(first) is not None}
+
+def run(quick = False):
+  cases = matrix(quick)
+  failures = check_fixtures()
+  results = {
+    'environment': environment(),
+    'matrix': {'dates': len(set(c[0] for c in cases)), 'cities': sorted(set(c[1] for c in cases)),
+               'first_date': '%04d-%02d-%02d' % first_date, 'step_days': date_step},
+    'accuracy': {'fixtures': len(fixtures), 'failed': len(failures), 'failures': failures},
+    'latency': {},
+  }
+  for name in benchmarks:
+    results['latency'][name] = latency(time_function(functions[name], cases))
+  return results
+
+def compare(results, baseline, threshold):
+  """[(function, baseline ms, ms, ratio)] of the medians that regressed"""
+  regressions = []
+  for name, stats in sorted(results['latency'].items()):
+    before = baseline.get('latency', {}).get(name)
+    if before is None: continue
+    old, new = before['p50_ms'], stats['p50_ms']
+    if new > old * threshold and new - old > noise_ms:
+      regressions.append((name, old, new, new / old))
+  return regressions
+
+def summary(results):
+  lines = ['%-10s %7s %9s %9s %9s %9s' % ('function', 'calls', 'mean ms', 'p50 ms', 'p95 ms', 'max ms')]
+  for name in benchmarks:
+    s = results['latency'][name]
+    lines.append('%-10s %7d %9.3f %9.3f %9.3f %9.3f' % (name, s['calls'], s['mean_ms'], s['p50_ms'],
+                                                      s['p95_ms'], s['max_ms']))
+  a = results['accuracy']
+  lines.append('accuracy: %d/%d fixtures agree' % (a['fixtures'] - a['failed'], a['fixtures']))
+  for f in a['failures']:
+    lines.append('  %(function)s %(date)s %(place)s: expected %(expected)s, got %(got)s' % f)
+  return '\n'.join(lines)
+
+def benchmark_tests():
+  assert(agrees([23, [27, 7, 39]], [23, [27, 7, 9]], 60))
+  assert(not agrees([23, [27, 7, 39]], [23, [27, 7, 9]], 10))
+  assert(not agrees([22, [27, 7, 9]], [23, [27, 7, 9]], 60))
+  assert(agrees([10, [29, 22, 7]], [10], 60))
+  assert(agrees([6, 47, 6], [6, 47, 20], 60))
+  assert(agrees([6, True], [6, True], 0) and not agrees([6, False], [6, True], 0))
+  assert(not check_fixtures())
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description = 'Accuracy and latency of the panchanga functions')
+  parser.add_argument('--quick', action = 'store_true', help = 'a small matrix, for a smoke test')
+  parser.add_argument('--output', help = 'write the results as JSON to this file')
+  parser.add_argument('--compare', metavar = 'BASELINE', help = 'JSON results of a previous run')
+  parser.add_argument('--threshold', type = float, default = 1.25,
+                      help = 'slowdown ratio of the median that counts as a regression')
+  args = parser.parse_args()
+
+  results = run(args.quick)
+  print(summary(results))
+  if args.output:
+    with open(args.output, 'w') as fp:
+      json.dump(results, fp, indent = 2, default = str)
+
+  failed = results['accuracy']['failed'] > 0
+  if args.compare:
+    with open(args.compare) as fp:
+      baseline = json.load(fp)
+    if baseline.get('environment') != results['environment']:
+      print('warning: the baseline ran in a different environment: %s' % baseline.get('environment'))
+    regressions = compare(results, baseline, args.threshold)
+    for name, old, new, ratio in regressions:
+      print('REGRESSION %s: median %.3f ms -> %.3f ms (x%.2f)' % (name, old, new, ratio))
+    if not regressions: print('no latency regressions against %s' % args.compare)
+    failed = failed or bool(regressions)
+  sys.exit(1 if failed else 0)
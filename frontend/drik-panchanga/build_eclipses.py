@@ -0,0 +1,31 @@
+#! /usr/bin/env python
+
+# build_eclipses.py -- generates the eclipse index
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Finds every solar and lunar eclipse between two years and writes them to
+the table read by panchanga.eclipse_index(). Run once:
+
+    python build_eclipses.py [first_year last_year [output]]
+"""
+
+from __future__ import division
+import sys
+import numpy as np
+from panchanga import Date, gregorian_to_jd, find_eclipses, eclipse_kinds, eclipses_path
+
+if __name__ == "__main__":
+  first_year, last_year = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (1900, 2100)
+  output = sys.argv[3] if len(sys.argv) > 3 else eclipses_path
+  table = find_eclipses(gregorian_to_jd(Date(first_year, 1, 1)), gregorian_to_jd(Date(last_year + 1, 1, 1)))
+  np.save(output, table)
+  counts = [int((table['kind'] == k).sum()) for k in range(len(eclipse_kinds))]
+  print("%d solar and %d lunar eclipses written to %s" % (counts[0], counts[1], output))
@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+
+# build_ephemeris.py -- fits the Chebyshev ephemeris cache
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Fits the Sun, Moon, planets and Lahiri ayanamsa with Chebyshev polynomials
+(see fast_ephemeris.py), writes them to a single file and checks the result
+against the Swiss ephemeris. Run once:
+
+    python build_ephemeris.py [first_year last_year [output]]
+"""
+
+from __future__ import division
+import sys
+import numpy as np
+from numpy.polynomial import chebyshev
+import swisseph as swe
+import fast_ephemeris
+from fast_ephemeris import FastEphemeris, AYANAMSA, segments, ERROR_BOUND, SPEED_ERROR_BOUND
+from ayanamsa import swe_ayanamsa, LAHIRI
+from panchanga import Date, gregorian_to_jd
+
+def swe_longitude(body, jd):
+  if body == AYANAMSA:
+    return float(swe_ayanamsa(jd, LAHIRI))
+  return swe.calc_ut(jd, body, swe.FLG_SWIEPH)[0][0]
+
+def swe_speed(body, jd, h = 1e-3):
+  """Daily motion by central difference of swe positions. (The FLG_SPEED
+     values of the Moshier ephemeris are only good to about 1e-4 deg/day.)"""
+  return ((swe_longitude(body, jd + h) - swe_longitude(body, jd - h) + 180) % 360 - 180) / (2 * h)
+
+def fit(body, start, nseg):
+  """Coefficients of shape (nseg, degree + 1), interpolating at Chebyshev nodes"""
+  span, degree = segments[body]
+  n = degree + 1
+  x = np.cos(np.pi * (np.arange(n) + 0.5) / n)
+  coeffs = np.empty((nseg, n))
+  for i in range(nseg):
+    jds = start + i * span + (x + 1) * span / 2
+    y = np.unwrap([swe_longitude(body, jd) for jd in jds], period = 360)
+    coeffs[i] = chebyshev.chebfit(x, y, degree)
+  return coeffs
+
+def build(first_year, last_year, path):
+  start = gregorian_to_jd(Date(first_year, 1, 1))
+  end = gregorian_to_jd(Date(last_year + 1, 1, 1))
+  bodies = {}
+  for body, (span, degree) in segments.items():
+    nseg = int(np.ceil((end - start) / span))
+    bodies[body] = (start, span, fit(body, start, nseg))
+  fast_ephemeris.write(path, bodies)
+
+def ephemeris_tests(path = fast_ephemeris.default_path, samples = 2000):
+  """Asserts the documented error bounds at random instants"""
+  eph = FastEphemeris(path)
+  rng = np.random.RandomState(0)
+  for body in segments:
+    first, last = eph.range(body)
+    jds = rng.uniform(first, last, samples)
+    expected = [swe_longitude(body, jd) for jd in jds]
+    error = (eph.evaluate(body, jds)[0] - expected + 180) % 360 - 180
+    worst = abs(error).max()
+    print("body %2d: max error %.2e deg" % (body, worst))
+    assert(worst < ERROR_BOUND[body])
+    if body != AYANAMSA:
+      speed_error = abs(eph.speed(body, jds) - [swe_speed(body, jd) for jd in jds]).max()
+      print("         max speed error %.2e deg/day" % speed_error)
+      assert(speed_error < SPEED_ERROR_BOUND[body])
+
+if __name__ == "__main__":
+  first_year, last_year = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (1900, 2100)
+  output = sys.argv[3] if len(sys.argv) > 3 else fast_ephemeris.default_path
+  build(first_year, last_year, output)
+  print("Ephemeris for %d-%d written to %s" % (first_year, last_year, output))
+  ephemeris_tests(output)
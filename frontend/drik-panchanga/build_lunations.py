@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+
+# build_lunations.py -- generates the lunation and sankranti index
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Finds every new moon and sankranti (nirayana solar ingress) between two
+years and writes them to the table read by
+panchanga.lunation_index(). Run once:
+
+    python build_lunations.py [first_year last_year [output]]
+"""
+
+from __future__ import division
+import sys
+import numpy as np
+from ayanamsa import ayanamsa_ut
+from panchanga import (Date, gregorian_to_jd, solar_longitude, lunar_longitude, solar_motion,
+                       limb_motion, ayanamsa_rate, crossings, raasi,
+                       lunation_dtype, lunation_kinds, lunations_path)
+
+def angles(jd):
+  """[elongation of the moon, nirayana sun] at jd, in degrees"""
+  sun = solar_longitude(jd)
+  return [(lunar_longitude(jd) - sun) % 360, (sun - ayanamsa_ut(jd)) % 360]
+
+def elongation_motion(jd):
+  return limb_motion('tithi', jd)
+
+def nirayana_solar_motion(jd):
+  sun, speed = solar_motion(jd)
+  return (sun - ayanamsa_ut(jd)) % 360, speed - ayanamsa_rate
+
+def build(first_year, last_year):
+  start = gregorian_to_jd(Date(first_year, 1, 1))
+  end = gregorian_to_jd(Date(last_year + 1, 1, 1))
+  times = np.arange(start, end + 1)   # elongation moves < 16 degrees a day
+  samples = np.array([angles(t) for t in times]).T
+
+  rows = []
+  for k, jd in crossings(elongation_motion, times, samples[0], 360):
+    rows.append((jd, lunation_kinds['new_moon'], raasi(jd)))
+  for k, jd in crossings(nirayana_solar_motion, times, samples[1], 30):
+    rows.append((jd, lunation_kinds['sankranti'], k % 12 + 1))
+
+  table = np.array(rows, dtype = lunation_dtype)
+  return table[np.lexsort((table['jd'], table['kind']))]
+
+if __name__ == "__main__":
+  first_year, last_year = (int(sys.argv[1]), int(sys.argv[2])) if len(sys.argv) > 2 else (1800, 2200)
+  output = sys.argv[3] if len(sys.argv) > 3 else lunations_path
+  table = build(first_year, last_year)
+  np.save(output, table)
+  print("%d new moons and sankrantis written to %s" % (len(table), output))
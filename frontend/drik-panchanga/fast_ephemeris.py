@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+
+# fast_ephemeris.py -- Chebyshev-coefficient cache of the Swiss ephemeris
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Evaluates longitudes of the Sun, Moon and planets from Chebyshev polynomials
+fitted to the Swiss ephemeris by build_ephemeris.py. Needs only NumPy, so it
+can be used where swisseph (or Skyfield) is not installed or is too slow.
+
+Each body is fitted over fixed segments of `span` days with a polynomial of
+degree `ncoef - 1`. The fitted value is the sayana (tropical) geocentric
+longitude, exactly what swe.calc_ut(jd, body) returns; the Lahiri ayanamsa
+is fitted as the pseudo-body AYANAMSA so that nirayana longitudes are their
+difference.
+
+Error bound, checked against swisseph by build_ephemeris.ephemeris_tests():
+at most ERROR_BOUND degrees in longitude and SPEED_ERROR_BOUND degrees/day
+in speed, for every body between 1900 and 2100.
+"""
+
+from __future__ import division
+import os
+import numpy as np
+
+# Same numbers as swe.SUN, swe.MOON, ...
+SUN, MOON, MERCURY, VENUS, MARS, JUPITER, SATURN = range(7)
+AYANAMSA = -1
+
+# body -> (segment length in days, polynomial degree)
+segments = {SUN: (16, 12), MOON: (4, 13), MERCURY: (4, 10), VENUS: (8, 12),
+            MARS: (16, 12), JUPITER: (8, 10), SATURN: (16, 10), AYANAMSA: (64, 8)}
+
+# Degrees (1e-6 deg = 0.0036 arcsec; the Moon moves that far in 0.007 s).
+# The planets are far better than their bound except within a day or two of
+# superior conjunction, where swisseph's light deflection by the Sun adds a
+# sharp spike of up to a few arcseconds that no polynomial follows.
+ERROR_BOUND = {SUN: 1e-6, MOON: 1e-6, MERCURY: 1e-3, VENUS: 1e-3, MARS: 1e-3,
+               JUPITER: 1e-3, SATURN: 1e-3, AYANAMSA: 1e-9}
+# Degrees per day
+SPEED_ERROR_BOUND = {SUN: 1e-5, MOON: 1e-4, MERCURY: 1e-2, VENUS: 1e-2, MARS: 1e-2,
+                     JUPITER: 1e-2, SATURN: 1e-2, AYANAMSA: 1e-9}
+
+default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ephemeris.bin')
+
+# File layout: magic, version, number of bodies, one `body_dtype` record per
+# body, then all the coefficients as little-endian float64. A body's segment
+# i has its ncoef coefficients at coefficients[offset + i * ncoef:].
+magic = b'CHEBEPH\0'
+version = 1
+header_dtype = np.dtype([('magic', 'S8'), ('version', '<u4'), ('nbodies', '<u4')])
+body_dtype = np.dtype([('body', '<i4'), ('ncoef', '<i4'), ('nseg', '<i4'), ('pad', '<i4'),
+                       ('start', '<f8'), ('span', '<f8'), ('offset', '<i8')])
+
+def write(path, bodies):
+  """Writes {body: (start jd, span in days, coefficients of shape (nseg, ncoef))}"""
+  table = np.zeros(len(bodies), dtype = body_dtype)
+  offset = 0
+  for row, (body, (start, span, coeffs)) in zip(table, sorted(bodies.items())):
+    row['body'], row['ncoef'], row['nseg'] = body, coeffs.shape[1], coeffs.shape[0]
+    row['start'], row['span'], row['offset'] = start, span, offset
+    offset += coeffs.size
+  header = np.array([(magic, version, len(bodies))], dtype = header_dtype)
+  with open(path, 'wb') as f:
+    f.write(header.tobytes())
+    f.write(table.tobytes())
+    for body in sorted(bodies):
+      f.write(np.ascontiguousarray(bodies[body][2], dtype = '<f8').tobytes())
+
+class FastEphemeris(object):
+  """Longitudes and speeds from a coefficient file written by build_ephemeris.py.
+     The file is memory-mapped, so processes share its pages."""
+
+  def __init__(self, path = default_path):
+    self.path = path
+    self.data = np.memmap(path, dtype = np.uint8, mode = 'r')
+    header = np.frombuffer(self.data, header_dtype, 1)[0]
+    if header['magic'] != magic.rstrip(b'\0') or header['version'] != version:
+      raise ValueError("%s is not a version %d ephemeris file" % (path, version))
+    table = np.frombuffer(self.data, body_dtype, int(header['nbodies']), header_dtype.itemsize)
+    start = header_dtype.itemsize + table.nbytes
+    coefficients = np.frombuffer(self.data, '<f8', offset = start)
+    self.bodies = {}
+    for row in table:
+      coeffs = coefficients[row['offset']:row['offset'] + row['nseg'] * row['ncoef']]
+      self.bodies[int(row['body'])] = (float(row['start']), float(row['span']),
+                                       coeffs.reshape(row['nseg'], row['ncoef']))
+
+  def range(self, body = MOON):
+    """(first jd, last jd) covered for body"""
+    start, span, coeffs = self.bodies[body]
+    return start, start + span * len(coeffs)
+
+  def covers(self, jd, body = MOON):
+    first, last = self.range(body)
+    if isinstance(jd, float): return first <= jd < last
+    return bool(np.all((first <= np.asarray(jd)) & (np.asarray(jd) < last)))
+
+  def segment(self, body, jd):
+    """Coefficient rows and normalised time x in [-1, 1] for every jd"""
+    start, span, coeffs = self.bodies[body]
+    jd = np.asarray(jd, dtype = float)
+    i = np.floor((jd - start) / span).astype(int)
+    if np.any((i < 0) | (i >= len(coeffs))):
+      raise ValueError("julian day outside %.1f - %.1f" % self.range(body))
+    x = 2 * (jd - start - i * span) / span - 1
+    return coeffs[i], x, span
+
+  def evaluate(self, body, jd):
+    """(unwrapped longitude, speed in degrees per day), by Clenshaw recurrence"""
+    if isinstance(jd, float):
+      return self.evaluate_scalar(body, jd)
+    c, x, span = self.segment(body, jd)
+    n = c.shape[-1]
+    # b for the series, d for its derivative with respect to x
+    b1 = b2 = d1 = d2 = 0
+    for k in range(n - 1, 0, -1):
+      b1, b2, d1, d2 = 2 * x * b1 - b2 + c[..., k], b1, 2 * b1 + 2 * x * d1 - d2, d1
+    value = x * b1 - b2 + c[..., 0]
+    derivative = b1 + x * d1 - d2
+    return value, derivative * 2 / span
+
+  def evaluate_scalar(self, body, jd):
+    """evaluate() for a single float jd, in plain Python (NumPy's per-call
+       overhead is larger than the whole recurrence for one instant)"""
+    start, span, coeffs = self.bodies[body]
+    i = int((jd - start) // span)
+    if not 0 <= i < len(coeffs):
+      raise ValueError("julian day outside %.1f - %.1f" % self.range(body))
+    c = coeffs[i].tolist()
+    x = 2 * (jd - start - i * span) / span - 1
+    b1 = b2 = d1 = d2 = 0.0
+    for k in range(len(c) - 1, 0, -1):
+      b1, b2, d1, d2 = 2 * x * b1 - b2 + c[k], b1, 2 * b1 + 2 * x * d1 - d2, d1
+    return x * b1 - b2 + c[0], (b1 + x * d1 - d2) * 2 / span
+
+  def longitude(self, body, jd, sidereal = False):
+    """Sayana longitude (or nirayana, Lahiri) of body at jd in UT. jd may be
+       a scalar or a NumPy array; the result has the same shape."""
+    value = self.evaluate(body, jd)[0]
+    if sidereal: value = value - self.evaluate(AYANAMSA, jd)[0]
+    return value % 360
+
+  def speed(self, body, jd):
+    """Daily motion in longitude, in degrees per day"""
+    return self.evaluate(body, jd)[1]
+
+  def ayanamsa(self, jd):
+    return self.evaluate(AYANAMSA, jd)[0]
@@ -0,0 +1,164 @@
+#! /usr/bin/env python
+
+# festivals.py -- compiles festival and vrat calendars from rules
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Festivals and vrats from declarative rules, such as
+
+    {"name": "Maha Shivaratri", "masa": 11, "tithi": 29, "at": "midnight"}
+
+i.e. Magha (amanta) Krishna Chaturdashi prevailing at midnight. A rule has
+
+* tithi: 1-30, or a list of them
+* masa: 1 = Chaitra, ..., 12 = Phalguna, amanta; every month if left out
+* at: the moment of the day at which the tithi must prevail: 'sunrise',
+  'noon' (middle of the day), 'sunset' or 'midnight' (middle of the night)
+* adhika: whether it also falls in an adhika masa (default false); rules
+  without a masa fall in every month
+
+The festival is on the first day at whose moment the tithi prevails. If the
+tithi begins and ends between the moments of two days, it is on the first
+of them.
+
+A year is compiled in one pass: the tithi timeline and the four moments of
+every day are found once (compile_year()), and each rule is then a lookup
+of its tithis in them. Both are kept in LRU caches (of `years_size` years
+and `compiled_size` rule results), keyed by the place and range and by the
+rule itself, so editing the rules only recompiles those that changed.
+"""
+
+from __future__ import division
+from collections import namedtuple as struct, OrderedDict
+import os
+import json
+import threading
+import numpy as np
+from panchanga import (transitions, timeline, almanac, lunar_month, gregorian_to_jd,
+                       jd_to_gregorian, Date, Place, LAHIRI)
+
+Rule = struct('Rule', ['name', 'tithi', 'masa', 'at', 'adhika'])
+Festival = struct('Festival', ['jd', 'name', 'masa', 'adhika', 'tithi'])
+Year = struct('Year', ['jd', 'ndays', 'place', 'ayanamsa_mode', 'tithis', 'moments'])
+
+rules_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'festivals.json')
+moments = ('sunrise', 'noon', 'sunset', 'midnight')
+
+years_size = 64
+compiled_size = 4096
+years = OrderedDict()      # (jd, ndays, place, ayanamsa_mode) -> Year
+compiled = OrderedDict()   # (jd, ndays, place, ayanamsa_mode, Rule) -> [Festival]
+lock = threading.Lock()
+
+def cached(cache, key):
+  """cache[key], made the most recently used, or None"""
+  with lock:
+    value = cache.get(key)
+    if value is not None: cache.move_to_end(key)
+    return value
+
+def remember(cache, size, key, value):
+  """Stores value at key, dropping the least recently used beyond size
+     entries; the value kept at key"""
+  with lock:
+    value = cache.setdefault(key, value)
+    cache.move_to_end(key)
+    while len(cache) > size:
+      cache.popitem(last = False)
+    return value
+
+def make_rule(name, tithi, masa = None, at = 'sunrise', adhika = False):
+  """A hashable Rule, checking its fields"""
+  tithis = tuple(tithi) if isinstance(tithi, (list, tuple)) else (tithi,)
+  if not all(1 <= t <= 30 for t in tithis):
+    raise ValueError("%s: tithi must be within 1-30" % name)
+  if masa is not None and not 1 <= masa <= 12:
+    raise ValueError("%s: masa must be within 1-12" % name)
+  if at not in moments:
+    raise ValueError("%s: 'at' must be one of %s" % (name, ", ".join(moments)))
+  return Rule(name, tithis, masa, at, bool(adhika))
+
+def load_rules(path = rules_path):
+  """Rules from a JSON list of objects with the fields of make_rule()"""
+  with open(path) as fp:
+    return [make_rule(**rule) for rule in json.load(fp)]
+
+def compile_year(jd, ndays, place, ayanamsa_mode = LAHIRI):
+  """Tithi transitions and the moments of `ndays` days from the date jd,
+     shared by all the rules"""
+  key = (jd, ndays, place, ayanamsa_mode)
+  year = cached(years, key)
+  if year is None:
+    tz = place.timezone
+    table = almanac(jd, ndays + 1, place)
+    rise, setting = table.sunrise, table.sunset
+    day_moments = {'sunrise': rise[:-1], 'noon': (rise[:-1] + setting[:-1]) / 2,
+                   'sunset': setting[:-1], 'midnight': (setting[:-1] + rise[1:]) / 2}
+    tl = timeline(transitions(jd - tz / 24. - 1, jd + ndays - tz / 24. + 1, ayanamsa_mode = ayanamsa_mode))
+    year = remember(years, years_size, key, Year(jd, ndays, place, ayanamsa_mode, tl['tithi'][1], day_moments))
+  return year
+
+def observance_day(instants, start, end):
+  """Index of the day whose instant falls within [start, end), else of the
+     last day before start; None if outside the days. instants may hold NaN
+     (no sunrise or sunset), which are skipped."""
+  days = np.flatnonzero(~np.isnan(instants))
+  times = instants[days]
+  i = np.searchsorted(times, start)
+  if i < len(times) and times[i] < end: return int(days[i])
+  if 0 < i < len(times): return int(days[i - 1])
+  return None
+
+def compile_rule(year, rule):
+  """[Festival] for one rule within a compiled year"""
+  key = year[:4] + (rule,)
+  result = cached(compiled, key)
+  if result is None:
+    result = []
+    instants = year.moments[rule.at]
+    for t in year.tithis:
+      if t.index not in rule.tithi: continue
+      maasa, adhika = lunar_month((t.start + t.end) / 2, year.place, t.index,
+                                  ayanamsa_mode = year.ayanamsa_mode)
+      if rule.masa is not None and (maasa != rule.masa or (adhika and not rule.adhika)):
+        continue
+      day = observance_day(instants, t.start, t.end)
+      if day is not None:
+        result.append(Festival(year.jd + day, rule.name, maasa, adhika, t.index))
+    result = remember(compiled, compiled_size, key, result)
+  return result
+
+def compile_festivals(jd, ndays, place, rules = None, ayanamsa_mode = LAHIRI):
+  """Every festival of `rules` (by default those of festivals.json) within
+     `ndays` days from the date jd at place, as a list of Festival sorted by
+     date. Festival.jd is the julian day of the date, like jd."""
+  if rules is None: rules = load_rules()
+  year = compile_year(jd, ndays, place, ayanamsa_mode)
+  result = []
+  for rule in rules:
+    result += compile_rule(year, rule)
+  return sorted(result, key = lambda f: (f.jd, f.name))
+
+def festival_year(year, place, rules = None, ayanamsa_mode = LAHIRI):
+  """compile_festivals() for the Gregorian year"""
+  jd = gregorian_to_jd(Date(year, 1, 1))
+  ndays = int(gregorian_to_jd(Date(year + 1, 1, 1)) - jd)
+  return compile_festivals(jd, ndays, place, rules, ayanamsa_mode)
+
+def festival_tests():
+  kathmandu = Place(27.7172, 85.3240, +5.75)
+  dates = dict((f.name, jd_to_gregorian(f.jd)[:3]) for f in festival_year(2013, kathmandu))
+  assert(dates['Maha Shivaratri'] == (2013, 3, 10))
+  assert(dates['Dashain Ghatasthapana'] == (2013, 10, 5))
+  assert(dates['Lakshmi Puja'] == (2013, 11, 3))
+  print(dates['Krishna Janmashtami'])   # Expected: (2013, 8, 28)
+
+if __name__ == "__main__":
+  festival_tests()
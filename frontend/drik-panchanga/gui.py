@@ -210,7 +210,7 @@ class Panchanga(wx.Frame):
 
         # Update GUI one by one. First the easy ones
         self.karanaTxt.SetLabel("%s" % self.karanas[str(kar[0])])
-        self.karanaTimeTxt.SetLabel(" -- ")
+        self.karanaTimeTxt.SetLabel(format_time(kar[1]))
         self.varaTxt.SetLabel("%s" % self.vaaras[str(vara)])
         self.sunriseTxt.SetLabel(format_time(srise))
         self.sunsetTxt.SetLabel(format_time(sset))
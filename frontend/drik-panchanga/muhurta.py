@@ -0,0 +1,118 @@
+#! /usr/bin/env python
+
+# muhurta.py -- Rahu kalam, Yamagandam, Gulika, Choghadiya and horas
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Daily muhurtas: fixed fractions of the day (sunrise to sunset) and of the
+night (sunset to next sunrise), chosen by the weekday.
+
+* Rahu kalam, Yamagandam and Gulika kalam: one of the 8 parts of the day
+* Abhijit and Vijaya muhurtas: the 8th and 11th of the 15 muhurtas of the day
+* Brahma muhurta: the 14th of the 15 muhurtas of the night
+* Choghadiya: the 8 parts of the day and the 8 parts of the night
+* Horas: the 12 parts of the day and the 12 of the night, each ruled by a
+  planet in the Chaldean order starting from the lord of the weekday
+
+muhurtas() only needs NumPy, so it can be used with sunrise and sunset times
+from anywhere; muhurta_range() takes them from panchanga.almanac().
+
+Every window is an interval array whose last axis is (start, end), in the
+same time scale as the sunrise and sunset passed in; days without a sunrise
+or sunset (near the poles) come out as NaN.
+"""
+
+from __future__ import division
+from collections import namedtuple as struct
+import numpy as np
+
+Muhurtas = struct('Muhurtas', ['rahu_kalam', 'yamagandam', 'gulika_kalam',
+                               'abhijit', 'vijaya', 'brahma',
+                               'day_choghadiya', 'night_choghadiya', 'choghadiya_kinds',
+                               'horas', 'hora_lords'])
+
+choghadiya_names = ['Udveg', 'Chal', 'Labh', 'Amrit', 'Kaal', 'Shubh', 'Rog']
+# In the Chaldean order, slowest first
+hora_planets = ['Saturn', 'Jupiter', 'Mars', 'Sun', 'Venus', 'Mercury', 'Moon']
+
+# Part (0-7) of the day for each weekday, 0 = Sunday, ..., 6 = Saturday
+rahu_kalam_parts = np.array([7, 1, 6, 4, 5, 3, 2])
+yamagandam_parts = np.array([4, 3, 2, 1, 0, 6, 5])
+gulika_kalam_parts = np.array([6, 5, 4, 3, 2, 1, 0])
+# Index into hora_planets of the lord of each weekday
+weekday_lords = np.array([3, 6, 2, 5, 1, 4, 0])
+
+def parts(start, end, n):
+  """(days, n, 2) array of the n equal parts of each [start, end]"""
+  edges = start[:, np.newaxis] + (end - start)[:, np.newaxis] * np.arange(n + 1) / n
+  return np.stack([edges[:, :-1], edges[:, 1:]], axis = -1)
+
+def muhurtas(rise, setting, next_rise, weekday):
+  """All the muhurtas of the days with the given sunrise, sunset and next
+     sunrise (NumPy arrays, or floats for a single day) and weekday
+     (0 = Sunday, ..., 6 = Saturday), as a Muhurtas of arrays over the days.
+
+     Choghadiya kinds index choghadiya_names, day then night (days, 16);
+     hora lords index hora_planets (days, 24).
+  """
+  rise, setting, next_rise = [np.atleast_1d(np.asarray(t, dtype = float)) for t in (rise, setting, next_rise)]
+  weekday = np.atleast_1d(np.asarray(weekday, dtype = int)) % 7
+  days = np.arange(len(rise))
+
+  eighths = parts(rise, setting, 8)
+  day_muhurtas = parts(rise, setting, 15)
+  night_muhurtas = parts(setting, next_rise, 15)
+
+  # Day choghadiyas advance by one and start 3 places later each weekday;
+  # night ones go back by two, starting from the 6th of the day's cycle
+  k = np.arange(8)
+  day_kinds = (3 * weekday[:, np.newaxis] + k) % 7
+  night_kinds = (3 * weekday[:, np.newaxis] + 5 - 2 * k) % 7
+
+  horas = np.concatenate([parts(rise, setting, 12), parts(setting, next_rise, 12)], axis = 1)
+  hora_lords = (weekday_lords[weekday][:, np.newaxis] + np.arange(24)) % 7
+
+  return Muhurtas(eighths[days, rahu_kalam_parts[weekday]],
+                  eighths[days, yamagandam_parts[weekday]],
+                  eighths[days, gulika_kalam_parts[weekday]],
+                  day_muhurtas[:, 7], day_muhurtas[:, 10], night_muhurtas[:, 13],
+                  eighths, parts(setting, next_rise, 8),
+                  np.concatenate([day_kinds, night_kinds], axis = 1),
+                  horas, hora_lords)
+
+def muhurta_range(jd, ndays, place):
+  """muhurtas() for `ndays` consecutive days starting at the date jd, from
+     panchanga.almanac(); times are julian days in UT"""
+  from panchanga import almanac
+  table = almanac(jd, ndays + 1, place)
+  weekday = np.ceil(table.jd[:-1] + 1).astype(int) % 7   # as panchanga.vaara()
+  return muhurtas(table.sunrise[:-1], table.sunset[:-1], table.sunrise[1:], weekday)
+
+def muhurta_tests():
+  # Sunday with a 12 hour day and night from 6:00 (in days)
+  m = muhurtas(0.25, 0.75, 1.25, 0)
+  assert(np.allclose(m.rahu_kalam * 24, [[16.5, 18]]))      # 16:30-18:00
+  assert(np.allclose(m.yamagandam * 24, [[12, 13.5]]))      # 12:00-13:30
+  assert(np.allclose(m.gulika_kalam * 24, [[15, 16.5]]))    # 15:00-16:30
+  assert(np.allclose(m.abhijit * 24, [[11.6, 12.4]]))       # 11:36-12:24
+  assert(np.allclose(m.vijaya * 24, [[14, 14.8]]))          # 14:00-14:48
+  assert(np.allclose(m.brahma * 24, [[28.4, 29.2]]))        # 4:24-5:12
+  assert([choghadiya_names[i] for i in m.choghadiya_kinds[0, [0, 8]]] == ['Udveg', 'Shubh'])
+  assert([hora_planets[i] for i in m.hora_lords[0, :3]] == ['Sun', 'Venus', 'Mercury'])
+  # Monday: the first hora is the Moon's, and follows from Sunday's 24 horas
+  m = muhurtas([0.25, 1.25], [0.75, 1.75], [1.25, 2.25], [0, 1])
+  assert(hora_planets[m.hora_lords[1, 0]] == 'Moon')
+  assert((m.hora_lords[0, -1] + 1) % 7 == m.hora_lords[1, 0])
+  assert(choghadiya_names[m.choghadiya_kinds[1, 0]] == 'Amrit')
+  assert(choghadiya_names[m.choghadiya_kinds[1, 8]] == 'Chal')
+  print(np.round(m.rahu_kalam[1] * 24, 2))   # Expected: [7.5 9.] (Monday)
+
+if __name__ == "__main__":
+  muhurta_tests()
@@ -0,0 +1,401 @@
+#! /usr/bin/env python
+
+# panchang_service.py -- the panchanga of a day from pluggable engines
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+One panchang service for the Flask APIs (panchang_api.py,
+simple_panchang_api.py and backend/working_panchang_api.py), with the name
+tables, time formatting, cache and instrumentation they share:
+
+    day = compute(jd, place, precision = 'fast')
+    day['tithi'], day['sunrise'], day['engine']
+
+Days come in the format of panchanga.compute_panchanga(), from one of the
+`engines`. An Engine gives sunrise and sunset, and the sayana longitudes of
+the Sun and Moon for an array of instants; panchanga's tithi(), nakshatra()
+etc. then derive the limbs from the DayContext they fill.
+
+* swisseph: the Swiss ephemeris (or its Chebyshev cache, ephemeris.bin)
+* skyfield: Skyfield and the JPL de421 ephemeris, when they are installed
+* approximate: truncated analytic series for the Sun and Moon (Meeus,
+  Astronomical Algorithms, ch. 25 and 47), good to about 0.01 and 0.05
+  degrees, so end times within a few minutes, without any ephemeris
+
+The masa comes from the lunation index (or the Swiss ephemeris) with every
+engine. precision picks the engine of a request:
+
+* 'high': swisseph, with end times solved by Newton's method (~0.1 s)
+* 'standard': the deployment's engine, PANCHANG_ENGINE (default swisseph)
+* 'fast': approximate
+
+or names an engine. The default is PANCHANG_PRECISION, else 'standard'.
+
+compute_range() does a run of days in one pass, for date ranges.
+
+Days are kept in an LRU cache of `cache_size` entries keyed by engine,
+tolerance, date, place and ayanamsa. status() has the days computed, the
+cache hits and the time taken by each engine, for the health endpoints.
+The APIs put places on a grid of `cache_grid` degrees (PANCHANG_CACHE_GRID)
+with snap_to_grid(), so that nearby places share their cache entries.
+"""
+
+from __future__ import division
+from collections import namedtuple as struct, OrderedDict
+from math import radians, degrees, sin, cos, acos, atan2
+import os
+import json
+import time
+import threading
+import numpy as np
+from panchanga import (compute_panchanga, sunrise, sunset, solar_longitude, lunar_longitude,
+                       DayContext, day_offsets, horizon, to_dms, jd_to_gregorian, LAHIRI,
+                       panchanga_range, transitions, timeline, day_panchanga, vaara)
+from ayanamsa import ayanamsa_ut
+
+Engine = struct('Engine', ['name', 'load', 'rise_set', 'longitudes'])
+
+# ----- NAMES AND FORMATTING ------
+
+names_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sanskrit_names.json')
+with open(names_path, encoding = 'utf-8') as fp:
+  sanskrit_names = json.load(fp)
+
+raasi_names = ["Mesha", "Vrishabha", "Mithuna", "Karka", "Simha", "Kanya",
+               "Tula", "Vrishchika", "Dhanu", "Makara", "Kumbha", "Meena"]
+nakshatra_lords = ['Ketu', 'Venus', 'Sun', 'Moon', 'Mars', 'Rahu', 'Jupiter', 'Saturn', 'Mercury'] * 3
+
+def format_time(time_dms):
+  """Format time from [hours, minutes, seconds] to HH:MM:SS"""
+  if isinstance(time_dms, list) and len(time_dms) >= 3:
+    h, m, s = time_dms[0], time_dms[1], time_dms[2]
+    return "%02d:%02d:%02d" % (h, m, s)
+  return "00:00:00"
+
+def local_time(jd_ut, day_jd, timezone):
+  """HH:MM:SS after local midnight of day_jd, or None for NaN (no event)"""
+  if np.isnan(jd_ut): return None
+  return format_time(to_dms((jd_ut - day_jd) * 24 + timezone))
+
+def local_window(interval, day_jd, timezone):
+  """[start, end] julian days in UT as {'start': HH:MM:SS, 'end': HH:MM:SS}"""
+  return {'start': local_time(interval[0], day_jd, timezone),
+          'end': local_time(interval[1], day_jd, timezone)}
+
+def local_datetime(jd_ut, timezone):
+  """Julian day in UT as local YYYY-MM-DD HH:MM:SS"""
+  y, m, d, hours = jd_to_gregorian(jd_ut + timezone / 24.)
+  return "%d-%02d-%02d %s" % (y, m, d, format_time(to_dms(hours)))
+
+def name(table, number, label):
+  return sanskrit_names[table].get(str(number), "%s %d" % (label, number))
+
+def get_tithi_name(tithi_num, paksha):
+  """Sanskrit name of tithi 1-15 of the paksha ('Shukla' or 'Krishna')"""
+  return name('tithis', tithi_num if paksha == 'Shukla' else tithi_num + 15, "Tithi")
+
+get_nakshatra_name = lambda n: name('nakshatras', n, "Nakshatra")
+get_yoga_name = lambda n: name('yogas', n, "Yoga")
+get_karana_name = lambda n: name('karanas', n, "Karana")
+get_vaara_name = lambda n: name('varas', n, "Vaara")
+get_masa_name = lambda n: name('masas', n, "Masa")
+get_samvatsara_name = lambda n: name('samvats', n, "Samvatsara")
+get_ritu_name = lambda n: name('ritus', n, "Ritu")
+
+def get_raasi_name(raasi_num):
+  return raasi_names[raasi_num - 1] if 1 <= raasi_num <= 12 else "Raasi %d" % raasi_num
+
+def get_planetary_lords():
+  """Lords of the 27 nakshatras"""
+  return nakshatra_lords
+
+# ----- ENGINES ------
+
+def swisseph_rise_set(jd, place):
+  tz = place.timezone
+  return sunrise(jd, place)[0] - tz / 24., sunset(jd, place)[0] - tz / 24.
+
+swisseph_engine = Engine('swisseph', lambda: None, swisseph_rise_set,
+                         lambda times: (solar_longitude(times), lunar_longitude(times)))
+
+# Skyfield: (timescale, ephemeris, almanac, wgs84) once loaded
+skyfield = None
+
+def skyfield_load():
+  global skyfield
+  if skyfield is None:
+    from skyfield.api import load, wgs84
+    from skyfield import almanac
+    path = os.environ.get('SKYFIELD_EPHEMERIS', 'de421.bsp')
+    skyfield = (load.timescale(), load(path), almanac, wgs84)
+  return skyfield
+
+def skyfield_longitudes(times):
+  ts, eph, almanac, wgs84 = skyfield_load()
+  t = ts.ut1_jd(times)
+  earth = eph['earth']
+  sun = earth.at(t).observe(eph['sun']).apparent().ecliptic_latlon(epoch = 'date')[1]
+  moon = earth.at(t).observe(eph['moon']).apparent().ecliptic_latlon(epoch = 'date')[1]
+  return sun.degrees % 360, moon.degrees % 360
+
+def skyfield_rise_set(jd, place):
+  ts, eph, almanac, wgs84 = skyfield_load()
+  lat, lon, tz = place
+  observer = eph['earth'] + wgs84.latlon(lat, lon)
+  start, end = ts.ut1_jd(jd - tz / 24.), ts.ut1_jd(jd - tz / 24. + 1)
+  events = []
+  for find in (almanac.find_risings, almanac.find_settings):
+    t, happened = find(observer, eph['sun'], start, end, horizon_degrees = horizon)
+    events.append(float(t.ut1[happened][0]) if happened.any() else np.nan)
+  return tuple(events)
+
+skyfield_engine = Engine('skyfield', skyfield_load, skyfield_rise_set, skyfield_longitudes)
+
+def approximate_sun(times):
+  """Apparent longitude and declination of the Sun, degrees"""
+  T = (np.asarray(times) - 2451545.0) / 36525
+  M = np.radians(357.52911 + 35999.05029 * T)
+  center = (1.914602 - 0.004817 * T) * np.sin(M) + (0.019993 - 0.000101 * T) * np.sin(2 * M) \
+           + 0.000289 * np.sin(3 * M)
+  omega = np.radians(125.04 - 1934.136 * T)
+  longitude = 280.46646 + 36000.76983 * T + center - 0.00569 - 0.00478 * np.sin(omega)
+  obliquity = np.radians(23.439291 - 0.0130042 * T + 0.00256 * np.cos(omega))
+  declination = np.degrees(np.arcsin(np.sin(obliquity) * np.sin(np.radians(longitude))))
+  return longitude % 360, declination, obliquity
+
+# Periodic terms of the Moon's longitude: (D, M, M', F, coefficient in degrees)
+moon_terms = [
+  (0, 0, 1, 0, 6.288774), (2, 0, -1, 0, 1.274027), (2, 0, 0, 0, 0.658314),
+  (0, 0, 2, 0, 0.213618), (0, 1, 0, 0, -0.185116), (0, 0, 0, 2, -0.114332),
+  (2, 0, -2, 0, 0.058793), (2, -1, -1, 0, 0.057066), (2, 0, 1, 0, 0.053322),
+  (2, -1, 0, 0, 0.045758), (0, 1, -1, 0, -0.040923), (1, 0, 0, 0, -0.034720),
+  (0, 1, 1, 0, -0.030383), (2, 0, 0, -2, 0.015327), (0, 0, 1, 2, -0.012528),
+  (0, 0, 1, -2, 0.010980), (4, 0, -1, 0, 0.010675), (0, 0, 3, 0, 0.010034),
+  (4, 0, -2, 0, 0.008548), (2, 1, -1, 0, -0.007888), (2, 1, 0, 0, -0.006766),
+  (1, 0, -1, 0, -0.005163), (1, 1, 0, 0, 0.004987), (2, -1, 1, 0, 0.004036),
+]
+
+moon_arguments = np.array([t[:4] for t in moon_terms], dtype = float)
+moon_coefficients = np.array([t[4] for t in moon_terms])
+moon_sun_anomaly = np.abs(moon_arguments[:, 1])   # powers of E, for the terms in M
+
+def approximate_moon(times):
+  """Apparent longitude of the Moon, degrees"""
+  T = (np.atleast_1d(np.asarray(times, dtype = float)) - 2451545.0) / 36525
+  arguments = np.radians([297.8501921 + 445267.1114034 * T,    # D
+                          357.5291092 + 35999.0502909 * T,     # M
+                          134.9633964 + 477198.8675055 * T,    # M'
+                          93.2720950 + 483202.0175233 * T])    # F
+  E = (1 - 0.002516 * T)[:, np.newaxis] ** moon_sun_anomaly
+  periodic = (E * np.sin(np.dot(moon_arguments, arguments).T)).dot(moon_coefficients)
+  omega = np.radians(125.04 - 1934.136 * T)
+  longitude = (218.3164477 + 481267.88123421 * T + periodic - 0.00478 * np.sin(omega)) % 360
+  return longitude if np.ndim(times) else longitude[0]
+
+def approximate_longitudes(times):
+  return approximate_sun(times)[0], approximate_moon(times)
+
+def approximate_event(guess, place, sign):
+  """Sunrise (sign = -1) or sunset (+1) nearest guess, in UT, by iterating
+     on the Sun's hour angle; NaN if the Sun does not cross the horizon"""
+  lat, lon, tz = place
+  t = guess
+  for _ in range(3):
+    longitude, declination, obliquity = approximate_sun(t)
+    ra = degrees(atan2(cos(obliquity) * sin(radians(longitude)), cos(radians(longitude))))
+    cos_h = (sin(radians(horizon)) - sin(radians(lat)) * sin(radians(declination))) / \
+            (cos(radians(lat)) * cos(radians(declination)))
+    if abs(cos_h) > 1: return np.nan
+    hour_angle = 280.46061837 + 360.98564736629 * (t - 2451545.0) + lon - ra
+    target = sign * degrees(acos(cos_h))
+    t += ((target - hour_angle + 180) % 360 - 180) / 360.98564736629
+  return t
+
+def approximate_rise_set(jd, place):
+  noon = jd + 0.5 - place.longitude / 360.
+  return approximate_event(noon - 0.25, place, -1), approximate_event(noon + 0.25, place, +1)
+
+approximate_engine = Engine('approximate', lambda: None, approximate_rise_set, approximate_longitudes)
+
+engines = OrderedDict((e.name, e) for e in [swisseph_engine, skyfield_engine, approximate_engine])
+
+# ----- PRECISION ------
+
+high_tolerance = 1e-6   # days, for Newton's method
+precisions = ('high', 'standard', 'fast')
+choices = precisions + tuple(engines)   # what a precision parameter may be
+
+def default_engine():
+  return os.environ.get('PANCHANG_ENGINE', 'swisseph')
+
+def resolve(precision = None):
+  """(Engine, tolerance or None) for a precision or engine name"""
+  precision = precision or os.environ.get('PANCHANG_PRECISION', 'standard')
+  if precision == 'high': return engines['swisseph'], high_tolerance
+  if precision == 'standard': precision = default_engine()
+  elif precision == 'fast': precision = 'approximate'
+  if precision not in engines:
+    raise ValueError("Invalid precision: expected one of %s" % ", ".join(choices))
+  return engines[precision], None
+
+def valid_precision(precision):
+  return precision is None or precision in choices
+
+# ----- CACHE AND INSTRUMENTATION ------
+
+cache_size = 4096
+cache = OrderedDict()   # (engine, tol, jd, place, ayanamsa_mode) -> day
+lock = threading.Lock()
+stats = dict((e, {'days': 0, 'hits': 0, 'seconds': 0.0}) for e in engines)
+errors = {}            # engine -> load error
+cache_grid = float(os.environ.get('PANCHANG_CACHE_GRID', 0.01))
+
+def snap_to_grid(degrees):
+  """Coordinate rounded to cache_grid degrees (0.01 is about a kilometre, a few seconds of sunrise)"""
+  if cache_grid <= 0:
+    return degrees
+  return round(round(degrees / cache_grid) * cache_grid, 6)
+
+def available(engine):
+  """Whether the engine loads; the error is kept in status()"""
+  if engine.name not in errors:
+    try:
+      engine.load()
+      errors[engine.name] = None
+    except Exception as e:
+      errors[engine.name] = "%s: %s" % (type(e).__name__, e)
+  return errors[engine.name] is None
+
+def context(engine, jd, place, ayanamsa_mode = LAHIRI):
+  """DayContext of the date jd at place from the engine"""
+  rise, setting = engine.rise_set(jd, place)
+  sun, moon = engine.longitudes(rise + np.array(day_offsets))
+  ayanamsa = [ayanamsa_ut(rise, ayanamsa_mode), ayanamsa_ut(rise + 1, ayanamsa_mode)]
+  return DayContext(jd, place, rise, setting, [float(x) for x in sun], [float(x) for x in moon],
+                    ayanamsa, ayanamsa_mode)
+
+def compute(jd, place, precision = None, ayanamsa_mode = LAHIRI):
+  """compute_panchanga() for the date jd at place, with the engine of
+     precision, plus 'engine'. Cached: don't modify the result."""
+  engine, tol = resolve(precision)
+  if not available(engine):
+    raise RuntimeError("Engine %s is not available: %s" % (engine.name, errors[engine.name]))
+  key = (engine.name, tol, jd, tuple(place), ayanamsa_mode)
+  with lock:
+    day = cache.get(key)
+    if day is not None:
+      cache.move_to_end(key)
+      stats[engine.name]['hits'] += 1
+      return day
+  start = time.perf_counter()
+  ctx = context(engine, jd, place, ayanamsa_mode)
+  day = compute_panchanga(jd, place, ayanamsa_mode, ctx, tol)
+  day['engine'] = engine.name
+  seconds = time.perf_counter() - start
+  with lock:
+    stats[engine.name]['days'] += 1
+    stats[engine.name]['seconds'] += seconds
+    cache[key] = day
+    while len(cache) > cache_size:
+      cache.popitem(last = False)
+  return day
+
+def compute_days(jd, ndays, place, precision = None, ayanamsa_mode = LAHIRI):
+  """compute() for `ndays` consecutive days from the date jd"""
+  return [compute(jd + i, place, precision, ayanamsa_mode) for i in range(ndays)]
+
+def context_range(engine, jd, ndays, place, ayanamsa_mode = LAHIRI):
+  """context() for `ndays` consecutive days from the date jd, as
+     panchanga.day_context_range(): the Sun and Moon of all the days come
+     from one call to the engine"""
+  jds = jd + np.arange(ndays)
+  rise, setting = np.array([engine.rise_set(d, place) for d in jds]).T
+  grid = rise + np.array(day_offsets)[:, np.newaxis]
+  sun, moon = engine.longitudes(grid.ravel())
+  ayanamsa = ayanamsa_ut(grid[[0, -1]], ayanamsa_mode)
+  return DayContext(jds, place, rise, setting, np.reshape(sun, grid.shape), np.reshape(moon, grid.shape),
+                    ayanamsa, ayanamsa_mode)
+
+def table_limbs(table, i):
+  """Limbs of day i of a PanchangaTable, in the format of tithi() etc.
+     (karana: the one at sunrise only)"""
+  day = {}
+  for limb in ('tithi', 'nakshatra', 'yoga'):
+    columns = [getattr(table, limb + suffix)[i] for suffix in ('', '_end', '_leap', '_leap_end')]
+    day[limb] = [int(columns[0]), to_dms(columns[1])]
+    if columns[2]: day[limb] += [int(columns[2]), to_dms(columns[3])]
+  day['karana'] = [int(table.karana[i]), to_dms(table.karana_end[i])]
+  return day
+
+def compute_range(jd, ndays, place, precision = None, ayanamsa_mode = LAHIRI):
+  """compute() for `ndays` consecutive days from the date jd, in one pass:
+     sunrise is solved once a day and the Sun and Moon of every day are
+     sampled together (panchanga.panchanga_range()), or with a tolerance
+     ('high'), the end times are solved once on a transition timeline of the
+     whole range (panchanga.transitions()). Days have the limbs, vaara,
+     sunrise, sunset and engine of compute(), but no masa or day_duration,
+     and are not cached."""
+  engine, tol = resolve(precision)
+  if not available(engine):
+    raise RuntimeError("Engine %s is not available: %s" % (engine.name, errors[engine.name]))
+  start = time.perf_counter()
+  tz = place.timezone
+  ctx = context_range(engine, jd, ndays, place, ayanamsa_mode)
+  if tol is None:
+    table = panchanga_range(jd, ndays, place, ayanamsa_mode, ctx)
+    days = [table_limbs(table, i) for i in range(ndays)]
+  else:
+    rises = list(ctx.rise) + [engine.rise_set(jd + ndays, place)[0]]
+    tl = timeline(transitions(rises[0], rises[-1], tol = tol, ayanamsa_mode = ayanamsa_mode))
+    days = [day_panchanga(tl, jd + i, place, rises[i], rises[i + 1]) for i in range(ndays)]
+  for i, day in enumerate(days):
+    rise, setting = float(ctx.rise[i]), float(ctx.set[i])
+    day.update(vaara = vaara(jd + i), engine = engine.name,
+               sunrise = [rise + tz / 24., to_dms((rise - jd - i) * 24 + tz)],
+               sunset = [setting + tz / 24., to_dms((setting - jd - i) * 24 + tz)])
+  seconds = time.perf_counter() - start
+  with lock:
+    stats[engine.name]['days'] += ndays
+    stats[engine.name]['seconds'] += seconds
+  return days
+
+def status():
+  """{'engines': {engine: {'available', 'error', 'days', 'hits', 'seconds'}}},
+     with the default precision and engine and the number of cached days"""
+  with lock:
+    # available is None until the engine is first used
+    result = dict((name, dict(stats[name], available = errors[name] is None if name in errors else None,
+                              error = errors.get(name))) for name in engines)
+    cached = len(cache)
+  return {'engines': result, 'default_precision': os.environ.get('PANCHANG_PRECISION', 'standard'),
+          'default_engine': default_engine(), 'cached_days': cached}
+
+def service_tests():
+  from panchanga import gregorian_to_jd, Date, Place
+  bangalore = Place(12.972, 77.594, +5.5)
+  jd = gregorian_to_jd(Date(2013, 1, 18))
+  day = compute(jd, bangalore, 'swisseph')
+  assert(day['tithi'] == compute_panchanga(jd, bangalore)['tithi'])
+  assert(compute(jd, bangalore, 'swisseph') is day)
+  fast = compute(jd, bangalore, 'fast')
+  assert(fast['tithi'][0] == day['tithi'][0] and fast['nakshatra'][0] == day['nakshatra'][0])
+  print(fast['tithi'], fast['sunrise'][1])   # Expected: [7, [16, 24, 20]] [6, 47, 6], within minutes
+  print(compute(jd, bangalore, 'high')['tithi'])   # Expected: [7, [16, 24, 20]]
+  for precision in ('swisseph', 'fast', 'high'):
+    days = compute_range(jd, 3, bangalore, precision)
+    for i, day in enumerate(days):
+      single = compute(jd + i, bangalore, precision)
+      for limb in ('tithi', 'nakshatra', 'yoga', 'karana'):
+        assert(day[limb][:2] == single[limb][:2])
+      assert(day['sunrise'][1] == single['sunrise'][1] and day['vaara'] == single['vaara'])
+  print(compute_range(jd, 1, bangalore)[0]['tithi'])   # Expected: [7, [16, 24, 20]]
+
+if __name__ == "__main__":
+  service_tests()
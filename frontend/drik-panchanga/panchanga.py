@@ -26,9 +26,18 @@ Use Swiss ephemeris to calculate tithi, nakshatra, etc.
 """
 
 from __future__ import division
-from math import floor, ceil
-from collections import namedtuple as struct
+from math import floor, ceil, sqrt, sin, cos, tan, asin, atan, atan2, radians, degrees
+from bisect import bisect_right
+import os
+import json
+from datetime import datetime
+from collections import namedtuple as struct, OrderedDict
+import threading
+import numpy as np
 import swisseph as swe
+import fast_ephemeris
+import rootfind
+from ayanamsa import ayanamsa_ut, LAHIRI
 
 Date = struct('Date', ['year', 'month', 'day'])
 Place = struct('Location', ['latitude', 'longitude', 'timezone'])
@@ -47,7 +56,15 @@ def to_dms(deg):
 
 def unwrap_angles(angles):
   """Add 360 to those elements in the input list so that
-     all elements are sorted in ascending order."""
+     all elements are sorted in ascending order.
+     A NumPy array of shape (points, days) is unwrapped along the first axis."""
+  if isinstance(angles, np.ndarray):
+    wraps = np.cumsum(np.diff(angles, axis=0) < 0, axis=0)
+    result = angles.copy()
+    result[1:] += 360 * wraps
+    assert((np.diff(result, axis=0) >= 0).all())
+    return result
+
   result = angles
   for i in range(1, len(angles)):
     if result[i] < result[i-1]: result[i] += 360
@@ -56,7 +73,9 @@ def unwrap_angles(angles):
   return result
 
 def inverse_lagrange(x, y, ya):
-  """Given two lists x and y, find the value of x = xa when y = ya, i.e., f(xa) = ya"""
+  """Given two lists x and y, find the value of x = xa when y = ya, i.e., f(xa) = ya
+     y may also be a NumPy array of shape (len(x), days) with ya of shape (days,),
+     in which case all days are interpolated at once."""
   assert(len(x) == len(y))
   total = 0
   for i in range(len(x)):
@@ -75,25 +94,64 @@ def inverse_lagrange(x, y, ya):
 gregorian_to_jd = lambda date: swe.julday(date.year, date.month, date.day, 0.0)
 jd_to_gregorian = lambda jd: swe.revjul(jd, swe.GREG_CAL)   # returns (y, m, d, h, min, s)
 
+ephemeris = None   # FastEphemeris, see ephemeris_cache()
+
+def ephemeris_cache(jd):
+  """The Chebyshev ephemeris built by build_ephemeris.py, if the file exists
+     and covers jd (a float or an array); else None, to use swisseph"""
+  global ephemeris
+  if ephemeris is None:
+    path = fast_ephemeris.default_path
+    ephemeris = fast_ephemeris.FastEphemeris(path) if os.path.exists(path) else False
+  if ephemeris and ephemeris.covers(jd): return ephemeris
+  return None
+
 def solar_longitude(jd):
-  """Solar longitude at given instant (julian day) jd"""
-  data = swe.calc_ut(jd, swe.SUN, flag = swe.FLG_SWIEPH)
+  """Solar longitude at given instant (julian day) jd. jd may be a NumPy array."""
+  cache = ephemeris_cache(jd)
+  if cache: return cache.longitude(swe.SUN, jd)
+  if isinstance(jd, np.ndarray): return sample(solar_longitude, jd)
+  data = swe.calc_ut(jd, swe.SUN, swe.FLG_SWIEPH)[0]
   return data[0]   # in degrees
 
 def lunar_longitude(jd):
-  """Lunar longitude at given instant (julian day) jd"""
-  data = swe.calc_ut(jd, swe.MOON, flag = swe.FLG_SWIEPH)
+  """Lunar longitude at given instant (julian day) jd. jd may be a NumPy array."""
+  cache = ephemeris_cache(jd)
+  if cache: return cache.longitude(swe.MOON, jd)
+  if isinstance(jd, np.ndarray): return sample(lunar_longitude, jd)
+  data = swe.calc_ut(jd, swe.MOON, swe.FLG_SWIEPH)[0]
   return data[0]   # in degrees
 
+# Precession: the ayanamsa grows by about 50.29" a year
+ayanamsa_rate = 50.29 / 3600 / 365.25   # degrees per day
+
+def solar_motion(jd):
+  """(solar longitude, daily speed in degrees) at given instant (julian day) jd"""
+  cache = ephemeris_cache(jd)
+  if cache:
+    value, speed = cache.evaluate(swe.SUN, jd)
+    return value % 360, speed
+  data = swe.calc_ut(jd, swe.SUN, swe.FLG_SWIEPH | swe.FLG_SPEED)[0]
+  return data[0], data[3]
+
+def lunar_motion(jd):
+  """(lunar longitude, daily speed in degrees) at given instant (julian day) jd"""
+  cache = ephemeris_cache(jd)
+  if cache:
+    value, speed = cache.evaluate(swe.MOON, jd)
+    return value % 360, speed
+  data = swe.calc_ut(jd, swe.MOON, swe.FLG_SWIEPH | swe.FLG_SPEED)[0]
+  return data[0], data[3]
+
 def lunar_latitude(jd):
   """Lunar latitude at given instant (julian day) jd"""
-  data = swe.calc_ut(jd, swe.MOON, flag = swe.FLG_SWIEPH)
+  data = swe.calc_ut(jd, swe.MOON, swe.FLG_SWIEPH)[0]
   return data[1]   # in degrees
 
 def sunrise(jd, place):
   """Sunrise when centre of disc is at horizon for given date and place"""
   lat, lon, tz = place
-  result = swe.rise_trans(jd - tz/24, swe.SUN, lon, lat, rsmi=swe.BIT_DISC_CENTER + swe.CALC_RISE)
+  result = swe.rise_trans(jd - tz/24, swe.SUN, swe.BIT_DISC_CENTER + swe.CALC_RISE, (lon, lat, 0))
   rise = result[1][0]  # julian-day number
   # Convert to local time
   return [rise + tz/24., to_dms((rise - jd) * 24 + tz)]
@@ -101,7 +159,7 @@ def sunrise(jd, place):
 def sunset(jd, place):
   """Sunset when centre of disc is at horizon for given date and place"""
   lat, lon, tz = place
-  result = swe.rise_trans(jd - tz/24, swe.SUN, lon, lat, rsmi=swe.BIT_DISC_CENTER + swe.CALC_SET)
+  result = swe.rise_trans(jd - tz/24, swe.SUN, swe.BIT_DISC_CENTER + swe.CALC_SET, (lon, lat, 0))
   setting = result[1][0]  # julian-day number
   # Convert to local time
   return [setting + tz/24., to_dms((setting - jd) * 24 + tz)]
@@ -109,7 +167,7 @@ def sunset(jd, place):
 def moonrise(jd, place):
   """Moonrise when centre of disc is at horizon for given date and place"""
   lat, lon, tz = place
-  result = swe.rise_trans(jd - tz/24, swe.MOON, lon, lat, rsmi=swe.BIT_DISC_CENTER + swe.CALC_RISE)
+  result = swe.rise_trans(jd - tz/24, swe.MOON, swe.BIT_DISC_CENTER + swe.CALC_RISE, (lon, lat, 0))
   rise = result[1][0]  # julian-day number
   # Convert to local time
   return to_dms((rise - jd) * 24 + tz)
@@ -117,64 +175,99 @@ def moonrise(jd, place):
 def moonset(jd, place):
   """Moonset when centre of disc is at horizon for given date and place"""
   lat, lon, tz = place
-  result = swe.rise_trans(jd - tz/24, swe.MOON, lon, lat, rsmi=swe.BIT_DISC_CENTER + swe.CALC_SET)
+  result = swe.rise_trans(jd - tz/24, swe.MOON, swe.BIT_DISC_CENTER + swe.CALC_SET, (lon, lat, 0))
   setting = result[1][0]  # julian-day number
   # Convert to local time
   return to_dms((setting - jd) * 24 + tz)
 
+# The shared per-day sample grid: sunrise, +6h, +12h, +18h, next sunrise
+day_offsets = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+DayContext = struct('DayContext', ['jd', 'place', 'rise', 'set', 'sun', 'moon', 'ayanamsa',
+                                   'ayanamsa_mode'])
+
+def day_context(jd, place, ayanamsa_mode=LAHIRI):
+  """Solves sunrise and sunset once and samples the Sun, Moon (sayana) and
+     ayanamsa on the shared grid `day_offsets` from sunrise. All the limbs
+     (tithi, nakshatra, yoga, karana, masa) are derived from these samples.
+     rise and set are julian days in UT; ayanamsa is [at rise, at rise + 1]
+     in the system ayanamsa_mode (see ayanamsa.py)
+  """
+  tz = place.timezone
+  rise = sunrise(jd, place)[0] - tz / 24.
+  setting = sunset(jd, place)[0] - tz / 24.
+  sun = [solar_longitude(rise + t) for t in day_offsets]
+  moon = [lunar_longitude(rise + t) for t in day_offsets]
+  ayanamsa = [ayanamsa_ut(rise, ayanamsa_mode), ayanamsa_ut(rise + 1, ayanamsa_mode)]
+  return DayContext(jd, place, rise, setting, sun, moon, ayanamsa, ayanamsa_mode)
+
+def end_time(limb, target, rise, guess, tol, ayanamsa_mode=LAHIRI):
+  """Fraction of a day after rise at which the angle behind limb (see
+     limb_motion) reaches target degrees. Solved by Newton's method from
+     guess, also a fraction of a day, to within tol days."""
+  motion = lambda t: limb_motion(limb, t, ayanamsa_mode)
+  root = rootfind.newton(motion, target, rise + guess, tol)
+  return root.jd - rise
+
 # Tithi doesn't depend on Ayanamsa
-def tithi(jd, place):
-  """Tithi at sunrise for given date and place. Also returns tithi's end time."""
+def tithi(jd, place, ctx=None, tol=None):
+  """Tithi at sunrise for given date and place. Also returns tithi's end time.
+     End times are interpolated from the day's samples, or if tol is given,
+     solved to within tol days (1e-5 ~ 1 second) with rootfind.newton."""
   tz = place.timezone
   # 1. Find time of sunrise
-  rise = sunrise(jd, place)[0] - tz / 24
+  if ctx is None: ctx = day_context(jd, place)
+  rise = ctx.rise
 
   # 2. Find tithi at this JDN
-  moon_phase = lunar_phase(rise)
+  moon_phase = (ctx.moon[0] - ctx.sun[0]) % 360
   today = ceil(moon_phase / 12)
   degrees_left = today * 12 - moon_phase
 
   # 3. Compute longitudinal differences at intervals of 0.25 days from sunrise
-  offsets = [0.25, 0.5, 0.75, 1.0]
-  lunar_long_diff = [ (lunar_longitude(rise + t) - lunar_longitude(rise)) % 360 for t in offsets ]
-  solar_long_diff = [ (solar_longitude(rise + t) - solar_longitude(rise)) % 360 for t in offsets ]
+  offsets = day_offsets[1:]
+  lunar_long_diff = [ (moon - ctx.moon[0]) % 360 for moon in ctx.moon[1:] ]
+  solar_long_diff = [ (sun - ctx.sun[0]) % 360 for sun in ctx.sun[1:] ]
   relative_motion = [ moon - sun for (moon, sun) in zip(lunar_long_diff, solar_long_diff) ]
 
   # 4. Find end time by 4-point inverse Lagrange interpolation
   y = relative_motion
   x = offsets
   # compute fraction of day (after sunrise) needed to traverse 'degrees_left'
-  approx_end = inverse_lagrange(x, y, degrees_left)
+  if tol is None: approx_end = inverse_lagrange(x, y, degrees_left)
+  else: approx_end = end_time('tithi', today * 12, rise, degrees_left / y[-1], tol)
   ends = (rise + approx_end -jd) * 24 + tz
   answer = [int(today), to_dms(ends)]
 
   # 5. Check for skipped tithi
-  moon_phase_tmrw = lunar_phase(rise + 1)
+  moon_phase_tmrw = (ctx.moon[-1] - ctx.sun[-1]) % 360
   tomorrow = ceil(moon_phase_tmrw / 12)
   isSkipped = (tomorrow - today) % 30 > 1
   if isSkipped:
     # interpolate again with same (x,y)
     leap_tithi = today + 1
     degrees_left = leap_tithi * 12 - moon_phase
-    approx_end = inverse_lagrange(x, y, degrees_left)
+    if tol is None: approx_end = inverse_lagrange(x, y, degrees_left)
+    else: approx_end = end_time('tithi', leap_tithi * 12, rise, degrees_left / y[-1], tol)
     ends = (rise + approx_end -jd) * 24 + place.timezone
     answer += [int(leap_tithi), to_dms(ends)]
 
   return answer
 
 
-def nakshatra(jd, place):
+def nakshatra(jd, place, ctx=None, tol=None, ayanamsa_mode=LAHIRI):
   """Current nakshatra as of julian day (jd)
      1 = Asvini, 2 = Bharani, ..., 27 = Revati
+     tol: as in tithi(). ayanamsa_mode: see ayanamsa.py (that of ctx if given)
   """
-  swe.set_sid_mode(swe.SIDM_LAHIRI)
   # 1. Find time of sunrise
   lat, lon, tz = place
-  rise = sunrise(jd, place)[0] - tz / 24.  # Sunrise at UT 00:00
+  if ctx is None: ctx = day_context(jd, place, ayanamsa_mode)
+  rise = ctx.rise  # Sunrise at UT 00:00
 
   # Swiss Ephemeris always gives Sayana. So subtract ayanamsa to get Nirayana
-  offsets = [0.0, 0.25, 0.5, 0.75, 1.0]
-  longitudes = [ (lunar_longitude(rise + t) - swe.get_ayanamsa_ut(rise)) % 360 for t in offsets]
+  offsets = day_offsets
+  longitudes = [ (moon - ctx.ayanamsa[0]) % 360 for moon in ctx.moon ]
 
   # 2. Today's nakshatra is when offset = 0
   # There are 27 Nakshatras spanning 360 degrees
@@ -183,7 +276,10 @@ def nakshatra(jd, place):
   # 3. Find end time by 5-point inverse Lagrange interpolation
   y = unwrap_angles(longitudes)
   x = offsets
-  approx_end = inverse_lagrange(x, y, nak * 360 / 27)
+  daily_motion = y[-1] - y[0]
+  if tol is None: approx_end = inverse_lagrange(x, y, nak * 360 / 27)
+  else: approx_end = end_time('nakshatra', nak * 360 / 27, rise, (nak * 360 / 27 - y[0]) / daily_motion, tol,
+                                  ctx.ayanamsa_mode)
   ends = (rise - jd + approx_end) * 24 + tz
   answer = [int(nak), to_dms(ends)]
 
@@ -192,25 +288,28 @@ def nakshatra(jd, place):
   isSkipped = (nak_tmrw - nak) % 27 > 1
   if isSkipped:
     leap_nak = nak + 1
-    approx_end = inverse_lagrange(offsets, longitudes, leap_nak * 360 / 27)
+    if tol is None: approx_end = inverse_lagrange(offsets, longitudes, leap_nak * 360 / 27)
+    else: approx_end = end_time('nakshatra', leap_nak * 360 / 27, rise, (leap_nak * 360 / 27 - y[0]) / daily_motion,
+                                    tol, ctx.ayanamsa_mode)
     ends = (rise - jd + approx_end) * 24 + tz
     answer += [int(leap_nak), to_dms(ends)]
 
   return answer
 
 
-def yoga(jd, place):
+def yoga(jd, place, ctx=None, tol=None, ayanamsa_mode=LAHIRI):
   """Yoga at given jd and place.
      1 = Vishkambha, 2 = Priti, ..., 27 = Vaidhrti
+     tol: as in tithi(). ayanamsa_mode: see ayanamsa.py (that of ctx if given)
   """
-  swe.set_sid_mode(swe.SIDM_LAHIRI)
   # 1. Find time of sunrise
   lat, lon, tz = place
-  rise = sunrise(jd, place)[0] - tz / 24.  # Sunrise at UT 00:00
+  if ctx is None: ctx = day_context(jd, place, ayanamsa_mode)
+  rise = ctx.rise  # Sunrise at UT 00:00
 
   # 2. Find the Nirayana longitudes and add them
-  lunar_long = (lunar_longitude(rise) - swe.get_ayanamsa_ut(rise)) % 360
-  solar_long = (solar_longitude(rise) - swe.get_ayanamsa_ut(rise)) % 360
+  lunar_long = (ctx.moon[0] - ctx.ayanamsa[0]) % 360
+  solar_long = (ctx.sun[0] - ctx.ayanamsa[0]) % 360
   total = (lunar_long + solar_long) % 360
   # There are 27 Yogas spanning 360 degrees
   yog = ceil(total * 27 / 360)
@@ -219,22 +318,23 @@ def yoga(jd, place):
   degrees_left = yog * (360 / 27) - total
 
   # 3. Compute longitudinal sums at intervals of 0.25 days from sunrise
-  offsets = [0.25, 0.5, 0.75, 1.0]
-  lunar_long_diff = [ (lunar_longitude(rise + t) - lunar_longitude(rise)) % 360 for t in offsets ]
-  solar_long_diff = [ (solar_longitude(rise + t) - solar_longitude(rise)) % 360 for t in offsets ]
+  offsets = day_offsets[1:]
+  lunar_long_diff = [ (moon - ctx.moon[0]) % 360 for moon in ctx.moon[1:] ]
+  solar_long_diff = [ (sun - ctx.sun[0]) % 360 for sun in ctx.sun[1:] ]
   total_motion = [ moon + sun for (moon, sun) in zip(lunar_long_diff, solar_long_diff) ]
 
   # 4. Find end time by 4-point inverse Lagrange interpolation
   y = total_motion
   x = offsets
   # compute fraction of day (after sunrise) needed to traverse 'degrees_left'
-  approx_end = inverse_lagrange(x, y, degrees_left)
+  if tol is None: approx_end = inverse_lagrange(x, y, degrees_left)
+  else: approx_end = end_time('yoga', yog * 360 / 27, rise, degrees_left / y[-1], tol, ctx.ayanamsa_mode)
   ends = (rise + approx_end - jd) * 24 + tz
   answer = [int(yog), to_dms(ends)]
 
   # 5. Check for skipped yoga
-  lunar_long_tmrw = (lunar_longitude(rise + 1) - swe.get_ayanamsa_ut(rise + 1)) % 360
-  solar_long_tmrw = (solar_longitude(rise + 1) - swe.get_ayanamsa_ut(rise + 1)) % 360
+  lunar_long_tmrw = (ctx.moon[-1] - ctx.ayanamsa[1]) % 360
+  solar_long_tmrw = (ctx.sun[-1] - ctx.ayanamsa[1]) % 360
   total_tmrw = (lunar_long_tmrw + solar_long_tmrw) % 360
   tomorrow = ceil(total_tmrw * 27 / 360)
   isSkipped = (tomorrow - yog) % 27 > 1
@@ -242,43 +342,88 @@ def yoga(jd, place):
     # interpolate again with same (x,y)
     leap_yog = yog + 1
     degrees_left = leap_yog * (360 / 27) - total
-    approx_end = inverse_lagrange(x, y, degrees_left)
+    if tol is None: approx_end = inverse_lagrange(x, y, degrees_left)
+    else: approx_end = end_time('yoga', leap_yog * 360 / 27, rise, degrees_left / y[-1], tol,
+                                    ctx.ayanamsa_mode)
     ends = (rise + approx_end - jd) * 24 + tz
     answer += [int(leap_yog), to_dms(ends)]
 
   return answer
 
 
-def karana(jd, place):
-  """Returns the karana and their ending times. (from 1 to 60)"""
+def karana(jd, place, ctx=None, tol=None):
+  """Returns the karana and their ending times. (from 1 to 60)
+     [karana at sunrise, end, next karana, end, ...] for every further karana
+     that ends before the next sunrise; each starts when the previous one
+     ends. Uses the same elongation samples as tithi(). tol: as in tithi()
+  """
+  tz = place.timezone
   # 1. Find time of sunrise
-  rise = sunrise(jd, place)[0]
+  if ctx is None: ctx = day_context(jd, place)
+  rise = ctx.rise
 
   # 2. Find karana at this JDN
-  solar_long = solar_longitude(rise)
-  lunar_long = lunar_longitude(rise)
-  moon_phase = (lunar_long - solar_long) % 360
+  moon_phase = (ctx.moon[0] - ctx.sun[0]) % 360
   today = ceil(moon_phase / 6)
   degrees_left = today * 6 - moon_phase
 
-  return [int(today)]
+  # 3. Compute longitudinal differences at intervals of 0.25 days from sunrise
+  offsets = day_offsets[1:]
+  lunar_long_diff = [ (moon - ctx.moon[0]) % 360 for moon in ctx.moon[1:] ]
+  solar_long_diff = [ (sun - ctx.sun[0]) % 360 for sun in ctx.sun[1:] ]
+  relative_motion = [ moon - sun for (moon, sun) in zip(lunar_long_diff, solar_long_diff) ]
+
+  # 4. Find end times by 4-point inverse Lagrange interpolation, for every
+  # karana ending before next sunrise (i.e. within relative_motion[-1])
+  y = relative_motion
+  x = offsets
+  kar = today
+  answer = []
+  while not answer or degrees_left < y[-1]:
+    if tol is None: approx_end = inverse_lagrange(x, y, degrees_left)
+    else: approx_end = end_time('karana', moon_phase + degrees_left, rise, degrees_left / y[-1], tol)
+    ends = (rise + approx_end - jd) * 24 + tz
+    answer += [int(kar), to_dms(ends)]
+    kar = kar % 60 + 1
+    degrees_left += 6
+
+  return answer
 
 def vaara(jd):
   """Weekday for given Julian day. 0 = Sunday, 1 = Monday,..., 6 = Saturday"""
   return int(ceil(jd + 1) % 7)
 
-def masa(jd, place):
+def masa(jd, place, ctx=None, purnimanta=False, ayanamsa_mode=LAHIRI):
   """Returns lunar month and if it is adhika or not.
-     1 = Chaitra, 2 = Vaisakha, ..., 12 = Phalguna"""
-  ti = tithi(jd, place)[0]
-  critical = sunrise(jd, place)[0]  # - tz/24 ?
-  last_new_moon = new_moon(critical, ti, -1)
-  next_new_moon = new_moon(critical, ti, +1)
-  this_solar_month = raasi(last_new_moon)
-  next_solar_month = raasi(next_new_moon)
+     1 = Chaitra, 2 = Vaisakha, ..., 12 = Phalguna
+     Months are amanta (new moon to new moon) unless purnimanta is True."""
+  if ctx is None: ctx = day_context(jd, place, ayanamsa_mode)
+  ti = tithi(jd, place, ctx)[0]
+  return lunar_month(ctx.rise, place, ti, purnimanta, ctx.ayanamsa_mode)
+
+def lunar_month(rise, place, ti, purnimanta=False, ayanamsa_mode=LAHIRI):
+  """masa() for a sunrise at `rise` (julian day in UT) with tithi ti"""
+  # The lunation index holds Lahiri raasis
+  index = lunation_index(rise) if ayanamsa_mode == LAHIRI else None
+  if index is not None:
+    # Sun's raasi at the new moons around sunrise, from the index
+    new_moons = index['new_moon']
+    i = np.searchsorted(new_moons['jd'], rise, side = 'right')
+    this_solar_month = int(new_moons['rasi'][i - 1])
+    next_solar_month = int(new_moons['rasi'][i])
+  else:
+    critical = rise + place.timezone / 24.  # - tz/24 ?
+    last_new_moon = new_moon(critical, ti, -1)
+    next_new_moon = new_moon(critical, ti, +1)
+    this_solar_month = raasi(last_new_moon, ayanamsa_mode)
+    next_solar_month = raasi(next_new_moon, ayanamsa_mode)
   is_leap_month = (this_solar_month == next_solar_month)
   maasa = this_solar_month + 1
   if maasa > 12: maasa = (maasa % 12)
+  # Purnimanta months begin a fortnight earlier, at the full moon. An adhika
+  # month is still new moon to new moon, so its krishna paksha keeps its name
+  if purnimanta and ti > 15 and not is_leap_month:
+    maasa = maasa % 12 + 1
   return [int(maasa), is_leap_month]
 
 # epoch-midnight to given midnight
@@ -287,8 +432,13 @@ ahargana = lambda jd: jd - 588465.5
 
 def elapsed_year(jd, maasa_num):
   sidereal_year = 365.25636
-  ahar = ahargana(jd)  # or (jd + sunrise(jd, place)[0])
-  kali = int((ahar + (4 - maasa_num) * 30) / sidereal_year)
+  start = year_start(jd, maasa_num)
+  if start is not None:
+    # Days since Chaitra began are known exactly from the lunation index
+    kali = int((ahargana(start) + 3 * 30) / sidereal_year)
+  else:
+    ahar = ahargana(jd)  # or (jd + sunrise(jd, place)[0])
+    kali = int((ahar + (4 - maasa_num) * 30) / sidereal_year)
   saka = kali - 3179
   vikrama = saka + 135
   return kali, saka
@@ -309,11 +459,10 @@ def new_moon(jd, tithi_, opt = -1):
   y0 = inverse_lagrange(x, y, 360)
   return start + y0
 
-def raasi(jd):
+def raasi(jd, ayanamsa_mode=LAHIRI):
   """Zodiac of given jd. 1 = Mesha, ... 12 = Meena"""
-  swe.set_sid_mode(swe.SIDM_LAHIRI)
   s = solar_longitude(jd)
-  solar_nirayana = (solar_longitude(jd) - swe.get_ayanamsa_ut(jd)) % 360
+  solar_nirayana = (solar_longitude(jd) - ayanamsa_ut(jd, ayanamsa_mode)) % 360
   # 12 rasis occupy 360 degrees, so each one is 30 degrees
   return ceil(solar_nirayana / 30.)
 
@@ -335,12 +484,696 @@ def ritu(masa_num):
   """0 = Vasanta,...,5 = Shishira"""
   return (masa_num - 1) // 2
 
-def day_duration(jd, place):
-  srise = sunrise(jd, place)[0]  # julian day num
-  sset = sunset(jd, place)[0]    # julian day num
+def day_duration(jd, place, ctx=None):
+  if ctx is None:
+    srise = sunrise(jd, place)[0]  # julian day num
+    sset = sunset(jd, place)[0]    # julian day num
+  else:
+    srise, sset = ctx.rise, ctx.set
   diff = (sset - srise) * 24     # In hours
   return [diff, to_dms(diff)]
 
+def compute_panchanga(jd, place, ayanamsa_mode=LAHIRI, ctx=None, tol=None):
+  """All the limbs of the panchanga for given date and place, computed from
+     a single DayContext (one sunrise/sunset solve and one sample grid).
+     Values are the same as those of the individual functions. ctx may be
+     a DayContext built elsewhere, e.g. from another ephemeris; tol: as in
+     tithi()."""
+  if ctx is None: ctx = day_context(jd, place, ayanamsa_mode)
+  tz = place.timezone
+  return {
+    'tithi': tithi(jd, place, ctx, tol),
+    'nakshatra': nakshatra(jd, place, ctx, tol),
+    'yoga': yoga(jd, place, ctx, tol),
+    'karana': karana(jd, place, ctx, tol),
+    'vaara': vaara(jd),
+    'masa': masa(jd, place, ctx),
+    'sunrise': [ctx.rise + tz/24., to_dms((ctx.rise - jd) * 24 + tz)],
+    'sunset': [ctx.set + tz/24., to_dms((ctx.set - jd) * 24 + tz)],
+    'day_duration': day_duration(jd, place, ctx),
+  }
+
+# ----- BATCH (date ranges) ------
+# The functions below compute the same values as tithi(), nakshatra(), etc.
+# for `ndays` consecutive days at once. Samples are laid out as arrays of
+# shape (len(day_offsets), ndays) so that every day is interpolated together.
+
+PanchangaTable = struct('PanchangaTable', ['jd', 'sunrise', 'sunset',
+  'tithi', 'tithi_end', 'tithi_leap', 'tithi_leap_end',
+  'nakshatra', 'nakshatra_end', 'nakshatra_leap', 'nakshatra_leap_end',
+  'yoga', 'yoga_end', 'yoga_leap', 'yoga_leap_end', 'karana', 'karana_end', 'vaara'])
+
+def sample(func, jds):
+  """Evaluates func (e.g. lunar_longitude) at every element of the array jds"""
+  return np.fromiter((func(t) for t in jds.ravel()), float, jds.size).reshape(jds.shape)
+
+def day_context_range(jd, ndays, place, ayanamsa_mode=LAHIRI):
+  """DayContext for the `ndays` days starting at jd, with every field
+     an array over the days (sun and moon have shape (5, ndays))"""
+  tz = place.timezone
+  jds = jd + np.arange(ndays)
+  rise = np.array([sunrise(d, place)[0] - tz / 24. for d in jds])
+  setting = np.array([sunset(d, place)[0] - tz / 24. for d in jds])
+  grid = rise + np.array(day_offsets)[:, np.newaxis]
+  sun = solar_longitude(grid)
+  moon = lunar_longitude(grid)
+  ayanamsa = ayanamsa_ut(grid[[0, -1]], ayanamsa_mode)
+  return DayContext(jds, place, rise, setting, sun, moon, ayanamsa, ayanamsa_mode)
+
+def tithi_columns(ctx):
+  """Vectorized tithi(): returns (tithi, end, leap tithi, leap end).
+     End times are hours after midnight as in tithi(); leap is 0 and its
+     end NaN on days without a skipped tithi."""
+  tz = ctx.place.timezone
+  moon_phase = (ctx.moon[0] - ctx.sun[0]) % 360
+  today = np.ceil(moon_phase / 12)
+  x = day_offsets[1:]
+  y = (ctx.moon[1:] - ctx.moon[0]) % 360 - (ctx.sun[1:] - ctx.sun[0]) % 360
+  ends = (ctx.rise + inverse_lagrange(x, y, today * 12 - moon_phase) - ctx.jd) * 24 + tz
+
+  moon_phase_tmrw = (ctx.moon[-1] - ctx.sun[-1]) % 360
+  skipped = (np.ceil(moon_phase_tmrw / 12) - today) % 30 > 1
+  leap_ends = (ctx.rise + inverse_lagrange(x, y, (today + 1) * 12 - moon_phase) - ctx.jd) * 24 + tz
+  return (today.astype(int), ends,
+          np.where(skipped, today + 1, 0).astype(int), np.where(skipped, leap_ends, np.nan))
+
+def nakshatra_columns(ctx):
+  """Vectorized nakshatra(), with the same columns as tithi_columns()"""
+  tz = ctx.place.timezone
+  longitudes = (ctx.moon - ctx.ayanamsa[0]) % 360
+  nak = np.ceil(longitudes[0] * 27 / 360)
+  y = unwrap_angles(longitudes)
+  ends = (ctx.rise - ctx.jd + inverse_lagrange(day_offsets, y, nak * 360 / 27)) * 24 + tz
+
+  skipped = (np.ceil(y[-1] * 27 / 360) - nak) % 27 > 1
+  leap_ends = (ctx.rise - ctx.jd + inverse_lagrange(day_offsets, y, (nak + 1) * 360 / 27)) * 24 + tz
+  return (nak.astype(int), ends,
+          np.where(skipped, nak + 1, 0).astype(int), np.where(skipped, leap_ends, np.nan))
+
+def yoga_columns(ctx):
+  """Vectorized yoga(), with the same columns as tithi_columns()"""
+  tz = ctx.place.timezone
+  lunar_long = (ctx.moon[0] - ctx.ayanamsa[0]) % 360
+  solar_long = (ctx.sun[0] - ctx.ayanamsa[0]) % 360
+  total = (lunar_long + solar_long) % 360
+  yog = np.ceil(total * 27 / 360)
+  x = day_offsets[1:]
+  y = (ctx.moon[1:] - ctx.moon[0]) % 360 + (ctx.sun[1:] - ctx.sun[0]) % 360
+  ends = (ctx.rise + inverse_lagrange(x, y, yog * (360 / 27) - total) - ctx.jd) * 24 + tz
+
+  lunar_long_tmrw = (ctx.moon[-1] - ctx.ayanamsa[1]) % 360
+  solar_long_tmrw = (ctx.sun[-1] - ctx.ayanamsa[1]) % 360
+  tomorrow = np.ceil(((lunar_long_tmrw + solar_long_tmrw) % 360) * 27 / 360)
+  skipped = (tomorrow - yog) % 27 > 1
+  leap_ends = (ctx.rise + inverse_lagrange(x, y, (yog + 1) * (360 / 27) - total) - ctx.jd) * 24 + tz
+  return (yog.astype(int), ends,
+          np.where(skipped, yog + 1, 0).astype(int), np.where(skipped, leap_ends, np.nan))
+
+def karana_columns(ctx):
+  """Vectorized karana(), for the karana at sunrise only: (karana, end)"""
+  tz = ctx.place.timezone
+  moon_phase = (ctx.moon[0] - ctx.sun[0]) % 360
+  kar = np.ceil(moon_phase / 6)
+  x = day_offsets[1:]
+  y = (ctx.moon[1:] - ctx.moon[0]) % 360 - (ctx.sun[1:] - ctx.sun[0]) % 360
+  ends = (ctx.rise + inverse_lagrange(x, y, kar * 6 - moon_phase) - ctx.jd) * 24 + tz
+  return kar.astype(int), ends
+
+def panchanga_range(jd, ndays, place, ayanamsa_mode=LAHIRI, ctx=None):
+  """Tithi, nakshatra, yoga, karana and vaara with end times for `ndays`
+     consecutive days starting at jd, as a PanchangaTable of NumPy columns.
+     sunrise and sunset are julian days in UT; end times are in hours after
+     local midnight (use to_dms() to get the same [d, m, s] as tithi(), etc.)
+     ctx may be a day_context_range() built elsewhere, e.g. from another
+     ephemeris.
+  """
+  if ctx is None: ctx = day_context_range(jd, ndays, place, ayanamsa_mode)
+  vaaras = np.ceil(ctx.jd + 1).astype(int) % 7
+  return PanchangaTable(ctx.jd, ctx.rise, ctx.set,
+                        *(tithi_columns(ctx) + nakshatra_columns(ctx) + yoga_columns(ctx) + karana_columns(ctx)),
+                        vaara=vaaras)
+
+# ----- TRANSITIONS (continuous time) ------
+# Tithi, karana, nakshatra and yoga boundaries are instants in UT that do not
+# depend on the observer. They are found once for an interval by root-finding
+# on the Moon-Sun elongation, the nirayana Moon and the nirayana Moon+Sun, and
+# any daily panchanga is then a lookup into the resulting timeline.
+
+Transition = struct('Transition', ['limb', 'index', 'start', 'end'])
+
+# limb -> (angle spanned by one element, number of elements in a cycle)
+limb_spans = {'tithi': (12, 30), 'karana': (6, 60),
+              'nakshatra': (360 / 27, 27), 'yoga': (360 / 27, 27)}
+
+def limb_angles(jd, ayanamsa_mode=LAHIRI):
+  """[elongation, nirayana moon, nirayana sun+moon] at jd, in degrees"""
+  sun = solar_longitude(jd)
+  moon = lunar_longitude(jd)
+  ayanamsa = ayanamsa_ut(jd, ayanamsa_mode)
+  return [(moon - sun) % 360, (moon - ayanamsa) % 360, (moon + sun - 2 * ayanamsa) % 360]
+
+def limb_motion(limb, jd, ayanamsa_mode=LAHIRI):
+  """(angle, daily speed) behind limb at jd: the elongation for tithi and
+     karana, the nirayana moon for nakshatra, nirayana sun+moon for yoga"""
+  moon, moon_speed = lunar_motion(jd)
+  if limb in ('tithi', 'karana'):
+    sun, sun_speed = solar_motion(jd)
+    return (moon - sun) % 360, moon_speed - sun_speed
+  ayanamsa = ayanamsa_ut(jd, ayanamsa_mode)
+  if limb == 'nakshatra':
+    return (moon - ayanamsa) % 360, moon_speed - ayanamsa_rate
+  sun, sun_speed = solar_motion(jd)
+  return (moon + sun - 2 * ayanamsa) % 360, moon_speed + sun_speed - 2 * ayanamsa_rate
+
+def crossings(motion, times, samples, span, tol = 1e-6):
+  """(k, jd) for every instant within `times` at which the angle of motion(jd)
+     (see rootfind.newton), sampled as `samples` at `times`, crosses a multiple
+     k * span degrees. The angle must only increase, by less than 360 degrees
+     between consecutive samples. tol is in days (1e-6 ~ 0.1 second)."""
+  unwrapped = samples[0] + np.concatenate([[0], np.cumsum(np.diff(samples) % 360)])
+  for k in range(int(unwrapped[0] // span) + 1, int(unwrapped[-1] // span) + 1):
+    i = np.searchsorted(unwrapped, k * span) - 1
+    a, b = times[i], times[i + 1]
+    fa, fb = unwrapped[i] - k * span, unwrapped[i + 1] - k * span
+    guess = a - fa * (b - a) / (fb - fa)
+    yield k, rootfind.newton(motion, (k * span) % 360, guess, tol, bracket = (a, b)).jd
+
+def transitions(jd_start, jd_end, step = 0.5, tol = 1e-6, ayanamsa_mode = LAHIRI):
+  """Every tithi, karana, nakshatra and yoga overlapping [jd_start, jd_end]
+     (julian days in UT), as a list of Transition sorted by start time.
+     Sun, Moon and ayanamsa are sampled once every `step` days to bracket
+     the boundaries, which are then solved for individually to within tol
+     days."""
+  margin = 1.5   # no limb lasts longer than this many days
+  times = np.arange(jd_start - margin, jd_end + margin + step, step)
+  samples = np.array([limb_angles(t, ayanamsa_mode) for t in times]).T
+
+  events = []
+  for column, limbs in enumerate([('karana', 'tithi'), ('nakshatra',), ('yoga',)]):
+    span, count = limb_spans[limbs[0]]
+    motion = lambda jd, limb=limbs[0]: limb_motion(limb, jd, ayanamsa_mode)
+    boundaries = list(crossings(motion, times, samples[column], span, tol))
+
+    for (k, start), (_, end) in zip(boundaries, boundaries[1:]):
+      events.append(Transition(limbs[0], k % count + 1, start, end))
+    if limbs[0] == 'karana':
+      # A tithi boundary is every other karana boundary
+      even = [(k, t) for (k, t) in boundaries if k % 2 == 0]
+      for (k, start), (_, end) in zip(even, even[1:]):
+        events.append(Transition('tithi', (k // 2) % 30 + 1, start, end))
+
+  events = [e for e in events if e.end > jd_start and e.start < jd_end]
+  return sorted(events, key = lambda e: (e.start, e.limb))
+
+def timeline(events):
+  """Groups a list of Transition by limb, for lookups with limb_at().
+     Each limb maps to (start times, transitions), both sorted."""
+  result = {}
+  for e in events:
+    result.setdefault(e.limb, ([], []))
+    result[e.limb][0].append(e.start)
+    result[e.limb][1].append(e)
+  return result
+
+def limb_position(tl, limb, jd):
+  """Position in tl[limb] of the transition in effect at jd (UT), or None"""
+  starts, elements = tl[limb]
+  i = bisect_right(starts, jd) - 1
+  if i >= 0 and jd < elements[i].end: return i
+  return None
+
+def limb_at(tl, limb, jd):
+  """The Transition of given limb in effect at jd (UT), or None"""
+  i = limb_position(tl, limb, jd)
+  return None if i is None else tl[limb][1][i]
+
+def day_panchanga(tl, jd, place, rise=None, next_rise=None):
+  """Tithi, nakshatra, yoga and karana at sunrise for given date and place,
+     looked up from a timeline that covers the day. Uses the same format as
+     tithi() etc.: [index, end] for the limb at sunrise, followed by
+     [index, end] for every further limb that ends before the next sunrise.
+     End times are hours after local midnight, as [d, m, s].
+     rise and next_rise (UT) are solved for unless given."""
+  tz = place.timezone
+  if rise is None: rise = sunrise(jd, place)[0] - tz / 24.
+  if next_rise is None: next_rise = sunrise(jd + 1, place)[0] - tz / 24.
+  answer = {}
+  for limb in ['tithi', 'nakshatra', 'yoga', 'karana']:
+    i = limb_position(tl, limb, rise)
+    current = tl[limb][1][i]
+    result = [current.index, to_dms((current.end - jd) * 24 + tz)]
+    for e in tl[limb][1][i + 1:]:
+      if e.end >= next_rise: break
+      result += [e.index, to_dms((e.end - jd) * 24 + tz)]
+    answer[limb] = result
+  return answer
+
+# ----- MULTI-CITY ------
+# The transition timeline is the same everywhere; only sunrise depends on the
+# place. So for many places on one date, the timeline is computed once for
+# the span of all their days and each city just looks up its own sunrise.
+
+cities_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cities.json')
+
+def load_cities(path = cities_path):
+  """The gazetteer: {name: {'latitude', 'longitude', 'timezone'}}, where
+     timezone is a tz database name such as 'Asia/Kolkata'"""
+  with open(path) as fp:
+    return json.load(fp)
+
+def city_places(jd, cities):
+  """{name: Place} for the cities of load_cities(), with each timezone's
+     UTC offset on the date jd (daylight saving included, as in gui.py)"""
+  from pytz import timezone   # only needed for the gazetteer
+  y, m, d = jd_to_gregorian(jd)[:3]
+  dt = datetime(y, m, d)
+  places = {}
+  for name, city in cities.items():
+    tz = timezone(city['timezone']).utcoffset(dt, is_dst = True).total_seconds() / 3600.
+    places[name] = Place(city['latitude'], city['longitude'], tz)
+  return places
+
+def panchanga_cities(jd, places = None, ayanamsa_mode = LAHIRI):
+  """compute_panchanga() for the date jd at many places at once. places is a
+     list of Place, or a dict {name: Place}; by default every city of
+     cities.json. Returns a list or dict of the same shape, with None for
+     places where the sun does not rise that day. End times come from one
+     transition timeline for all the places, so they are solved more
+     precisely than in compute_panchanga() (see transitions())."""
+  if places is None: places = city_places(jd, load_cities())
+  names = list(places) if isinstance(places, dict) else range(len(places))
+
+  # 1. Sunrise, next sunrise and sunset at each place, in UT
+  days = {}
+  for name in names:
+    place = places[name]
+    tz = place.timezone
+    rise = sunrise(jd, place)[0] - tz / 24.
+    next_rise = sunrise(jd + 1, place)[0] - tz / 24.
+    setting = sunset(jd, place)[0] - tz / 24.
+    if abs(rise - jd) < 1 and abs(next_rise - jd - 1) < 1:
+      days[name] = (rise, next_rise, setting)
+
+  # 2. One timeline spanning every place's day
+  result = dict((name, None) for name in names)
+  if days:
+    first = min(day[0] for day in days.values())
+    last = max(day[1] for day in days.values())
+    tl = timeline(transitions(first, last, ayanamsa_mode = ayanamsa_mode))
+
+  # 3. Project it onto each place's sunrise
+  for name, (rise, next_rise, setting) in days.items():
+    place = places[name]
+    tz = place.timezone
+    answer = day_panchanga(tl, jd, place, rise, next_rise)
+    answer['vaara'] = vaara(jd)
+    answer['masa'] = lunar_month(rise, place, answer['tithi'][0], ayanamsa_mode = ayanamsa_mode)
+    answer['sunrise'] = [rise + tz/24., to_dms((rise - jd) * 24 + tz)]
+    answer['sunset'] = [setting + tz/24., to_dms((setting - jd) * 24 + tz)]
+    answer['day_duration'] = [(setting - rise) * 24, to_dms((setting - rise) * 24)]
+    result[name] = answer
+  return result if isinstance(places, dict) else [result[i] for i in names]
+
+# ----- ALMANAC (rise and set tables) ------
+# Each rising or setting is solved by Newton's method on the altitude, starting
+# from the previous one plus the body's mean period. Only the first event of a
+# table needs swe.rise_trans's full search; the rest take 2-4 ephemeris calls.
+
+Almanac = struct('Almanac', ['jd', 'sunrise', 'sunset', 'moonrise', 'moonset'])
+
+earth_radius = 6378.137 / 149597870.7   # equatorial, in AU
+earth_axis_ratio = 0.99664719            # polar / equatorial radius
+sidereal_rate = 360.98564736629         # Earth's rotation, in degrees per day
+# Mean interval between successive risings, in days
+rise_periods = {swe.SUN: 1.0, swe.MOON: 1.035}
+
+def horizon_altitude(pressure = 1013.25, temperature = 0.0, lapse_rate = 0.0065):
+  """True altitude at which a body appears on the horizon, with the
+     refraction swe.rise_trans uses by default"""
+  low, high = -2.0, 0.0
+  while high - low > 1e-9:
+    mid = (low + high) / 2
+    apparent = swe.refrac_extended(mid, 0.0, pressure, temperature, lapse_rate, swe.TRUE_TO_APP)[0]
+    if apparent < 0: low = mid
+    else: high = mid
+  return (low + high) / 2
+
+horizon = horizon_altitude()
+
+def topocentric(body, jd, place):
+  """(hour angle, declination, distance in AU, daily motion in right
+     ascension in degrees) of body at jd (UT) as seen from the Earth's
+     surface at place; angles in radians"""
+  ra, dec, distance, ra_speed = swe.calc_ut(jd, body, swe.FLG_SWIEPH | swe.FLG_EQUATORIAL | swe.FLG_SPEED)[0][:4]
+  hour_angle = radians(swe.sidtime(jd) * 15 + place.longitude - ra)
+  lat, dec = radians(place.latitude), radians(dec)
+  # Parallax: subtract the observer's position on the ellipsoid (Meeus,
+  # ch. 40), in equatorial axes turned to the meridian of place
+  u = atan(earth_axis_ratio * tan(lat))
+  x = distance * cos(dec) * cos(hour_angle) - earth_radius * cos(u)
+  y = distance * cos(dec) * sin(hour_angle)
+  z = distance * sin(dec) - earth_radius * earth_axis_ratio * sin(u)
+  distance = sqrt(x * x + y * y + z * z)
+  return atan2(y, x), asin(z / distance), distance, ra_speed
+
+def altitude(body, jd, place):
+  """(true altitude of the centre of body, its rate in degrees per day)
+     at jd (UT) for place, as seen from the Earth's surface"""
+  hour_angle, dec, distance, ra_speed = topocentric(body, jd, place)
+  lat = radians(place.latitude)
+  alt = asin(sin(lat) * sin(dec) + cos(lat) * cos(dec) * cos(hour_angle))
+  rate = -cos(lat) * cos(dec) * sin(hour_angle) * (sidereal_rate - ra_speed) / cos(alt)
+  return degrees(alt), rate
+
+def next_rise_set(body, jd, place, flag, end):
+  """First rising (flag = swe.CALC_RISE) or setting (swe.CALC_SET) of body
+     after jd (UT), by swe.rise_trans; None if there is none before end"""
+  lat, lon, tz = place
+  while jd < end:
+    result = swe.rise_trans(jd, body, swe.BIT_DISC_CENTER + flag, (lon, lat, 0))
+    if result[0] == 0: return result[1][0]
+    jd += 1   # circumpolar today
+  return None
+
+def next_event(body, jd, place, flag, end):
+  """The rising or setting of body following the one at jd (UT), or None if
+     there is none before end"""
+  period = rise_periods[body]
+  root = rootfind.newton(lambda t: altitude(body, t, place), horizon, jd + period,
+                         tol = 1e-6, max_evaluations = 8)
+  if root.evaluations < 8 and abs(root.jd - jd - period) < 0.25:
+    return root.jd
+  # Near the poles, or close to a day without an event: search properly
+  return next_rise_set(body, jd + 0.5, place, flag, end)
+
+def almanac(jd, ndays, place):
+  """Sunrise, sunset, moonrise and moonset for `ndays` days starting at the
+     date jd, as an Almanac of NumPy arrays over the days. Times are julian
+     days in UT, NaN on days when the body does not rise or set."""
+  tz = place.timezone
+  start = jd - tz / 24.   # local midnight
+  end = start + ndays
+  columns = []
+  for body, flag in [(swe.SUN, swe.CALC_RISE), (swe.SUN, swe.CALC_SET),
+                     (swe.MOON, swe.CALC_RISE), (swe.MOON, swe.CALC_SET)]:
+    column = np.full(ndays, np.nan)
+    event = next_rise_set(body, start, place, flag, end)
+    while event is not None and event < end:
+      day = int(floor(event - start))
+      if np.isnan(column[day]): column[day] = event
+      event = next_event(body, event, place, flag, end)
+    columns.append(column)
+  return Almanac(jd + np.arange(ndays), *columns)
+
+# ----- LAGNA (ascendant) ------
+# The nirayana ascendant goes round the zodiac once a day, quickly through the
+# signs of short ascension and slowly through the others. Each boundary is
+# solved by Newton's method on the ascendant of swe.houses_ex, whose rate
+# follows from the ARMC, starting from the previous boundary.
+
+def ascendant_motion(jd, place, obliquity, ayanamsa_mode=LAHIRI):
+  """(nirayana ascendant, its speed in degrees per day) at jd (UT), given
+     the obliquity of the ecliptic in degrees"""
+  lat, lon, tz = place
+  ascmc = swe.houses_ex(jd, lat, lon, b'E')[1]
+  armc, eps, phi = radians(ascmc[2]), radians(obliquity), radians(lat)
+  k = sin(armc) * cos(eps) + tan(phi) * sin(eps)
+  rate = (cos(eps) + tan(phi) * sin(eps) * sin(armc)) / (cos(armc) ** 2 + k ** 2)
+  return (ascmc[0] - ayanamsa_ut(jd, ayanamsa_mode)) % 360, rate * sidereal_rate - ayanamsa_rate
+
+def lagna_transitions(jd_start, jd_end, place, navamsa=False, tol=1e-6, ayanamsa_mode=LAHIRI):
+  """Every lagna (or navamsa lagna if navamsa is True) overlapping
+     [jd_start, jd_end] (julian days in UT) at place, as a list of Transition
+     whose index is the raasi 1-12. Each boundary is solved to within tol
+     days. Only for latitudes outside the polar circles, where the ascendant
+     always moves forward."""
+  limb, span = ('navamsa', 360 / 108) if navamsa else ('lagna', 30)
+  obliquity = swe.calc_ut(jd_start, swe.ECL_NUT)[0][0]
+  last = []   # motion at the latest evaluation, to seed the next boundary
+  def motion(jd):
+    last[:] = ascendant_motion(jd, place, obliquity, ayanamsa_mode)
+    return last
+
+  angle, speed = motion(jd_start)
+  k = int(angle // span)
+  start = rootfind.newton(motion, k * span, jd_start - (angle - k * span) / speed, tol).jd
+  events = []
+  while start < jd_end:
+    angle, speed = last
+    target = ((k + 1) * span) % 360
+    guess = start + ((target - angle) % 360) / speed
+    end = rootfind.newton(motion, target, guess, tol).jd
+    events.append(Transition(limb, k % 12 + 1, start, end))
+    k, start = k + 1, end
+  return events
+
+def lagna_table(jd, place, navamsa=False, ayanamsa_mode=LAHIRI):
+  """The lagnas rising from sunrise to the next sunrise of the date jd at
+     place, as [raasi, start, raasi, start, ...] with start times in hours
+     after local midnight as [d, m, s]; with navamsa, the navamsa lagnas"""
+  tz = place.timezone
+  rise = sunrise(jd, place)[0] - tz / 24.
+  next_rise = sunrise(jd + 1, place)[0] - tz / 24.
+  answer = []
+  for e in lagna_transitions(rise, next_rise, place, navamsa, ayanamsa_mode = ayanamsa_mode):
+    answer += [e.index, to_dms((max(e.start, rise) - jd) * 24 + tz)]
+  return answer
+
+def lagna_range(jd, ndays, place, navamsa=False, ayanamsa_mode=LAHIRI):
+  """lagna_transitions() for `ndays` days from local midnight of the date jd,
+     all solved in one chain"""
+  start = jd - place.timezone / 24.
+  return lagna_transitions(start, start + ndays, place, navamsa, ayanamsa_mode = ayanamsa_mode)
+
+# ----- LUNATION INDEX ------
+# Every new moon and sankranti between 1800 and 2200, generated once by
+# build_lunations.py. Each row is (jd in UT, kind, raasi): the raasi of the sun
+# at a new moon, or the raasi entered at a sankranti. Rows are sorted by kind,
+# then by jd, so each kind is a contiguous slice of the table. (Kind 1 was
+# full moons, which tables built before may still hold; nothing reads them.)
+
+lunation_kinds = {'new_moon': 0, 'sankranti': 2}
+lunation_dtype = np.dtype([('jd', '<f8'), ('kind', 'u1'), ('rasi', 'u1')])
+lunations_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lunations.npy')
+lunations = None
+
+def lunation_index(jd = None):
+  """The lunation index as {kind: rows}, memory-mapped from lunations_path
+     on first use. None if the file was not built, or if it does not cover
+     the lunation around jd."""
+  global lunations
+  if lunations is None:
+    if not os.path.exists(lunations_path): return None
+    table = np.load(lunations_path, mmap_mode = 'r')
+    bounds = dict((kind, np.searchsorted(table['kind'], [k, k + 1])) for kind, k in lunation_kinds.items())
+    lunations = dict((kind, table[i:j]) for kind, (i, j) in bounds.items())
+  new_moons = lunations['new_moon']['jd']
+  if jd is not None and not (new_moons[0] <= jd < new_moons[-1]): return None
+  return lunations
+
+def year_start(jd, maasa_num = None):
+  """New moon (jd in UT) beginning the Chaitra masa, and so the lunar year,
+     in which jd falls. With maasa_num, the amanta masa of the day (as from
+     masa()), the lunation is the one next to jd with that masa: the day's
+     sunrise may be in the lunation before or after that of jd, its midnight
+     in UT. None if the lunation index does not cover jd."""
+  if lunation_index(jd) is None: return None
+  new_moons = lunations['new_moon']
+  i = np.searchsorted(new_moons['jd'], jd, side = 'right') - 1
+  if maasa_num is not None:
+    # The masa of a lunation follows the raasi of the sun at its new moon
+    for k in (i, i - 1, i + 1):
+      if 0 <= k < len(new_moons) and new_moons['rasi'][k] % 12 + 1 == maasa_num:
+        i = k
+        break
+  # Chaitra begins at the first new moon with the sun in Meena (12)
+  while i > 0 and not (new_moons['rasi'][i] == 12 and new_moons['rasi'][i - 1] != 12):
+    i -= 1
+  return float(new_moons['jd'][i]) if i > 0 else None
+
+def adhika_masas(jd_start, jd_end):
+  """(start, end, masa) of every adhika masa beginning within [jd_start, jd_end),
+     i.e. every lunation without a sankranti, from the lunation index (or
+     computed directly where it does not cover the range)"""
+  index = lunation_index(jd_start)
+  if index is not None and lunation_index(jd_end) is not None:
+    new_moons = index['new_moon']
+    i, j = np.searchsorted(new_moons['jd'], [jd_start, jd_end])
+    jds, rasis = new_moons['jd'][i:j + 1], new_moons['rasi'][i:j + 1]
+  else:
+    # The new moons from jd_start to the first after jd_end
+    jd = new_moon(jd_start, ceil(lunar_phase(jd_start) / 12), +1)
+    if jd < jd_start: jd = new_moon(jd + 1, 1, +1)
+    jds = [jd]
+    while jds[-1] < jd_end:
+      jds.append(new_moon(jds[-1] + 1, 1, +1))
+    rasis = [raasi(jd) for jd in jds]
+  return [(float(jds[k]), float(jds[k + 1]), int(rasis[k]) % 12 + 1)
+          for k in range(len(jds) - 1) if rasis[k] == rasis[k + 1]]
+
+# ----- ECLIPSE INDEX ------
+# Every solar and lunar eclipse between 1900 and 2100, generated once by
+# build_eclipses.py. Rows are sorted by the instant of greatest eclipse, so the
+# eclipses of a range are found by bisection. Global contact times are in the
+# table; what is seen from a place is worked out when first asked for, from
+# the topocentric Sun and Moon, and kept in an LRU cache.
+
+eclipse_kinds = ['solar', 'lunar']
+eclipse_types = ['total', 'annular', 'hybrid', 'partial', 'penumbral']
+# begin, end: first and last contact anywhere (penumbral for lunar eclipses)
+# partial_*: umbral phase of lunar eclipses, as begin/end for solar ones
+# total_*: totality (or annularity) anywhere; NaN if there is none
+eclipse_dtype = np.dtype([('max', '<f8'), ('kind', 'u1'), ('type', 'u1'),
+                          ('begin', '<f8'), ('end', '<f8'),
+                          ('partial_begin', '<f8'), ('partial_end', '<f8'),
+                          ('total_begin', '<f8'), ('total_end', '<f8')])
+eclipses_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eclipses.npy')
+eclipse_table = None
+
+Eclipse = struct('Eclipse', eclipse_dtype.names)
+# Seen from a place: the visible part of the eclipse, its greatest visible
+# phase and (for solar eclipses) the fraction of the Sun's diameter covered
+LocalEclipse = struct('LocalEclipse', ['eclipse', 'begin', 'max', 'end', 'magnitude'])
+local_eclipses_size = 4096
+local_eclipses = OrderedDict()   # (max, place) -> LocalEclipse, or None if not visible
+local_eclipses_lock = threading.Lock()
+
+sun_radius = 696000 / 149597870.7    # in AU, as swisseph
+moon_radius = 1738.15 / 149597870.7
+
+def eclipse_type(flags):
+  """Name in eclipse_types of the eclipse described by swisseph's flags"""
+  for name, flag in [('hybrid', swe.ECL_ANNULAR_TOTAL), ('total', swe.ECL_TOTAL),
+                     ('annular', swe.ECL_ANNULAR), ('partial', swe.ECL_PARTIAL)]:
+    if flags & flag: return name
+  return 'penumbral'
+
+def find_eclipses(jd_start, jd_end):
+  """Every eclipse with greatest eclipse within [jd_start, jd_end), as rows
+     of eclipse_dtype sorted by time, straight from swisseph"""
+  rows = []
+  for kind, search in enumerate([swe.sol_eclipse_when_glob, swe.lun_eclipse_when]):
+    jd = jd_start
+    while True:
+      flags, tret = search(jd, swe.FLG_SWIEPH, 0, False)
+      if tret[0] >= jd_end: break
+      times = [t if t else np.nan for t in tret]
+      if kind == 0:
+        contacts = times[2], times[3], times[2], times[3], times[4], times[5]
+      else:
+        contacts = times[6], times[7], times[2], times[3], times[4], times[5]
+      rows.append((tret[0], kind, eclipse_types.index(eclipse_type(flags))) + contacts)
+      jd = tret[0] + 20   # eclipses of a kind are at least a lunation apart
+  table = np.array(rows, dtype = eclipse_dtype)
+  return table[np.argsort(table['max'], kind = 'mergesort')]
+
+def eclipse_index(jd = None):
+  """The eclipse index, memory-mapped from eclipses_path on first use. None
+     if the file was not built, or if it does not cover jd."""
+  global eclipse_table
+  if eclipse_table is None:
+    if not os.path.exists(eclipses_path): return None
+    eclipse_table = np.load(eclipses_path, mmap_mode = 'r')
+  if jd is not None and not (eclipse_table['max'][0] <= jd <= eclipse_table['max'][-1]): return None
+  return eclipse_table
+
+def visible_part(body, begin, end, place):
+  """(start, end) of the part of [begin, end] during which body is above the
+     horizon at place, or None. [begin, end] must be short enough for body to
+     rise or set at most once in it."""
+  up = [altitude(body, t, place)[0] > horizon for t in (begin, end)]
+  if up[0] and up[1]: return begin, end
+  if not up[0] and not up[1]: return None
+  sign = 1 if up[1] else -1   # rises or sets in between
+  motion = lambda t: tuple(sign * v for v in altitude(body, t, place))
+  t = rootfind.newton(motion, sign * horizon, (begin + end) / 2, 1e-6, bracket = (begin, end)).jd
+  return (t, end) if up[1] else (begin, t)
+
+def solar_overlap(jd, place):
+  """(sum of the semidiameters of the Sun and Moon - their separation,
+     semidiameter of the Sun) in degrees at jd, seen from place: the Moon
+     covers part of the Sun when the first one is positive"""
+  body = {}
+  for b in (swe.SUN, swe.MOON):
+    hour_angle, dec, distance = topocentric(b, jd, place)[:3]
+    body[b] = np.array([cos(dec) * cos(hour_angle), cos(dec) * sin(hour_angle), sin(dec)]), distance
+  (sun, sun_distance), (moon, moon_distance) = body[swe.SUN], body[swe.MOON]
+  separation = atan2(np.linalg.norm(np.cross(sun, moon)), np.dot(sun, moon))
+  sun_sd, moon_sd = asin(sun_radius / sun_distance), asin(moon_radius / moon_distance)
+  return degrees(sun_sd + moon_sd - separation), degrees(sun_sd)
+
+def local_solar_eclipse(e, place, step = 0.01):
+  """LocalEclipse of solar eclipse e at place, or None"""
+  overlap = lambda t: solar_overlap(t, place)[0]
+  # Overlap is negative at the global first and last contacts; sample the
+  # eclipse to bracket the greatest phase at place, then refine it
+  times = np.linspace(e.begin, e.end, int(ceil((e.end - e.begin) / step)) + 1)
+  samples = np.array([overlap(t) for t in times])
+  i = int(np.argmax(samples))
+  if samples[i] <= 0: return None   # the path of the eclipse misses place
+  a, b = times[max(i - 1, 0)], times[min(i + 1, len(times) - 1)]
+  golden = (sqrt(5) - 1) / 2
+  while b - a > 1e-6:
+    c, d = b - golden * (b - a), a + golden * (b - a)
+    if overlap(c) > overlap(d): b = d
+    else: a = c
+  greatest = (a + b) / 2
+
+  # First and last contacts, by Newton's method on the overlap
+  def motion(t, dt = 1e-4):
+    return overlap(t), (overlap(t + dt) - overlap(t - dt)) / (2 * dt)
+  first = rootfind.newton(motion, 0, (e.begin + greatest) / 2, 1e-6, bracket = (e.begin, greatest)).jd
+  falling = lambda t: tuple(-v for v in motion(t))
+  last = rootfind.newton(falling, 0, (greatest + e.end) / 2, 1e-6, bracket = (greatest, e.end)).jd
+
+  seen = visible_part(swe.SUN, first, last, place)
+  if seen is None: return None
+  greatest = min(max(greatest, seen[0]), seen[1])
+  covered, sun_sd = solar_overlap(greatest, place)
+  return LocalEclipse(e, seen[0], greatest, seen[1], covered / (2 * sun_sd))
+
+def local_eclipse(e, place):
+  """The Eclipse e as seen from place, as a LocalEclipse; None if it is not
+     visible there. Cached."""
+  key = (e.max, place)
+  with local_eclipses_lock:
+    if key in local_eclipses:
+      local_eclipses.move_to_end(key)
+      return local_eclipses[key]
+  if e.kind == 'solar':
+    local = local_solar_eclipse(e, place)
+  else:
+    # Contacts are the same everywhere; only the Moon has to be up
+    seen = visible_part(swe.MOON, e.begin, e.end, place)
+    local = seen and LocalEclipse(e, seen[0], min(max(e.max, seen[0]), seen[1]), seen[1], np.nan)
+  with local_eclipses_lock:
+    local_eclipses[key] = local
+    while len(local_eclipses) > local_eclipses_size:
+      local_eclipses.popitem(last = False)
+  return local
+
+def eclipses(jd_start, jd_end, place = None, kind = None):
+  """Eclipses with greatest eclipse within [jd_start, jd_end) (UT), as a list
+     of Eclipse; of `kind` ('solar' or 'lunar') only if given. With a place,
+     only those visible there, as a list of LocalEclipse. From the eclipse
+     index where it covers the range, else found directly."""
+  table = eclipse_index()
+  if table is not None and table['max'][0] <= jd_start and jd_end <= table['max'][-1]:
+    i, j = np.searchsorted(table['max'], [jd_start, jd_end])
+    rows = table[i:j]
+  else:
+    rows = find_eclipses(jd_start, jd_end)
+  result = []
+  for row in rows:
+    e = Eclipse(*row.tolist())
+    e = e._replace(kind = eclipse_kinds[e.kind], type = eclipse_types[e.type])
+    if kind is not None and e.kind != kind: continue
+    if place is not None:
+      e = local_eclipse(e, place)
+      if e is None: continue
+    result.append(e)
+  return result
+
 # ----- TESTS ------
 def all_tests():
   print(moonrise(date2, bangalore)) # Expected: 11:28:06
@@ -349,7 +1182,13 @@ def all_tests():
   print(sunset(date2, bangalore)[1])   # Expected: 18:12:58
   assert(vaara(date2) == 5)
   print(sunrise(date4, shillong)[1])   # On this day, Nakshatra and Yoga are skipped!
-  assert(karana(date2, helsinki) == [14])   # Expected: 14, Vanija
+  assert(karana(date2, helsinki)[0] == 14)   # Expected: 14, Vanija
+  print(karana(date2, helsinki))   # Expected: Vanija until 12:54:04, then Vishti (15) until 25:45
+  table = almanac(date2, 2, bangalore)
+  print(to_dms((table.sunrise[0] - date2) * 24 + bangalore.timezone))   # Expected:  6:47:20
+  print(to_dms((table.moonset[1] - date2) * 24 + bangalore.timezone))   # Expected: 24:12:48
+  print(lagna_table(date2, bangalore)[:4])   # Expected: [10, [6,47,6], 11, [8,26,58]]
+  print([(e.eclipse.kind, e.eclipse.type) for e in eclipses(date2, date2 + 365, helsinki)])   # Expected: lunar partial, lunar penumbral
   return
 
 def tithi_tests():
@@ -360,6 +1199,7 @@ def tithi_tests():
   apr21 = gregorian_to_jd(Date(2013, 4, 21))
   print(tithi(date1, bangalore))  # Expected: krishna ashtami (23), ends at 27:07:09
   print(tithi(date2, bangalore))  # Expected: Saptami, ends at 16:24:04
+  print(tithi(date2, bangalore, tol=1e-5))  # Same, end time solved with rootfind.newton
   print(tithi(date3, bangalore))  # Expected: Krishna Saptami, ends at 25:03:22
   print(tithi(date2, helsinki))   # Expected: Shukla saptami until 12:54:04
   print(tithi(apr24, bangalore))  # Expected: [10, [6,9,18], 11, [27, 33, 50]]
@@ -382,6 +1222,13 @@ def yoga_tests():
   print(yoga(date2, bangalore))  # Expected: Siddha (21), ends at 29:10:40
   print(yoga(may22, helsinki))   # [16, [6,20,25], 17, [27,21,53]]
 
+def transition_tests():
+  tl = timeline(transitions(date4 - 1, date4 + 2))
+  print(day_panchanga(tl, date4, shillong)['nakshatra'])  # Expected: [3, [5,0,59], 4, [26,31,00]]
+  tl = timeline(transitions(date2 - 1, date2 + 2))
+  print(day_panchanga(tl, date2, bangalore)['tithi'])   # Expected: Saptami, ends at 16:24:04
+  print(panchanga_cities(date2, [bangalore, helsinki])[1]['tithi'])  # Expected: Shukla saptami until 12:54:04
+
 def masa_tests():
   jd = gregorian_to_jd(Date(2013, 2, 10))
   aug17 = gregorian_to_jd(Date(2012, 8, 17))
@@ -395,6 +1242,15 @@ def masa_tests():
   print(masa(sep19, bangalore))  # Normal Bhadrapada [6, False]
   print(masa(may20, helsinki))   # Vaisakha [2]
   print(masa(may21, helsinki))   # Jyestha [3]
+  # Chaitra begins between 00:00 UT and sunrise: the year changes that day
+  new_york = Place(40.7128, -74.006, -4.0)
+  mar28 = gregorian_to_jd(Date(2017, 3, 28))
+  maasa = masa(mar28, new_york)
+  assert(maasa == [1, False])
+  assert(elapsed_year(mar28, maasa[0]) == (5118, 1939))
+  assert(samvatsara(mar28, maasa[0]) == 31)
+  print(adhika_masas(gregorian_to_jd(Date(2012, 1, 1)), gregorian_to_jd(Date(2013, 1, 1))))
+  # Expected: Adhika Bhadrapada (6), from the new moon of 2012-08-17
 
 if __name__ == "__main__":
   bangalore = Place(12.972, 77.594, +5.5)
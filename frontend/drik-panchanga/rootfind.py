@@ -0,0 +1,49 @@
+#! /usr/bin/env python
+
+# rootfind.py -- speed-aware root finding for panchanga boundaries
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Finds the instant at which an angle such as the Moon-Sun elongation reaches a
+given value. The ephemeris gives the daily speed along with the longitude, so
+Newton's method converges quadratically: from a guess within a few hours of
+the answer, 2-3 evaluations reach sub-second precision.
+"""
+
+from __future__ import division
+from collections import namedtuple as struct
+
+Root = struct('Root', ['jd', 'evaluations'])
+
+def newton(motion, target, jd, tol = 1e-5, bracket = None, max_evaluations = 30):
+  """Julian day at which motion(jd)[0] = target degrees (mod 360).
+
+     motion(jd) returns (angle in degrees, speed in degrees per day); each call
+     counts as one evaluation. Starts from the guess jd and stops once a step
+     is shorter than tol days (1e-5 day ~ 0.9 second), so a larger tol trades
+     accuracy for fewer evaluations. If bracket = (a, b) contains the root,
+     steps that leave it are replaced by bisection, which keeps the solve safe
+     from poor guesses.
+
+     Returns Root(jd, evaluations).
+  """
+  a, b = bracket if bracket else (None, None)
+  for evaluations in range(1, max_evaluations + 1):
+    angle, speed = motion(jd)
+    residual = (angle - target + 180) % 360 - 180
+    if bracket:
+      if residual < 0: a = jd
+      else: b = jd
+    step = -residual / speed
+    if bracket and not (a <= jd + step <= b):
+      step = (a + b) / 2 - jd
+    jd += step
+    if abs(step) < tol: break
+  return Root(jd, evaluations)
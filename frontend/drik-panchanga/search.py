@@ -0,0 +1,138 @@
+#! /usr/bin/env python
+
+# search.py -- muhurta search over long time ranges with interval sets
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Finds the windows of time that satisfy conditions such as "nakshatra is
+Rohini or Hasta, tithi is not rikta, yoga is not Vyatipata and it is not
+Rahu kalam" over months or years.
+
+Each condition is an interval set: an Intervals of two sorted NumPy arrays
+(start, end) of julian days in UT, disjoint and not touching. Conditions on
+tithi, nakshatra, yoga and karana come straight from the transition timeline
+(panchanga.transitions()), Rahu kalam etc. from muhurta.muhurta_range(), and
+they combine with union(), intersection() and difference(), each one sweep
+over the boundaries of its operands. A search therefore costs about as much
+as solving the transitions of the range once, whatever the conditions.
+"""
+
+from __future__ import division
+from collections import namedtuple as struct
+import numpy as np
+from panchanga import transitions, timeline, almanac, LAHIRI
+from muhurta import muhurta_range
+
+Intervals = struct('Intervals', ['start', 'end'])
+
+# Tithis 4, 9, 14 of either paksha
+rikta = [4, 9, 14, 19, 24, 29]
+# Yogas 17 and 27
+vyatipata, vaidhriti = 17, 27
+
+def intervals(start, end):
+  """Intervals from arrays of starts and ends in any order, overlapping or
+     touching; empty ones are dropped and the rest merged"""
+  start, end = np.asarray(start, dtype = float), np.asarray(end, dtype = float)
+  keep = end > start
+  order = np.argsort(start[keep], kind = 'mergesort')
+  start, end = start[keep][order], end[keep][order]
+  if len(start) == 0: return Intervals(start, end)
+  reach = np.maximum.accumulate(end)
+  first = np.concatenate([[True], start[1:] > reach[:-1]])
+  last = np.concatenate([first[1:], [True]])
+  return Intervals(start[first], reach[last])
+
+def combine(a, b, keep):
+  """Intervals where keep(inside a, inside b) holds, by a sweep over the
+     boundaries of a and b"""
+  edges = np.unique(np.concatenate([a.start, a.end, b.start, b.end]))
+  if len(edges) < 2: return intervals([], [])
+  middles = (edges[:-1] + edges[1:]) / 2
+  inside = [np.searchsorted(s.start, middles, 'right') > np.searchsorted(s.end, middles, 'right')
+            for s in (a, b)]
+  kept = np.diff(np.concatenate([[0], keep(*inside).astype(int), [0]]))
+  return Intervals(edges[kept == 1], edges[kept == -1])
+
+def union(*sets):
+  return intervals(np.concatenate([s.start for s in sets]), np.concatenate([s.end for s in sets]))
+
+def intersection(first, *sets):
+  for s in sets:
+    first = combine(first, s, lambda x, y: x & y)
+  return first
+
+def difference(a, b):
+  """Intervals of a outside b"""
+  return combine(a, b, lambda x, y: x & ~y)
+
+def limb_intervals(tl, limb, indices):
+  """When the tithi, nakshatra, yoga or karana (limb) is one of indices,
+     from a timeline()"""
+  indices = set(indices)
+  elements = [e for e in tl.get(limb, ([], []))[1] if e.index in indices]
+  return intervals([e.start for e in elements], [e.end for e in elements])
+
+def row_intervals(windows):
+  """Intervals from a (days, 2) array of windows such as muhurta's, skipping
+     the NaN ones"""
+  windows = windows[~np.isnan(windows).any(axis = 1)]
+  return intervals(windows[:, 0], windows[:, 1])
+
+def search(jd, ndays, place, require = None, forbid = None, avoid = (),
+           daytime = False, min_duration = 0, ayanamsa_mode = LAHIRI):
+  """Windows within `ndays` days from the date jd at place, as Intervals
+     (julian days in UT), in which
+
+     * require = {limb: indices}: each limb is one of its indices,
+       e.g. {'nakshatra': [4, 13]} for Rohini or Hasta
+     * forbid = {limb: indices}: no limb is one of its indices,
+       e.g. {'tithi': rikta, 'yoga': [vyatipata]}
+     * avoid: none of these muhurta windows is running,
+       e.g. ['rahu_kalam', 'yamagandam', 'gulika_kalam']
+     * daytime: if True, the sun is up
+
+     Windows shorter than min_duration days are dropped.
+  """
+  tz = place.timezone
+  start, end = jd - tz / 24., jd + ndays - tz / 24.
+  tl = timeline(transitions(start, end, ayanamsa_mode = ayanamsa_mode))
+  result = Intervals(np.array([start]), np.array([end]))
+
+  for limb, indices in (require or {}).items():
+    result = intersection(result, limb_intervals(tl, limb, indices))
+  for limb, indices in (forbid or {}).items():
+    result = difference(result, limb_intervals(tl, limb, indices))
+  if avoid:
+    m = muhurta_range(jd, ndays, place)
+    result = difference(result, union(*[row_intervals(getattr(m, name)) for name in avoid]))
+  if daytime:
+    table = almanac(jd, ndays, place)
+    result = intersection(result, row_intervals(np.stack([table.sunrise, table.sunset], axis = 1)))
+
+  keep = result.end - result.start >= min_duration
+  return Intervals(result.start[keep], result.end[keep])
+
+def search_tests():
+  a = intervals([5, 0, 2], [6, 1, 3.5])
+  b = intervals([0.5, 3], [2.5, 5.5])
+  assert(list(a.start) == [0, 2, 5] and list(a.end) == [1, 3.5, 6])
+  t = intervals([0, 1, 3], [1, 2, 3])   # touching ones merge, empty ones go
+  assert(list(t.start) == [0] and list(t.end) == [2])
+  u = union(a, b)
+  assert(list(u.start) == [0] and list(u.end) == [6])
+  i = intersection(a, b)
+  assert(list(zip(i.start, i.end)) == [(0.5, 1), (2, 2.5), (3, 3.5), (5, 5.5)])
+  d = difference(a, b)
+  assert(list(zip(d.start, d.end)) == [(0, 0.5), (2.5, 3), (5.5, 6)])
+  assert(len(difference(a, a).start) == 0)
+
+if __name__ == "__main__":
+  search_tests()
@@ -0,0 +1,174 @@
+#! /usr/bin/env python
+
+# swe_profile.py -- counts Swiss ephemeris calls and their time
+#
+# This file is part of the "drik-panchanga" Python library
+# for computing Hindu luni-solar calendar based on the Swiss ephemeris
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Opt-in accounting of the Swiss ephemeris calls made by drik-panchanga:
+
+    with profile() as stats:
+      compute_panchanga(jd, place)
+    print(stats.summary())
+
+While at least one profile is open, the functions in `profiled` are
+replaced in the swisseph module by wrappers that count each call and its
+wall time, under the function of the library that made it (e.g.
+'panchanga.sunrise'). Counts go to every profile open in the calling
+thread, so threads (or Flask requests) are accounted separately; calls
+from other threads pass straight through. Without an open profile
+nothing is wrapped and nothing is slowed down.
+
+init_app(app) adds the totals of every request as an X-Ephemeris-Calls
+response header to a Flask app, when the environment variable SWE_PROFILE
+is set.
+"""
+
+from __future__ import division
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import swisseph as swe
+
+profiled = ['calc_ut', 'rise_trans', 'get_ayanamsa_ut', 'houses', 'houses_ex',
+            'sol_eclipse_when_glob', 'lun_eclipse_when']
+
+originals = {}          # name -> the unwrapped swisseph function
+lock = threading.Lock()
+active = 0              # number of open profiles, in all threads
+local = threading.local()
+
+class CallStats(object):
+  """Calls and seconds per (swisseph function, calling function)"""
+
+  def __init__(self):
+    self.calls = {}
+
+  def add(self, name, caller, seconds):
+    entry = self.calls.setdefault((name, caller), [0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+
+  def total(self, name = None):
+    """(calls, seconds) of swisseph function name, or of all of them"""
+    entries = [v for (n, c), v in self.calls.items() if name is None or n == name]
+    return sum(e[0] for e in entries), sum(e[1] for e in entries)
+
+  def by_function(self):
+    """{swisseph function: calls}"""
+    result = {}
+    for (name, caller), (count, seconds) in self.calls.items():
+      result[name] = result.get(name, 0) + count
+    return result
+
+  def as_dict(self):
+    calls, seconds = self.total()
+    return {'calls': calls, 'seconds': seconds,
+            'functions': self.by_function(),
+            'callers': dict(('%s <- %s' % key, value[0]) for key, value in self.calls.items())}
+
+  def header(self):
+    """One-line summary for an HTTP header"""
+    calls, seconds = self.total()
+    functions = ', '.join('%s=%d' % item for item in sorted(self.by_function().items()))
+    return '%d; time=%.1fms%s' % (calls, seconds * 1000, '; ' + functions if functions else '')
+
+  def summary(self):
+    lines = ['%-16s %-36s %7s %10s' % ('swisseph', 'called from', 'calls', 'ms')]
+    for (name, caller), (count, seconds) in sorted(self.calls.items(), key = lambda kv: -kv[1][1]):
+      lines.append('%-16s %-36s %7d %10.2f' % (name, caller, count, seconds * 1000))
+    calls, seconds = self.total()
+    lines.append('%-16s %-36s %7d %10.2f' % ('total', '', calls, seconds * 1000))
+    return '\n'.join(lines)
+
+library = os.path.dirname(os.path.abspath(__file__))
+
+def caller_name(frame):
+  """module.function of the nearest calling frame in drik-panchanga (past
+     e.g. np.vectorize), or of frame itself if there is none"""
+  caller = frame
+  while caller is not None and os.path.dirname(os.path.abspath(caller.f_code.co_filename)) != library:
+    caller = caller.f_back
+  caller = caller or frame
+  module = os.path.splitext(os.path.basename(caller.f_code.co_filename))[0]
+  return '%s.%s' % (module, caller.f_code.co_name)
+
+def wrap(name, function):
+  def wrapper(*args, **kwargs):
+    stack = getattr(local, 'stack', None)
+    if not stack: return function(*args, **kwargs)
+    start = time.perf_counter()
+    try:
+      return function(*args, **kwargs)
+    finally:
+      seconds = time.perf_counter() - start
+      caller = caller_name(sys._getframe(1))
+      for stats in stack:
+        stats.add(name, caller, seconds)
+  return wrapper
+
+@contextmanager
+def profile():
+  """Context manager yielding the CallStats of the swisseph calls made in
+     this thread while it is open"""
+  global active
+  with lock:
+    if active == 0:
+      for name in profiled:
+        if hasattr(swe, name):
+          originals[name] = getattr(swe, name)
+          setattr(swe, name, wrap(name, originals[name]))
+    active += 1
+  stats = CallStats()
+  local.stack = getattr(local, 'stack', []) + [stats]
+  try:
+    yield stats
+  finally:
+    local.stack = local.stack[:-1]
+    with lock:
+      active -= 1
+      if active == 0:
+        for name, function in originals.items():
+          setattr(swe, name, function)
+        originals.clear()
+
+def init_app(app, header = 'X-Ephemeris-Calls'):
+  """Account the swisseph calls of every request of a Flask app in a
+     response header, if the SWE_PROFILE environment variable is set"""
+  if not os.environ.get('SWE_PROFILE'): return
+  from flask import g
+
+  @app.before_request
+  def open_profile():
+    g.swe_profile = profile()
+    g.swe_stats = g.swe_profile.__enter__()
+
+  @app.after_request
+  def add_header(response):
+    if 'swe_stats' in g:
+      response.headers[header] = g.swe_stats.header()
+    return response
+
+  @app.teardown_request
+  def close_profile(exc):
+    context = g.pop('swe_profile', None)
+    if context is not None: context.__exit__(None, None, None)
+
+if __name__ == "__main__":
+  # Accounts one compute_panchanga(), as for /api/panchang
+  from panchanga import compute_panchanga, moonrise, moonset, gregorian_to_jd, Date, Place
+  place = Place(27.7172, 85.3240, +5.75)
+  jd = gregorian_to_jd(Date(2025, 10, 22))
+  with profile() as stats:
+    compute_panchanga(jd, place)
+    moonrise(jd, place)
+    moonset(jd, place)
+  print(stats.summary())
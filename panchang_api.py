@@ -8,8 +8,8 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import sys
 import os
-import json
 from datetime import datetime, date
+import calendar
 import math
 
 # Add the drik-panchanga directory to Python path
@@ -20,76 +20,34 @@ from panchanga import (
     Date, Place, gregorian_to_jd, jd_to_gregorian,
     tithi, nakshatra, yoga, karana, vaara, masa,
     sunrise, sunset, moonrise, moonset, day_duration,
-    elapsed_year, samvatsara, ritu, raasi, lunar_phase
+    elapsed_year, samvatsara, ritu, raasi, lunar_phase,
+    almanac, to_dms, lagna_range, eclipses
 )
+from muhurta import muhurta_range, choghadiya_names, hora_planets
+import search
+from festivals import festival_year
+import swe_profile
+import panchang_service
+from panchang_service import (
+    format_time, local_time, local_window, local_datetime,
+    get_tithi_name, get_nakshatra_name, get_yoga_name, get_karana_name, get_vaara_name,
+    get_masa_name, get_samvatsara_name, get_ritu_name, get_raasi_name, get_planetary_lords
+)
+# Festivals and eclipses are cached per place (see festivals.py and
+# panchanga.local_eclipse), so their coordinates are snapped to the grid
+from panchang_service import snap_to_grid
 
 app = Flask(__name__)
 CORS(app)
+# Swiss ephemeris calls per request in an X-Ephemeris-Calls header, if SWE_PROFILE is set
+swe_profile.init_app(app)
 
-# Load Sanskrit names
-with open('drik-panchanga/sanskrit_names.json', 'r', encoding='utf-8') as f:
-    sanskrit_names = json.load(f)
-
-def format_time(time_dms):
-    """Format time from [hours, minutes, seconds] to HH:MM:SS"""
-    if isinstance(time_dms, list) and len(time_dms) >= 3:
-        h, m, s = time_dms[0], time_dms[1], time_dms[2]
-        return f"{h:02d}:{m:02d}:{s:02d}"
-    return "00:00:00"
-
-def get_tithi_name(tithi_num, paksha):
-    """Get Sanskrit name for tithi"""
-    if paksha == 'Shukla':
-        return sanskrit_names['tithis'].get(str(tithi_num), f"Tithi {tithi_num}")
-    else:
-        return sanskrit_names['tithis'].get(str(tithi_num + 15), f"Tithi {tithi_num}")
-
-def get_nakshatra_name(nakshatra_num):
-    """Get Sanskrit name for nakshatra"""
-    return sanskrit_names['nakshatras'].get(str(nakshatra_num), f"Nakshatra {nakshatra_num}")
-
-def get_yoga_name(yoga_num):
-    """Get Sanskrit name for yoga"""
-    return sanskrit_names['yogas'].get(str(yoga_num), f"Yoga {yoga_num}")
-
-def get_karana_name(karana_num):
-    """Get Sanskrit name for karana"""
-    return sanskrit_names['karanas'].get(str(karana_num), f"Karana {karana_num}")
-
-def get_vaara_name(vaara_num):
-    """Get Sanskrit name for vaara (weekday)"""
-    return sanskrit_names['varas'].get(str(vaara_num), f"Vaara {vaara_num}")
-
-def get_masa_name(masa_num):
-    """Get Sanskrit name for masa (month)"""
-    return sanskrit_names['masas'].get(str(masa_num), f"Masa {masa_num}")
-
-def get_samvatsara_name(samvatsara_num):
-    """Get Sanskrit name for samvatsara (year)"""
-    return sanskrit_names['samvats'].get(str(samvatsara_num), f"Samvatsara {samvatsara_num}")
-
-def get_ritu_name(ritu_num):
-    """Get Sanskrit name for ritu (season)"""
-    return sanskrit_names['ritus'].get(str(ritu_num), f"Ritu {ritu_num}")
-
-def get_raasi_name(raasi_num):
-    """Get Sanskrit name for raasi (zodiac sign)"""
-    raasi_names = {
-        1: "Mesha", 2: "Vrishabha", 3: "Mithuna", 4: "Karka",
-        5: "Simha", 6: "Kanya", 7: "Tula", 8: "Vrishchika",
-        9: "Dhanu", 10: "Makara", 11: "Kumbha", 12: "Meena"
-    }
-    return raasi_names.get(raasi_num, f"Raasi {raasi_num}")
-
-def get_planetary_lords():
-    """Get planetary lords for nakshatras"""
-    lords = [
-        'Ketu', 'Venus', 'Sun', 'Moon', 'Mars', 'Rahu', 'Jupiter',
-        'Saturn', 'Mercury', 'Ketu', 'Venus', 'Sun', 'Moon', 'Mars',
-        'Rahu', 'Jupiter', 'Saturn', 'Mercury', 'Ketu', 'Venus',
-        'Sun', 'Moon', 'Mars', 'Rahu', 'Jupiter', 'Saturn', 'Mercury'
-    ]
-    return lords
+def invalid_precision():
+    """400 response for an unknown precision parameter"""
+    return jsonify({
+        'success': False,
+        'error': f"Invalid precision: expected one of {', '.join(panchang_service.choices)}"
+    }), 400
 
 @app.route('/api/panchang', methods=['POST'])
 def calculate_panchang():
@@ -107,6 +65,11 @@ def calculate_panchang():
         longitude = float(data.get('longitude', 85.3240))
         timezone = float(data.get('timezone', 5.75))
         
+        # Engine: 'high', 'standard', 'fast' or an engine name
+        precision = data.get('precision')
+        if not panchang_service.valid_precision(precision):
+            return invalid_precision()
+        
         # Create date and place objects
         panchang_date = Date(year, month, day)
         place = Place(latitude, longitude, timezone)
@@ -114,20 +77,21 @@ def calculate_panchang():
         # Convert to Julian day
         jd = gregorian_to_jd(panchang_date)
         
-        # Calculate all panchang elements
-        tithi_data = tithi(jd, place)
-        nakshatra_data = nakshatra(jd, place)
-        yoga_data = yoga(jd, place)
-        karana_data = karana(jd, place)
-        vaara_data = vaara(jd)
-        masa_data = masa(jd, place)
+        # Calculate all panchang elements with the engine of the precision (cached)
+        panchanga = panchang_service.compute(jd, place, precision)
+        tithi_data = panchanga['tithi']
+        nakshatra_data = panchanga['nakshatra']
+        yoga_data = panchanga['yoga']
+        karana_data = panchanga['karana']
+        vaara_data = panchanga['vaara']
+        masa_data = panchanga['masa']
         
         # Calculate timings
-        sunrise_data = sunrise(jd, place)
-        sunset_data = sunset(jd, place)
+        sunrise_data = panchanga['sunrise']
+        sunset_data = panchanga['sunset']
         moonrise_data = moonrise(jd, place)
         moonset_data = moonset(jd, place)
-        day_duration_data = day_duration(jd, place)
+        day_duration_data = panchanga['day_duration']
         
         # Calculate additional information
         lunar_phase_data = lunar_phase(jd)
@@ -177,6 +141,11 @@ def calculate_panchang():
         # Yoga end time
         yoga_end_time = format_time(yoga_data[1]) if len(yoga_data) > 1 else "Unknown"
         
+        # Karana end time, and every karana ending before the next sunrise
+        karana_end_time = format_time(karana_data[1]) if len(karana_data) > 1 else "Unknown"
+        karanas = [{'number': k, 'name': get_karana_name(k), 'end_time': format_time(t)}
+                   for k, t in zip(karana_data[::2], karana_data[1::2])]
+        
         # Check for skipped tithi/nakshatra/yoga
         has_skipped_tithi = len(tithi_data) > 2
         has_skipped_nakshatra = len(nakshatra_data) > 2
@@ -196,6 +165,7 @@ def calculate_panchang():
                 'longitude': longitude,
                 'timezone': timezone
             },
+            'engine': panchanga['engine'],
             'tithi': {
                 'number': tithi_num,
                 'name': tithi_name,
@@ -222,7 +192,9 @@ def calculate_panchang():
                 'number': karana_data[0],
                 'name': karana_name,
                 'english': karana_name,
-                'type': 'Movable' if karana_data[0] <= 7 else 'Fixed'
+                'type': 'Movable' if karana_data[0] <= 7 else 'Fixed',
+                'end_time': karana_end_time,
+                'all': karanas
             },
             'vaara': {
                 'number': vaara_data,
@@ -276,15 +248,17 @@ def calculate_panchang():
 def get_current_panchang():
     """Get panchang for current date"""
     today = date.today()
-    return calculate_panchang_for_date(today.year, today.month, today.day)
+    return calculate_panchang_for_date(today.year, today.month, today.day, request.args.get('precision'))
 
 @app.route('/api/panchang/<int:year>/<int:month>/<int:day>', methods=['GET'])
 def get_panchang_for_date(year, month, day):
     """Get panchang for specific date"""
-    return calculate_panchang_for_date(year, month, day)
+    return calculate_panchang_for_date(year, month, day, request.args.get('precision'))
 
-def calculate_panchang_for_date(year, month, day):
+def calculate_panchang_for_date(year, month, day, precision=None):
     """Helper function to calculate panchang for specific date"""
+    if not panchang_service.valid_precision(precision):
+        return invalid_precision()
     try:
         # Default to Kathmandu coordinates
         latitude = 27.7172
@@ -298,17 +272,18 @@ def calculate_panchang_for_date(year, month, day):
         # Convert to Julian day
         jd = gregorian_to_jd(panchang_date)
         
-        # Calculate all panchang elements
-        tithi_data = tithi(jd, place)
-        nakshatra_data = nakshatra(jd, place)
-        yoga_data = yoga(jd, place)
-        karana_data = karana(jd, place)
-        vaara_data = vaara(jd)
-        masa_data = masa(jd, place)
+        # Calculate all panchang elements with the engine of the precision (cached)
+        panchanga = panchang_service.compute(jd, place, precision)
+        tithi_data = panchanga['tithi']
+        nakshatra_data = panchanga['nakshatra']
+        yoga_data = panchanga['yoga']
+        karana_data = panchanga['karana']
+        vaara_data = panchanga['vaara']
+        masa_data = panchanga['masa']
         
         # Calculate timings
-        sunrise_data = sunrise(jd, place)
-        sunset_data = sunset(jd, place)
+        sunrise_data = panchanga['sunrise']
+        sunset_data = panchanga['sunset']
         moonrise_data = moonrise(jd, place)
         moonset_data = moonset(jd, place)
         
@@ -316,6 +291,7 @@ def calculate_panchang_for_date(year, month, day):
         response = {
             'success': True,
             'date': f"{year}-{month:02d}-{day:02d}",
+            'engine': panchanga['engine'],
             'tithi': {
                 'number': tithi_data[0],
                 'name': get_tithi_name(tithi_data[0], 'Shukla' if tithi_data[0] <= 15 else 'Krishna')
@@ -347,13 +323,265 @@ def calculate_panchang_for_date(year, month, day):
             'message': 'Failed to calculate panchang'
         }), 500
 
+@app.route('/api/almanac/<int:year>/<int:month>', methods=['GET'])
+def get_almanac_for_month(year, month):
+    """Sunrise, sunset, moonrise and moonset for every day of a month"""
+    try:
+        # Default to Kathmandu coordinates
+        latitude = request.args.get('latitude', 27.7172, type=float)
+        longitude = request.args.get('longitude', 85.3240, type=float)
+        timezone = request.args.get('timezone', 5.75, type=float)
+        place = Place(latitude, longitude, timezone)
+        
+        jd = gregorian_to_jd(Date(year, month, 1))
+        ndays = calendar.monthrange(year, month)[1]
+        table = almanac(jd, ndays, place)
+        
+        days = []
+        for i in range(ndays):
+            day_jd = table.jd[i]
+            days.append({
+                'date': f"{year}-{month:02d}-{i + 1:02d}",
+                'sunrise': local_time(table.sunrise[i], day_jd, timezone),
+                'sunset': local_time(table.sunset[i], day_jd, timezone),
+                'moonrise': local_time(table.moonrise[i], day_jd, timezone),
+                'moonset': local_time(table.moonset[i], day_jd, timezone)
+            })
+        
+        return jsonify({
+            'success': True,
+            'location': {
+                'latitude': latitude,
+                'longitude': longitude,
+                'timezone': timezone
+            },
+            'days': days
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to calculate almanac'
+        }), 500
+
+@app.route('/api/muhurta/<int:year>/<int:month>', methods=['GET'])
+def get_muhurta_for_month(year, month):
+    """Rahu kalam, Yamagandam, Gulika, muhurats, Choghadiya and horas for
+    every day of a month"""
+    try:
+        # Default to Kathmandu coordinates
+        latitude = request.args.get('latitude', 27.7172, type=float)
+        longitude = request.args.get('longitude', 85.3240, type=float)
+        timezone = request.args.get('timezone', 5.75, type=float)
+        place = Place(latitude, longitude, timezone)
+        
+        jd = gregorian_to_jd(Date(year, month, 1))
+        ndays = calendar.monthrange(year, month)[1]
+        m = muhurta_range(jd, ndays, place)
+        
+        days = []
+        for i in range(ndays):
+            day_jd = jd + i
+            kinds = m.choghadiya_kinds[i]
+            days.append({
+                'date': f"{year}-{month:02d}-{i + 1:02d}",
+                'rahu_kalam': local_window(m.rahu_kalam[i], day_jd, timezone),
+                'yamagandam': local_window(m.yamagandam[i], day_jd, timezone),
+                'gulika_kalam': local_window(m.gulika_kalam[i], day_jd, timezone),
+                'abhijit': local_window(m.abhijit[i], day_jd, timezone),
+                'vijaya': local_window(m.vijaya[i], day_jd, timezone),
+                'brahma': local_window(m.brahma[i], day_jd, timezone),
+                'choghadiya': {
+                    'day': [dict(local_window(t, day_jd, timezone), name=choghadiya_names[k])
+                            for k, t in zip(kinds[:8], m.day_choghadiya[i])],
+                    'night': [dict(local_window(t, day_jd, timezone), name=choghadiya_names[k])
+                              for k, t in zip(kinds[8:], m.night_choghadiya[i])]
+                },
+                'horas': [dict(local_window(t, day_jd, timezone), lord=hora_planets[k])
+                          for k, t in zip(m.hora_lords[i], m.horas[i])]
+            })
+        
+        return jsonify({
+            'success': True,
+            'location': {
+                'latitude': latitude,
+                'longitude': longitude,
+                'timezone': timezone
+            },
+            'days': days
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to calculate muhurtas'
+        }), 500
+
+@app.route('/api/muhurta/search', methods=['POST'])
+def search_muhurta():
+    """Windows over a range of days that satisfy panchanga conditions, e.g.
+    {"year": 2025, "month": 1, "day": 1, "days": 180,
+     "require": {"nakshatra": [4, 13]},
+     "forbid": {"tithi": [4, 9, 14, 19, 24, 29], "yoga": [17]},
+     "avoid": ["rahu_kalam"], "daytime": true, "min_minutes": 30}"""
+    try:
+        data = request.get_json()
+        
+        year = int(data.get('year', date.today().year))
+        month = int(data.get('month', date.today().month))
+        day = int(data.get('day', date.today().day))
+        ndays = min(int(data.get('days', 30)), 3660)
+        
+        # Extract location (default to Kathmandu)
+        latitude = float(data.get('latitude', 27.7172))
+        longitude = float(data.get('longitude', 85.3240))
+        timezone = float(data.get('timezone', 5.75))
+        place = Place(latitude, longitude, timezone)
+        
+        limbs = ('tithi', 'nakshatra', 'yoga', 'karana')
+        require = data.get('require', {})
+        forbid = data.get('forbid', {})
+        avoid = data.get('avoid', [])
+        unknown = [k for k in list(require) + list(forbid) if k not in limbs]
+        unknown += [k for k in avoid if k not in ('rahu_kalam', 'yamagandam', 'gulika_kalam')]
+        if unknown:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown conditions: {', '.join(unknown)}"
+            }), 400
+        
+        jd = gregorian_to_jd(Date(year, month, day))
+        found = search.search(jd, ndays, place, require, forbid, avoid,
+                              daytime=bool(data.get('daytime', False)),
+                              min_duration=float(data.get('min_minutes', 0)) / 1440)
+        
+        return jsonify({
+            'success': True,
+            'windows': [{'start': local_datetime(start, timezone),
+                         'end': local_datetime(end, timezone),
+                         'minutes': round((end - start) * 1440)}
+                        for start, end in zip(found.start, found.end)]
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to search muhurtas'
+        }), 500
+
+@app.route('/api/festivals/<int:year>', methods=['GET'])
+def get_festivals_for_year(year):
+    """Festivals and vrats of a Gregorian year, compiled from festivals.json"""
+    try:
+        # Default to Kathmandu coordinates
+        latitude = request.args.get('latitude', 27.7172, type=float)
+        longitude = request.args.get('longitude', 85.3240, type=float)
+        timezone = request.args.get('timezone', 5.75, type=float)
+        place = Place(snap_to_grid(latitude), snap_to_grid(longitude), timezone)
+        
+        festivals = []
+        for festival in festival_year(year, place):
+            y, m, d = jd_to_gregorian(festival.jd)[:3]
+            festivals.append({
+                'date': f"{y}-{m:02d}-{d:02d}",
+                'name': festival.name,
+                'masa': get_masa_name(festival.masa),
+                'adhika': festival.adhika,
+                'tithi': get_tithi_name(festival.tithi, 'Shukla')
+            })
+        
+        return jsonify({
+            'success': True,
+            'year': year,
+            'festivals': festivals
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to compile festivals'
+        }), 500
+
+@app.route('/api/lagna/<int:year>/<int:month>', methods=['GET'])
+def get_lagna_for_month(year, month):
+    """Start of every lagna (or navamsa lagna with ?navamsa=1) in a month"""
+    try:
+        # Default to Kathmandu coordinates
+        latitude = request.args.get('latitude', 27.7172, type=float)
+        longitude = request.args.get('longitude', 85.3240, type=float)
+        timezone = request.args.get('timezone', 5.75, type=float)
+        navamsa = request.args.get('navamsa', 0, type=int) == 1
+        place = Place(latitude, longitude, timezone)
+        
+        jd = gregorian_to_jd(Date(year, month, 1))
+        ndays = calendar.monthrange(year, month)[1]
+        lagnas = [{'raasi': e.index,
+                   'name': get_raasi_name(e.index),
+                   'start': local_datetime(e.start, timezone),
+                   'end': local_datetime(e.end, timezone)}
+                  for e in lagna_range(jd, ndays, place, navamsa)]
+        
+        return jsonify({
+            'success': True,
+            'navamsa': navamsa,
+            'lagnas': lagnas
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to calculate lagnas'
+        }), 500
+
+@app.route('/api/eclipses/<int:year>', methods=['GET'])
+def get_eclipses_for_year(year):
+    """Solar and lunar eclipses of a year visible from a location"""
+    try:
+        # Default to Kathmandu coordinates
+        latitude = request.args.get('latitude', 27.7172, type=float)
+        longitude = request.args.get('longitude', 85.3240, type=float)
+        timezone = request.args.get('timezone', 5.75, type=float)
+        place = Place(snap_to_grid(latitude), snap_to_grid(longitude), timezone)
+        
+        start = gregorian_to_jd(Date(year, 1, 1)) - timezone / 24.
+        end = gregorian_to_jd(Date(year + 1, 1, 1)) - timezone / 24.
+        visible = []
+        for local in eclipses(start, end, place):
+            visible.append({
+                'kind': local.eclipse.kind,
+                'type': local.eclipse.type,
+                'begin': local_datetime(local.begin, timezone),
+                'max': local_datetime(local.max, timezone),
+                'end': local_datetime(local.end, timezone),
+                'magnitude': None if math.isnan(local.magnitude) else round(local.magnitude, 3)
+            })
+        
+        return jsonify({
+            'success': True,
+            'year': year,
+            'eclipses': visible
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to find eclipses'
+        }), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'service': 'Panchang API',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'panchang': panchang_service.status()
     })
 
 if __name__ == '__main__':
@@ -362,8 +590,15 @@ if __name__ == '__main__':
     print("🌍 Default location: Kathmandu, Nepal")
     print("🔗 API endpoints:")
     print("   POST /api/panchang - Calculate panchang with custom location")
+    print("        (precision: high, standard, fast, or swisseph, skyfield, approximate)")
     print("   GET  /api/panchang/current - Get current panchang")
     print("   GET  /api/panchang/<year>/<month>/<day> - Get panchang for specific date")
+    print("   GET  /api/almanac/<year>/<month> - Rise and set times for a month")
+    print("   GET  /api/muhurta/<year>/<month> - Rahu kalam, Choghadiya, horas, ... for a month")
+    print("   POST /api/muhurta/search - Windows matching tithi, nakshatra, yoga, ... conditions")
+    print("   GET  /api/festivals/<year> - Festivals and vrats of a year")
+    print("   GET  /api/lagna/<year>/<month> - Lagna (or navamsa) boundaries for a month")
+    print("   GET  /api/eclipses/<year> - Eclipses of a year visible from a location")
     print("   GET  /api/health - Health check")
     print("\n🌟 Server starting on http://localhost:5000")
     
@@ -5,9 +5,8 @@ set -e
 export PATH="/Applications/Docker.app/Contents/Resources/bin:$PATH"
 
 echo "🚀 Step 1: Building and Pushing Backend (imbibetech/nirvana-backend)..."
-cd backend
-docker buildx build --platform linux/amd64,linux/arm64 --no-cache -t imbibetech/nirvana-backend:latest --push .
-cd ..
+# From the repository root, for drik-panchanga (see backend/Dockerfile)
+docker buildx build --platform linux/amd64,linux/arm64 --no-cache -f backend/Dockerfile -t imbibetech/nirvana-backend:latest --push .
 
 echo "🏗️ Step 2: Building and Pushing Frontend (imbibetech/nirvana-frontend)..."
 cd frontend
@@ -7,7 +7,6 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import sys
 import os
-import json
 from datetime import datetime, date
 import math
 
@@ -21,47 +20,24 @@ from panchanga import (
     sunrise, sunset, moonrise, moonset, day_duration,
     elapsed_year, samvatsara, ritu, raasi, lunar_phase
 )
+import swe_profile
+import panchang_service
+from panchang_service import (
+    format_time, get_tithi_name, get_nakshatra_name, get_yoga_name,
+    get_karana_name, get_vaara_name, get_masa_name
+)
 
 app = Flask(__name__)
 CORS(app)
+# Swiss ephemeris calls per request in an X-Ephemeris-Calls header, if SWE_PROFILE is set
+swe_profile.init_app(app)
 
-# Load Sanskrit names
-with open('drik-panchanga/sanskrit_names.json', 'r', encoding='utf-8') as f:
-    sanskrit_names = json.load(f)
-
-def format_time(time_dms):
-    """Format time from [hours, minutes, seconds] to HH:MM:SS"""
-    if isinstance(time_dms, list) and len(time_dms) >= 3:
-        h, m, s = time_dms[0], time_dms[1], time_dms[2]
-        return f"{h:02d}:{m:02d}:{s:02d}"
-    return "00:00:00"
-
-def get_tithi_name(tithi_num, paksha):
-    """Get Sanskrit name for tithi"""
-    if paksha == 'Shukla':
-        return sanskrit_names['tithis'].get(str(tithi_num), f"Tithi {tithi_num}")
-    else:
-        return sanskrit_names['tithis'].get(str(tithi_num + 15), f"Tithi {tithi_num}")
-
-def get_nakshatra_name(nakshatra_num):
-    """Get Sanskrit name for nakshatra"""
-    return sanskrit_names['nakshatras'].get(str(nakshatra_num), f"Nakshatra {nakshatra_num}")
-
-def get_yoga_name(yoga_num):
-    """Get Sanskrit name for yoga"""
-    return sanskrit_names['yogas'].get(str(yoga_num), f"Yoga {yoga_num}")
-
-def get_karana_name(karana_num):
-    """Get Sanskrit name for karana"""
-    return sanskrit_names['karanas'].get(str(karana_num), f"Karana {karana_num}")
-
-def get_vaara_name(vaara_num):
-    """Get Sanskrit name for vaara (weekday)"""
-    return sanskrit_names['varas'].get(str(vaara_num), f"Vaara {vaara_num}")
-
-def get_masa_name(masa_num):
-    """Get Sanskrit name for masa (month)"""
-    return sanskrit_names['masas'].get(str(masa_num), f"Masa {masa_num}")
+def invalid_precision():
+    """400 response for an unknown precision parameter"""
+    return jsonify({
+        'success': False,
+        'error': f"Invalid precision: expected one of {', '.join(panchang_service.choices)}"
+    }), 400
 
 @app.route('/api/panchang', methods=['POST'])
 def calculate_panchang():
@@ -79,6 +55,11 @@ def calculate_panchang():
         longitude = float(data.get('longitude', 85.3240))
         timezone = float(data.get('timezone', 5.75))
         
+        # Engine: 'high', 'standard', 'fast' or an engine name
+        precision = data.get('precision')
+        if not panchang_service.valid_precision(precision):
+            return invalid_precision()
+        
         # Create date and place objects
         panchang_date = Date(year, month, day)
         # Use integer coordinates for compatibility
@@ -87,17 +68,18 @@ def calculate_panchang():
         # Convert to Julian day
         jd = gregorian_to_jd(panchang_date)
         
-        # Calculate all panchang elements
-        tithi_data = tithi(jd, place)
-        nakshatra_data = nakshatra(jd, place)
-        yoga_data = yoga(jd, place)
-        karana_data = karana(jd, place)
-        vaara_data = vaara(jd)
-        masa_data = masa(jd, place)
+        # Calculate all panchang elements with the engine of the precision (cached)
+        panchanga = panchang_service.compute(jd, place, precision)
+        tithi_data = panchanga['tithi']
+        nakshatra_data = panchanga['nakshatra']
+        yoga_data = panchanga['yoga']
+        karana_data = panchanga['karana']
+        vaara_data = panchanga['vaara']
+        masa_data = panchanga['masa']
         
         # Calculate timings
-        sunrise_data = sunrise(jd, place)
-        sunset_data = sunset(jd, place)
+        sunrise_data = panchanga['sunrise']
+        sunset_data = panchanga['sunset']
         moonrise_data = moonrise(jd, place)
         moonset_data = moonset(jd, place)
         
@@ -132,6 +114,11 @@ def calculate_panchang():
         # Yoga end time
         yoga_end_time = format_time(yoga_data[1]) if len(yoga_data) > 1 else "Unknown"
         
+        # Karana end time, and every karana ending before the next sunrise
+        karana_end_time = format_time(karana_data[1]) if len(karana_data) > 1 else "Unknown"
+        karanas = [{'number': k, 'name': get_karana_name(k), 'end_time': format_time(t)}
+                   for k, t in zip(karana_data[::2], karana_data[1::2])]
+        
         # Build response
         response = {
             'success': True,
@@ -146,6 +133,7 @@ def calculate_panchang():
                 'longitude': longitude,
                 'timezone': timezone
             },
+            'engine': panchanga['engine'],
             'tithi': {
                 'number': tithi_num,
                 'name': tithi_name,
@@ -172,7 +160,9 @@ def calculate_panchang():
                 'number': karana_data[0],
                 'name': karana_name,
                 'english': karana_name,
-                'type': 'Movable' if karana_data[0] <= 7 else 'Fixed'
+                'type': 'Movable' if karana_data[0] <= 7 else 'Fixed',
+                'end_time': karana_end_time,
+                'all': karanas
             },
             'vaara': {
                 'number': vaara_data,
@@ -247,7 +237,8 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'Panchang API',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'panchang': panchang_service.status()
     })
 
 if __name__ == '__main__':
@@ -256,6 +247,7 @@ if __name__ == '__main__':
     print("🌍 Default location: Kathmandu, Nepal")
     print("🔗 API endpoints:")
     print("   POST /api/panchang - Calculate panchang with custom location")
+    print("        (precision: high, standard, fast, or swisseph, skyfield, approximate)")
     print("   GET  /api/health - Health check")
     print("\n🌟 Server starting on http://localhost:5001")
     